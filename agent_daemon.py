@@ -32,15 +32,18 @@ from moltagent import (
     OPERATOR_LOG,
     load_state,
     save_state,
+    force_sync_state,
     ensure_today,
     load_policy,
     should_reply,
+    event_features,
     make_outbound_reply,
     build_prompt,
     rate_limit,
     hu_operator_summary,
     ensure_dirs,
     append_jsonl,
+    rotate_jsonl_if_needed,
     estimate_tokens,
     estimate_cost_usd,
 )
@@ -48,10 +51,10 @@ from moltagent.retry import ReplyError
 from moltagent.config import CHARS_PER_TOKEN_EST, USD_PER_1M_INPUT_TOKENS, USD_PER_1M_OUTPUT_TOKENS
 from moltagent.monitoring import (
     DaemonStats,
-    check_budget_warning,
     log_daily_summary,
     log_cycle_stats,
-    check_error_rate_alert,
+    monitoring_tick,
+    flush_monitoring_logs,
 )
 from adapters import get_adapter, BaseAdapter
 
@@ -108,8 +111,9 @@ def process_event(
 
     Returns the decision dict or None on error.
     """
+    # load_state already rolled day/hour over: pass its keys through
     st = load_state()
-    st = ensure_today(st)
+    st = ensure_today(st, st.day_key, st.hour_key)
 
     event_id = event.get("id", "unknown")
 
@@ -132,7 +136,7 @@ def process_event(
         "hour_key": st.hour_key,
         "daemon_ts": datetime.now(timezone.utc).isoformat(),
     }
-    append_jsonl(DECISION_LOG, decision_log_entry)
+    append_jsonl(DECISION_LOG, decision_log_entry, flush=True)
 
     reason = decision.get("reason", "?")
     prio = decision.get("priority", "?")
@@ -145,7 +149,7 @@ def process_event(
         append_jsonl(OPERATOR_LOG, {
             "event_id": event_id,
             "operator_summary_hu": op,
-        })
+        }, flush=True)
         return decision
 
     # Rate limit
@@ -164,7 +168,7 @@ def process_event(
 
     # Update state
     st = load_state()  # Reload in case of concurrent changes
-    st = ensure_today(st)
+    st = ensure_today(st, st.day_key, st.hour_key)
     st.calls_today += 1
     st.last_call_ts = time.time()
 
@@ -207,7 +211,7 @@ def process_event(
         "est_usd": est,
         "reply_status": reply_status,
         "daemon_ts": datetime.now(timezone.utc).isoformat(),
-    })
+    }, flush=True)
 
     # Operator view
     op = hu_operator_summary(event, decision, reply_en=reply_en)
@@ -216,7 +220,7 @@ def process_event(
         "operator_summary_hu": op,
         "day_total_est_usd": st.spent_usd,
         "calls_today": st.calls_today,
-    })
+    }, flush=True)
 
     return decision
 
@@ -244,12 +248,13 @@ def run_poll_cycle(
 
     logger.info(f"Fetched {len(events)} events from feed")
 
-    # Log input events
+    # Log input events, then precompute per-event features once
     for event in events:
         append_jsonl(EVENT_LOG, {
             **event,
             "daemon_fetched_at": datetime.now(timezone.utc).isoformat(),
         })
+        event_features(event)
 
     # Process each event
     for event in events:
@@ -339,7 +344,6 @@ def main() -> int:
     logger.info("=" * 50)
 
     daily_budget_usd = policy.get("daily_budget_usd", 1.0)
-    last_budget_warning_pct = 0  # Track to avoid duplicate warnings
 
     while not shutdown_requested:
         daemon_stats.cycles += 1
@@ -365,7 +369,6 @@ def main() -> int:
                     daily_budget_usd,
                 )
                 daemon_stats.reset_day(st.day_key)
-                last_budget_warning_pct = 0
                 logger.info(f"📅 New day: {st.day_key}")
 
             # Run poll cycle
@@ -373,12 +376,9 @@ def main() -> int:
 
             # Update daemon stats
             daemon_stats.total_fetched += stats["fetched"]
-            daemon_stats.total_replied += stats["replied"]
-            daemon_stats.total_skipped += stats["skipped"]
-            daemon_stats.total_errors += stats["errors"]
-            daemon_stats.day_replied += stats["replied"]
-            daemon_stats.day_skipped += stats["skipped"]
-            daemon_stats.day_errors += stats["errors"]
+            daemon_stats.record_replied(stats["replied"])
+            daemon_stats.record_skipped(stats["skipped"])
+            daemon_stats.record_error(stats["errors"])
             daemon_stats.last_cycle_ts = datetime.now(timezone.utc).isoformat()
 
             # Update spent tracking
@@ -393,22 +393,12 @@ def main() -> int:
                 st.calls_today,
             )
 
-            # Check budget warning (only warn once per threshold)
-            current_pct = (st.spent_usd / daily_budget_usd * 100) if daily_budget_usd > 0 else 0
-            warning_thresholds = [80, 90, 95, 100]
-            for threshold in warning_thresholds:
-                if current_pct >= threshold and last_budget_warning_pct < threshold:
-                    warning = check_budget_warning(
-                        st.spent_usd,
-                        daily_budget_usd,
-                        warning_threshold=threshold / 100,
-                    )
-                    if warning:
-                        daemon_stats.budget_warnings += 1
-                        last_budget_warning_pct = threshold
-
-            # Check error rate
-            check_error_rate_alert(daemon_stats, threshold_pct=10.0)
+            # Budget warning (once per threshold per day) + error rate alert
+            monitoring_tick(daemon_stats, st, policy, error_threshold_pct=10.0)
+
+            # Size-based log rotation (once per cycle)
+            for log_path in (EVENT_LOG, DECISION_LOG, OUTBOUND_LOG, OPERATOR_LOG):
+                rotate_jsonl_if_needed(log_path)
 
             logger.info(
                 f"Cycle #{daemon_stats.cycles}: "
@@ -419,8 +409,7 @@ def main() -> int:
 
         except Exception as e:
             logger.exception(f"Error in poll cycle: {e}")
-            daemon_stats.total_errors += 1
-            daemon_stats.day_errors += 1
+            daemon_stats.record_error()
             daemon_stats.add_error({"message": str(e), "type": "cycle_error"})
 
         # Exit if --once flag
@@ -440,7 +429,9 @@ def main() -> int:
             while time.time() < sleep_end and not shutdown_requested:
                 time.sleep(min(1.0, sleep_end - time.time()))
 
-    # Final daily summary
+    # Final daily summary (after queued monitoring records and state are on disk)
+    flush_monitoring_logs()
+    force_sync_state()
     st = load_state()
     log_daily_summary(daemon_stats, st.spent_usd, st.calls_today, daily_budget_usd)
 
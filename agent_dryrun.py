@@ -30,12 +30,14 @@ from moltagent import (
     ensure_today,
     load_policy,
     should_reply,
+    event_features,
     make_outbound_reply,
     build_prompt,
     rate_limit,
     hu_operator_summary,
     ensure_dirs,
     append_jsonl,
+    rotate_jsonl_if_needed,
     estimate_tokens,
     estimate_cost_usd,
 )
@@ -132,8 +134,9 @@ def main() -> None:
     print(f"   Agent: {adapter.agent_name}")
     print(f"   Dry-run: {adapter.is_dry_run}")
 
+    # A load_state már a mai nap/óra kulcsaira állított: azokat adjuk tovább
     st = load_state()
-    st = ensure_today(st)
+    st = ensure_today(st, st.day_key, st.hour_key)
 
     # Fetch events from adapter
     events = get_events_from_adapter(adapter, limit=args.limit)
@@ -141,9 +144,10 @@ def main() -> None:
         print("\n⚠️  Nincsenek események (üres feed vagy nincs events.jsonl)")
         return
 
-    # Log input events
+    # Log input events, majd jellemzők előszámolása (egyszer eseményenként)
     for e in events:
         append_jsonl(EVENT_LOG, e)
+        event_features(e)
 
     print(f"\n[dry-run] loaded {len(events)} events")
     print(f"[dry-run] state day={st.day_key} spent=${st.spent_usd:.4f} calls={st.calls_today}")
@@ -184,7 +188,7 @@ def main() -> None:
             decision_log_entry["scheduler_paced_wait"] = True
             decision_log_entry["wait_seconds"] = sched_info["wait_seconds"]
 
-        append_jsonl(DECISION_LOG, decision_log_entry)
+        append_jsonl(DECISION_LOG, decision_log_entry, flush=True)
 
         # Console output
         reason = decision.get("reason", "?")
@@ -206,7 +210,7 @@ def main() -> None:
             append_jsonl(OPERATOR_LOG, {
                 "event_id": e.get("id"),
                 "operator_summary_hu": op,
-            })
+            }, flush=True)
             continue
 
         # Rate limit
@@ -241,7 +245,7 @@ def main() -> None:
                 "event_id": event_id,
                 "operator_summary_hu": op,
                 "error": err.error_type,
-            })
+            }, flush=True)
             continue
 
         # Update state
@@ -284,7 +288,7 @@ def main() -> None:
             "usage": {"input_tokens": in_tok, "output_tokens": out_tok},
             "est_usd": est,
             "reply_status": reply_status,
-        })
+        }, flush=True)
 
         # Operator view (HU)
         op = hu_operator_summary(e, decision, reply_en=reply_en)
@@ -293,12 +297,16 @@ def main() -> None:
             "operator_summary_hu": op,
             "day_total_est_usd": st.spent_usd,
             "calls_today": st.calls_today,
-        })
+        }, flush=True)
 
         print(f"  [reply EN] {reply_en}")
         print(f"  [status] {reply_status}")
         print(f"  [cost≈] +${est:.4f} → day_total≈${st.spent_usd:.4f}, calls={st.calls_today}\n")
 
+    # Méret alapú log rotáció (a futás végén, egyszer)
+    for log_path in (EVENT_LOG, DECISION_LOG, OUTBOUND_LOG, OPERATOR_LOG):
+        rotate_jsonl_if_needed(log_path)
+
     print("\n[dry-run] done.")
     print(f"[dry-run] final state: spent≈${st.spent_usd:.4f}, calls={st.calls_today}")
     print(f"[dry-run] burst counters: p0={st.burst_used_p0}/{burst_p0}, p1={st.burst_used_p1}/{burst_p1}")
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+import copy
+import gzip
 import json
+import mmap
 import os
 import sys
 import subprocess
+import time
 from datetime import datetime
 from typing import Any, Dict, Optional, List
 
@@ -11,6 +15,8 @@ LOG_DIR = "logs"
 EVENTS_FILE = "events.jsonl"
 POLICY_FILE = "policy.json"
 STATE_FILE = "agent_state.json"
+# append-only log of replied event ids, written next to the state file by the agent
+REPLIED_LOG_FILE = "agent_state.replied_events.jsonl"
 
 # logs created by agent_dryrun.py
 EVENT_LOG = os.path.join(LOG_DIR, "events.jsonl")
@@ -23,11 +29,22 @@ def _exists(path: str) -> bool:
     return os.path.exists(path)
 
 
+def _rotated_archives(path: str) -> List[str]:
+    # path.1.gz (newest) ... path.N.gz (oldest), as written by the agent's log rotation
+    archives = []
+    i = 1
+    while _exists(f"{path}.{i}.gz"):
+        archives.append(f"{path}.{i}.gz")
+        i += 1
+    return archives
+
+
 def _read_jsonl(path: str) -> List[Dict[str, Any]]:
     if not _exists(path):
         return []
     rows = []
-    with open(path, "r", encoding="utf-8") as f:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
         for line in f:
             line = line.strip()
             if line:
@@ -40,15 +57,55 @@ def _read_jsonl(path: str) -> List[Dict[str, Any]]:
 
 
 def _tail_jsonl(path: str, n: int = 10) -> List[Dict[str, Any]]:
-    rows = _read_jsonl(path)
-    return rows[-n:]
+    # parsed variant for callers that inspect fields; broken lines are skipped
+    rows = []
+    for line in _tail_raw_lines(path, n):
+        try:
+            rows.append(json.loads(line))
+        except Exception:
+            continue
+    return rows
+
+
+def _tail_raw_lines(path: str, n: int = 10) -> List[str]:
+    # last n non-empty lines, undecoded as JSON (tail just prints them)
+    if n <= 0 or not _exists(path):
+        return []
+    try:
+        return _tail_mmap(path, n)
+    except (OSError, ValueError):
+        # mmap not available (or file vanished/changed under us): full read
+        with open(path, "r", encoding="utf-8") as f:
+            lines = [line.strip() for line in f]
+        return [line for line in lines if line][-n:]
+
+
+def _tail_mmap(path: str, n: int) -> List[str]:
+    # Scan backwards for record boundaries with mmap.rfind (C-level memrchr),
+    # so the cost depends on the size of the last n records, not the file.
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = size
+            lines: List[str] = []
+            while pos > 0 and len(lines) < n:
+                nl = mm.rfind(b"\n", 0, pos)
+                line = mm[nl + 1:pos].strip()
+                pos = nl if nl >= 0 else 0
+                if line:
+                    lines.append(line.decode("utf-8", errors="replace"))
+    lines.reverse()
+    return lines
 
 
 def _find_in_jsonl(path: str, key: str, value: str) -> Optional[Dict[str, Any]]:
-    rows = _read_jsonl(path)
-    for r in rows:
-        if str(r.get(key, "")) == value:
-            return r
+    # active log first; rotated archives only on a miss (newest first)
+    for p in [path] + _rotated_archives(path):
+        for r in _read_jsonl(p):
+            if str(r.get(key, "")) == value:
+                return r
     return None
 
 
@@ -70,6 +127,10 @@ Parancsok:
   status
     - megmutatja: state + policy gyors infó + scheduler állapot + log fájlok
 
+  status --watch [mp]
+    - mp másodpercenként újrarajzolja a status-t (alap: 2), Ctrl+C: kilépés
+    - ha a state/policy fájl nem változott, nem olvassa újra őket
+
   run
     - lefuttatja a dry-run feldolgozást (python agent_dryrun.py)
     - scheduler be/ki: set scheduler on|off
@@ -91,7 +152,7 @@ Parancsok:
     - log lehet: events | decisions | outbound | operator
 
   clear logs
-    - törli a logs/ alatti jsonl logokat
+    - törli a logs/ alatti jsonl logokat (a rotált .gz archívumokkal együtt)
 
   clear counters
     - törli a napi/órás számlálókat (calls, spent, burst, p2hour)
@@ -154,6 +215,15 @@ Parancsok:
     _print_card("agent_shell.py - help", help_text)
 
 
+def _local_timestamp() -> str:
+    # time.localtime + f-string: skips datetime object creation and strftime parsing
+    lt = time.localtime()
+    return (
+        f"{lt.tm_year:04d}-{lt.tm_mon:02d}-{lt.tm_mday:02d} "
+        f"{lt.tm_hour:02d}:{lt.tm_min:02d}:{lt.tm_sec:02d}"
+    )
+
+
 def _load_state() -> Dict[str, Any]:
     if not _exists(STATE_FILE):
         return {}
@@ -164,24 +234,54 @@ def _load_state() -> Dict[str, Any]:
         return {}
 
 
+def _replied_ids(st: Dict[str, Any]) -> set:
+    # dedup list = replied log + legacy list still stored in the state file
+    ids = set(st.get("replied_event_ids", []))
+    for row in _read_jsonl(REPLIED_LOG_FILE):
+        if "event_id" in row:
+            ids.add(row["event_id"])
+    return ids
+
+
+# Parsed policy.json, keyed by (mtime_ns, size): the single source of policy
+# data for the shell, re-parsed only when the file actually changes.
+_policy_cache: Dict[str, Any] = {"key": None, "data": {}}
+
+
 def _load_policy() -> Dict[str, Any]:
-    if not _exists(POLICY_FILE):
-        return {}
+    """Shared, cached policy dict - treat as read-only (see _ensure_policy)."""
     try:
-        with open(POLICY_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
+        st = os.stat(POLICY_FILE)
+    except OSError:
         return {}
+    key = (st.st_mtime_ns, st.st_size)
+    if _policy_cache["key"] != key:
+        try:
+            with open(POLICY_FILE, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return {}
+        _policy_cache["key"] = key
+        _policy_cache["data"] = data
+    return _policy_cache["data"]
+
 
 def _save_policy(pol: Dict[str, Any]) -> None:
-    with open(POLICY_FILE, "w", encoding="utf-8") as f:
+    # tmp file + os.replace: readers never see a half-written policy.json
+    tmp = POLICY_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
         json.dump(pol, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, POLICY_FILE)
+
+    # what we just wrote is the new cached policy - no re-read/re-parse needed
+    st = os.stat(POLICY_FILE)
+    _policy_cache["key"] = (st.st_mtime_ns, st.st_size)
+    _policy_cache["data"] = pol
 
 
 def _ensure_policy() -> Dict[str, Any]:
-    pol = _load_policy()
-    if not pol:
-        pol = {}
+    # private copy: callers mutate it before saving
+    pol = copy.deepcopy(_load_policy())
 
     # Ensure basic structure exists
     pol.setdefault("daily_budget_usd", 1.0)
@@ -227,77 +327,97 @@ def _show_policy() -> None:
         _print_card("POLICY (policy.json)", json.dumps(pol, ensure_ascii=False, indent=2))
 
 
-def _set_policy_field(field: str, value: str) -> None:
-    pol = _ensure_policy()
-
-    def as_int(v: str) -> int:
-        return int(float(v))
-
-    def as_float(v: str) -> float:
-        return float(v)
-
-    field = field.lower().strip()
+def _as_int(v: str) -> int:
+    return int(float(v))
 
-    # Map shell fields to policy.json structure
-    if field in ("budget", "daily_budget", "daily_budget_usd"):
-        pol["daily_budget_usd"] = as_float(value)
 
-    elif field in ("maxcalls", "max_calls", "max_calls_per_day"):
-        pol["max_calls_per_day"] = as_int(value)
+def _as_lower(v: str) -> str:
+    return v.strip().lower()
 
-    elif field in ("p2hour", "max_replies_per_hour_p2"):
-        pol.setdefault("reply", {})
-        pol["reply"]["max_replies_per_hour_p2"] = as_int(value)
 
-    elif field in ("minsec", "min_seconds_between_calls"):
-        pol["min_seconds_between_calls"] = as_int(value)
+def _field_setter(section: Optional[str], key: str, cast):
+    # handler that casts the value and stores it under pol[section][key] (or pol[key])
+    def handler(pol: Dict[str, Any], value: str) -> Optional[str]:
+        target = pol.setdefault(section, {}) if section else pol
+        target[key] = cast(value)
+        return None
+    return handler
 
-    elif field in ("lang", "language"):
-        pol.setdefault("style", {})
-        pol["style"]["language"] = value.strip().lower()
 
-    elif field in ("maxsent", "max_sentences"):
-        pol.setdefault("style", {})
-        pol["style"]["max_sentences"] = as_int(value)
+def _set_scheduler_enabled(pol: Dict[str, Any], value: str) -> Optional[str]:
+    val_lower = value.strip().lower()
+    if val_lower in ("on", "true", "1", "yes"):
+        enabled = True
+    elif val_lower in ("off", "false", "0", "no"):
+        enabled = False
+    else:
+        return "Usage: set scheduler <on|off>"
+    pol.setdefault("scheduler", {})["enabled"] = enabled
+    return None
 
-    elif field in ("format",):
-        pol.setdefault("style", {})
-        pol["style"]["format"] = value.strip().lower()
 
-    # Scheduler fields
-    elif field in ("scheduler",):
-        pol.setdefault("scheduler", {})
-        val_lower = value.strip().lower()
-        if val_lower in ("on", "true", "1", "yes"):
-            pol["scheduler"]["enabled"] = True
-        elif val_lower in ("off", "false", "0", "no"):
-            pol["scheduler"]["enabled"] = False
-        else:
-            _print_card("ERROR", "Usage: set scheduler <on|off>")
-            return
+# shell field alias -> handler(pol, value) returning an error message or None
+_FIELD_HANDLERS: Dict[str, Any] = {
+    alias: handler
+    for aliases, handler in (
+        (("budget", "daily_budget", "daily_budget_usd"), _field_setter(None, "daily_budget_usd", float)),
+        (("maxcalls", "max_calls", "max_calls_per_day"), _field_setter(None, "max_calls_per_day", _as_int)),
+        (("p2hour", "max_replies_per_hour_p2"), _field_setter("reply", "max_replies_per_hour_p2", _as_int)),
+        (("minsec", "min_seconds_between_calls"), _field_setter(None, "min_seconds_between_calls", _as_int)),
+        (("lang", "language"), _field_setter("style", "language", _as_lower)),
+        (("maxsent", "max_sentences"), _field_setter("style", "max_sentences", _as_int)),
+        (("format",), _field_setter("style", "format", _as_lower)),
+        # Scheduler fields
+        (("scheduler",), _set_scheduler_enabled),
+        (("burst_p0", "burst0"), _field_setter("scheduler", "burst_p0", _as_int)),
+        (("burst_p1", "burst1"), _field_setter("scheduler", "burst_p1", _as_int)),
+    )
+    for alias in aliases
+}
 
-    elif field in ("burst_p0", "burst0"):
-        pol.setdefault("scheduler", {})
-        pol["scheduler"]["burst_p0"] = as_int(value)
 
-    elif field in ("burst_p1", "burst1"):
-        pol.setdefault("scheduler", {})
-        pol["scheduler"]["burst_p1"] = as_int(value)
+def _set_policy_field(field: str, value: str) -> None:
+    field = field.lower().strip()
 
-    else:
+    handler = _FIELD_HANDLERS.get(field)
+    if handler is None:
         _print_card("ERROR", f"Unknown policy field: {field}\nTry: budget | maxcalls | p2hour | minsec | lang | maxsent | format | scheduler | burst_p0 | burst_p1")
         return
 
+    pol = _ensure_policy()
+    error = handler(pol, value)
+    if error:
+        _print_card("ERROR", error)
+        return
+
     _save_policy(pol)
     _print_card("OK", f"Updated policy: {field} = {value}\nSaved to {POLICY_FILE}")
 
-def _status() -> None:
+
+def _file_key(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+# (state file key, policy file key, replied log key) -> rendered state/policy status lines
+_status_cache: Dict[str, Any] = {"key": None, "lines": []}
+
+
+def _status_state_policy_lines() -> List[str]:
+    # only these lines depend on the state/policy files: re-render them
+    # (and re-read the files) only when any of them changed
+    key = (_file_key(STATE_FILE), _file_key(POLICY_FILE), _file_key(REPLIED_LOG_FILE))
+    if _status_cache["key"] == key:
+        return _status_cache["lines"]
+
     st = _load_state()
     pol = _load_policy()
 
     lines = []
-    lines.append(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    lines.append(f"State file: {'OK' if _exists(STATE_FILE) else 'missing'}")
+    lines.append(f"State file: {'OK' if key[0] else 'missing'}")
     if st:
         spent = st.get('spent_usd', 0)
         budget = pol.get('daily_budget_usd', 1.0) if pol else 1.0
@@ -320,13 +440,13 @@ def _status() -> None:
         burst_p1_used = st.get('burst_used_p1', 0)
         lines.append(f"  burst_used: p0={burst_p0_used} p1={burst_p1_used}")
         # Idempotencia: megválaszolt események száma
-        replied_count = len(st.get('replied_event_ids', []))
+        replied_count = len(_replied_ids(st))
         lines.append(f"  replied_events: {replied_count}")
     else:
         lines.append("  (no state loaded)")
 
     lines.append("")
-    lines.append(f"Policy file: {'OK' if _exists(POLICY_FILE) else 'missing'}")
+    lines.append(f"Policy file: {'OK' if key[1] else 'missing'}")
     if pol:
         lines.append(f"  daily_budget_usd={pol.get('daily_budget_usd')} max_calls_per_day={pol.get('max_calls_per_day')} min_seconds_between_calls={pol.get('min_seconds_between_calls')}")
         style = pol.get("style", {})
@@ -344,6 +464,15 @@ def _status() -> None:
     else:
         lines.append("  (no policy loaded)")
 
+    _status_cache["key"] = key
+    _status_cache["lines"] = lines
+    return lines
+
+
+def _status() -> None:
+    lines = [f"Time: {_local_timestamp()}"]
+    lines.extend(_status_state_policy_lines())
+
     lines.append("")
     lines.append("Files:")
     for p in [EVENTS_FILE, POLICY_FILE, STATE_FILE, EVENT_LOG, DECISION_LOG, OUTBOUND_LOG, OPERATOR_LOG]:
@@ -375,6 +504,17 @@ def _status() -> None:
     _print_card("STATUS", "\n".join(lines))
 
 
+def _status_watch(interval: float) -> None:
+    # live dashboard: unchanged state/policy files cost two stat() calls per refresh
+    print(f"(status --watch {interval:g}s, Ctrl+C to stop)")
+    try:
+        while True:
+            _status()
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print()
+
+
 def _run_dryrun() -> None:
     script = "agent_dryrun.py"
 
@@ -439,21 +579,21 @@ def _tail(which: str, n: int) -> None:
     if not path:
         _print_card("ERROR", "Unknown log. Use: events | decisions | outbound | operator")
         return
-    rows = _tail_jsonl(path, n)
-    if not rows:
+    lines = _tail_raw_lines(path, n)
+    if not lines:
         _print_card("EMPTY", f"No rows in {path} (or missing).")
         return
-    body = "\n".join(json.dumps(r, ensure_ascii=False) for r in rows)
-    _print_card(f"TAIL {which} {n}", body)
+    _print_card(f"TAIL {which} {n}", "\n".join(lines))
 
 
 def _clear_logs() -> None:
     os.makedirs(LOG_DIR, exist_ok=True)
     deleted = []
-    for p in [EVENT_LOG, DECISION_LOG, OUTBOUND_LOG, OPERATOR_LOG]:
-        if _exists(p):
-            os.remove(p)
-            deleted.append(p)
+    for log_path in [EVENT_LOG, DECISION_LOG, OUTBOUND_LOG, OPERATOR_LOG]:
+        for p in [log_path] + _rotated_archives(log_path):
+            if _exists(p):
+                os.remove(p)
+                deleted.append(p)
     _print_card("CLEAR LOGS", "Deleted:\n" + ("\n".join(deleted) if deleted else "(nothing to delete)"))
 
 
@@ -528,8 +668,9 @@ def _clear_counters() -> None:
         "last_call_ts": st.get("last_call_ts", 0.0),
     }
 
-    # Dedup lista megtartása
+    # Dedup lista megtartása (a replied napló érintetlen marad)
     replied_ids = st.get("replied_event_ids", [])
+    replied_count = len(_replied_ids(st))
 
     # Új state létrehozása
     new_state = {
@@ -559,7 +700,7 @@ def _clear_counters() -> None:
         f"  - last_call_ts: {old_values['last_call_ts']:.1f} → 0.0",
         "",
         "Megtartva:",
-        f"  - replied_event_ids: {len(replied_ids)} elem",
+        f"  - replied_event_ids: {replied_count} elem",
         "",
         f"State mentve: {STATE_FILE}",
     ]
@@ -576,7 +717,7 @@ def _clear_dedup() -> None:
         return
 
     st = _load_state()
-    replied_ids = st.get("replied_event_ids", [])
+    replied_ids = _replied_ids(st)
 
     if not replied_ids:
         _print_card("CLEAR DEDUP", "A dedup lista már üres.")
@@ -594,11 +735,13 @@ def _clear_dedup() -> None:
         return
 
     # Dedup lista törlése, számlálók megtartása
-    st["replied_event_ids"] = []
+    st.pop("replied_event_ids", None)
 
     # Mentés
     with open(STATE_FILE, "w", encoding="utf-8") as f:
         json.dump(st, f, indent=2)
+    if _exists(REPLIED_LOG_FILE):
+        os.remove(REPLIED_LOG_FILE)
 
     # Visszajelzés
     lines = [
@@ -626,7 +769,7 @@ def _clear_all() -> None:
         return
 
     st = _load_state()
-    replied_ids = st.get("replied_event_ids", [])
+    replied_ids = _replied_ids(st)
 
     # Dupla megerősítés kérése
     print("\n" + "=" * 80)
@@ -653,8 +796,10 @@ def _clear_all() -> None:
         "replied_count": len(replied_ids),
     }
 
-    # State fájl törlése
+    # State fájl (és a replied napló) törlése
     os.remove(STATE_FILE)
+    if _exists(REPLIED_LOG_FILE):
+        os.remove(REPLIED_LOG_FILE)
 
     # Visszajelzés
     lines = [
@@ -743,7 +888,15 @@ def repl() -> None:
             continue
 
         if cmd == "status":
-            _status()
+            if len(parts) >= 2 and parts[1] in ("--watch", "watch"):
+                try:
+                    interval = float(parts[2]) if len(parts) >= 3 else 2.0
+                except ValueError:
+                    _print_card("ERROR", "Usage: status --watch [seconds]")
+                    continue
+                _status_watch(max(interval, 0.5))
+            else:
+                _status()
             continue
 
         if cmd == "run":
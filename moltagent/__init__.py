@@ -23,10 +23,10 @@ from .config import (
     OUTBOUND_LOG,
     OPERATOR_LOG,
 )
-from .state import State, load_state, save_state, ensure_today
-from .policy import load_policy, get_scheduler_config
+from .state import State, load_state, save_state, ensure_today, force_sync_state, start_flush_thread
+from .policy import load_policy, get_scheduler_config, compiled_policy, invalidate_compiled, PolicyView
 from .scheduler import scheduler_check, SchedulerDecision, update_burst_counters
-from .decision import should_reply
+from .decision import should_reply, event_features, clear_phase1_cache
 from .reply import make_outbound_reply, build_prompt, rate_limit
 from .retry import ReplyError, call_with_retry, log_error
 from .hu_summary import hu_event_gist, summarize_en_to_hu_cheap, hu_operator_summary
@@ -36,6 +36,9 @@ from .utils import (
     hour_key_local,
     ensure_dirs,
     append_jsonl,
+    flush_jsonl,
+    close_jsonl,
+    rotate_jsonl_if_needed,
     estimate_tokens,
     estimate_cost_usd,
 )
@@ -54,16 +57,23 @@ __all__ = [
     "State",
     "load_state",
     "save_state",
+    "force_sync_state",
+    "start_flush_thread",
     "ensure_today",
     # policy
     "load_policy",
     "get_scheduler_config",
+    "compiled_policy",
+    "invalidate_compiled",
+    "PolicyView",
     # scheduler
     "scheduler_check",
     "SchedulerDecision",
     "update_burst_counters",
     # decision
     "should_reply",
+    "event_features",
+    "clear_phase1_cache",
     # reply
     "make_outbound_reply",
     "build_prompt",
@@ -82,6 +92,9 @@ __all__ = [
     "hour_key_local",
     "ensure_dirs",
     "append_jsonl",
+    "flush_jsonl",
+    "close_jsonl",
+    "rotate_jsonl_if_needed",
     "estimate_tokens",
     "estimate_cost_usd",
 ]
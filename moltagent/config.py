@@ -26,6 +26,10 @@ DECISION_LOG = os.path.join(LOG_DIR, "decisions.jsonl")
 OUTBOUND_LOG = os.path.join(LOG_DIR, "replies_outbound_en.jsonl")
 OPERATOR_LOG = os.path.join(LOG_DIR, "operator_view_hu.jsonl")
 
+# Méret alapú log rotáció: events.jsonl → events.jsonl.1.gz → .2.gz ...
+LOG_ROTATE_MAX_BYTES = 10 * 1024 * 1024  # 10 MB
+LOG_ROTATE_KEEP = 5  # ennyi tömörített archívumot tartunk meg
+
 # -------------------------
 # COST ESTIMATE (rough, for dry-run)
 # -------------------------
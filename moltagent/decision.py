@@ -1,17 +1,203 @@
 """
 Döntési logika: should_reply + scheduler integráció + budget hard cap.
+
+A döntések előre felépített sablonokból készülnek; a hívó mindig saját
+másolatot kap, így a módosítása nem hat vissza a sablonokra és a memo cache-re.
 """
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
 
+from .config import DEFAULT_MAX_CALLS_PER_DAY
+from .policy import PolicyView, compiled_policy, policy_cache, policy_version
 from .scheduler import scheduler_check, update_burst_counters, SchedulerDecision
 from .state import State, ensure_today
 
 
-def keyword_hit(text_lower: str, keywords: list[str]) -> bool:
+# Az eseményen cache-elt jellemzők kulcsa (lásd event_features)
+FEATURES_KEY = "_features"
+
+# A policy_cache-ben tárolt, policy-ra specializált 1. fázis kulcsa
+CLASSIFIER_KEY = "_classifier"
+
+# SKIP döntések sablonjai - a hívó másolatot kap (lásd should_reply)
+_BLOCKED_KEYWORD_SKIP = {"reply": False, "priority": "P2", "reason": "blocked_keyword_skip"}
+_OFFTOPIC_QUESTION_SKIP = {"reply": False, "priority": "P2", "reason": "offtopic_question_skip"}
+_NOT_RELEVANT = {"reply": False, "priority": "P2", "reason": "not_relevant"}
+_P2_HOUR_CAP = {"reply": False, "priority": "P2", "reason": "p2_hour_cap"}
+_DUPLICATE_EVENT = {"reply": False, "priority": "P2", "reason": "duplicate_event"}
+
+# Válasz döntések sablonjai - ezekből másolat készül, mert a scheduler info
+# hozzáadódik a döntéshez
+_MENTION = {"reply": True, "priority": "P0", "reason": "mention", "mode": "normal"}
+_RELEVANT_QUESTION = {"reply": True, "priority": "P1", "reason": "relevant_question", "mode": "normal"}
+_OFFTOPIC_REDIRECT = {"reply": True, "priority": "P2", "reason": "offtopic_question_redirect", "mode": "redirect"}
+_RELEVANT_STATEMENT = {"reply": True, "priority": "P2", "reason": "relevant_statement", "mode": "normal"}
+
+
+def keyword_hit(text_lower: str, keywords: Iterable[str]) -> bool:
     """Ellenőrzi, hogy a szöveg tartalmaz-e bármelyik kulcsszót."""
-    return any(k in text_lower for k in keywords)
+    for k in keywords:
+        if k in text_lower:
+            return True
+    return False
+
+
+def _ends_with_q(s: str) -> bool:
+    """Az utolsó nem-whitespace karakter '?' (strip() másolat nélkül)."""
+    i = len(s) - 1
+    while i >= 0 and s[i].isspace():
+        i -= 1
+    return i >= 0 and s[i] == "?"
+
+
+class _Features(dict):
+    """
+    Esemény jellemzők dict-je, lusta "text_lower" kulccsal.
+
+    A kisbetűs szöveg csak az első features["text_lower"] hozzáféréskor
+    számolódik ki (pl. mention esetén, üres block listával el sem készül).
+    Figyelem: a .get("text_lower") nem váltja ki a számolást.
+    """
+
+    __slots__ = ()
+
+    def __missing__(self, key: str) -> Any:
+        if key != "text_lower":
+            raise KeyError(key)
+        value = self["text"].lower()
+        self["text_lower"] = value
+        return value
+
+
+def event_features(event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Esemény jellemzők (kisbetűs szöveg, meta jelzők).
+
+    Az eredményt az eseményen cache-eljük (FEATURES_KEY alatt), így ha ugyanazt
+    az eseményt többször dolgozzuk fel (pl. ingestion + döntés, újrapróbálás),
+    a kisbetűsítés nem fut le újra. A cache-elt jellemzők csak akkor
+    használhatók, ha a szöveg és a meta jelzők azóta nem változtak - a helyben
+    szerkesztett esemény új jellemzőket kap. A text_lower lusta (lásd _Features).
+
+    Returns:
+        {text, text_lower, mentions_me, is_question}
+    """
+    text = event.get("text") or ""
+    meta = event.get("meta") or {}
+    mentions_me = bool(meta.get("mentions_me"))
+    is_question = bool(meta.get("is_question")) or _ends_with_q(text)
+
+    features = event.get(FEATURES_KEY)
+    if (
+        features is not None
+        and features["text"] == text
+        and features["mentions_me"] == mentions_me
+        and features["is_question"] == is_question
+    ):
+        return features
+
+    features = _Features(text=text, mentions_me=mentions_me, is_question=is_question)
+    event[FEATURES_KEY] = features
+    return features
+
+
+def _build_classifier(view: PolicyView) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Az 1. fázis (prioritás meghatározás) policy-ra specializált változata.
+
+    A policy ritkán változik, ezért a szabályokat egyszer "fordítjuk le":
+    a kikapcsolt szabályok és az üres kulcsszólisták ellenőrzése bele sem
+    kerül az eseményenként futó függvénybe, a konstansok closure-ben vannak.
+
+    A visszaadott függvény a megosztott döntés sablonok egyikét adja vissza
+    (csak olvasható!).
+    """
+    block_kw = view.block_keywords
+    allow_kw = view.allow_keywords
+    check_mentions = view.reply_to_mentions_always
+    check_questions = view.reply_to_questions_always
+    if view.offtopic_question_mode == "redirect":
+        offtopic_question = _OFFTOPIC_REDIRECT
+    else:
+        offtopic_question = _OFFTOPIC_QUESTION_SKIP
+
+    def classify(features: Dict[str, Any]) -> Dict[str, Any]:
+        # A text_lower lusta: csak akkor számolódik, ha kulcsszót kell keresni
+        # Blocked keyword → SKIP (ne spameljük az elutasításokat)
+        if block_kw and keyword_hit(features["text_lower"], block_kw):
+            return _BLOCKED_KEYWORD_SKIP
+        # Mention → P0
+        if check_mentions and features["mentions_me"]:
+            return _MENTION
+        # Question → P1 ha releváns, különben redirect (P2) vagy skip
+        if check_questions and features["is_question"]:
+            if allow_kw and keyword_hit(features["text_lower"], allow_kw):
+                return _RELEVANT_QUESTION
+            return offtopic_question
+        # Non-question, relevant → P2
+        if allow_kw and keyword_hit(features["text_lower"], allow_kw):
+            return _RELEVANT_STATEMENT
+        return _NOT_RELEVANT
+
+    return classify
+
+
+def _classifier_for(policy: Dict[str, Any]) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """A policy-hoz tartozó classifier (első használatkor épül, policy_cache-ben tárolva)."""
+    cache = policy_cache(policy)
+    classify = cache.get(CLASSIFIER_KEY)
+    if classify is None:
+        classify = _build_classifier(compiled_policy(policy))
+        cache[CLASSIFIER_KEY] = classify
+    return classify
+
+
+# 1. fázis eredményei (event_id, policy verzió, szöveg, meta jelzők) szerint,
+# hogy ugyanannak az eseménynek az újra-vizsgálata (pl. újra letöltött, még
+# nem megválaszolt esemény) ne fusson le újra. LRU, PHASE1_CACHE_SIZE elemig.
+PHASE1_CACHE_SIZE = 4096
+_phase1_cache: "OrderedDict[Tuple[Any, ...], Dict[str, Any]]" = OrderedDict()
+
+
+def clear_phase1_cache() -> None:
+    """Üríti az 1. fázis memo cache-t."""
+    _phase1_cache.clear()
+
+
+def _classify(event: Dict[str, Any], policy: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    1. fázis (prioritás) memoizálva.
+
+    Csak a policy-tól és az esemény tartalmától függ, az állapottól nem, így
+    a budget/scheduler/óránkénti cap fázisok minden hívásnál újra futnak.
+    A kulcsban a szöveg is szerepel, így a szerkesztett esemény újra osztályozódik.
+    Azonosító nélkül nem cache-elünk.
+    """
+    classify = _classifier_for(policy)
+    event_id = event.get("id")
+    if not event_id:
+        return classify(event_features(event))
+
+    meta = event.get("meta") or {}
+    key = (
+        event_id,
+        policy_version(policy),
+        event.get("text") or "",
+        bool(meta.get("mentions_me")),
+        bool(meta.get("is_question")),
+    )
+    classified = _phase1_cache.get(key)
+    if classified is not None:
+        _phase1_cache.move_to_end(key)
+        return classified
+
+    classified = classify(event_features(event))
+    _phase1_cache[key] = classified
+    if len(_phase1_cache) > PHASE1_CACHE_SIZE:
+        _phase1_cache.popitem(last=False)
+    return classified
 
 
 def _check_budget(
@@ -29,35 +215,31 @@ def _check_budget(
     Returns:
         None ha OK, egyébként SKIP döntés dict.
     """
+    # Élőben a dict-ből (nem a compiled_policy nézetből): a költségkorlát a
+    # helyben módosított policy-t is azonnal kövesse
     daily_budget = float(policy.get("daily_budget_usd", 1.0))
-    max_calls = int(policy.get("max_calls_per_day", 200))
-
-    budget_info = {
-        "spent_usd": state.spent_usd,
-        "daily_budget_usd": daily_budget,
-        "calls_today": state.calls_today,
-        "max_calls_per_day": max_calls,
-    }
+    max_calls = int(policy.get("max_calls_per_day", DEFAULT_MAX_CALLS_PER_DAY))
 
-    # USD limit ellenőrzés
+    # USD limit, majd hívásszám limit ellenőrzés
     if state.spent_usd >= daily_budget:
-        return {
-            "reply": False,
-            "priority": priority,
-            "reason": "budget_exhausted",
-            "budget": budget_info,
-        }
-
-    # Hívásszám limit ellenőrzés
-    if state.calls_today >= max_calls:
-        return {
-            "reply": False,
-            "priority": priority,
-            "reason": "daily_calls_cap",
-            "budget": budget_info,
-        }
+        reason = "budget_exhausted"
+    elif state.calls_today >= max_calls:
+        reason = "daily_calls_cap"
+    else:
+        return None
 
-    return None
+    # A budget info csak SKIP esetén épül fel
+    return {
+        "reply": False,
+        "priority": priority,
+        "reason": reason,
+        "budget": {
+            "spent_usd": state.spent_usd,
+            "daily_budget_usd": daily_budget,
+            "calls_today": state.calls_today,
+            "max_calls_per_day": max_calls,
+        },
+    }
 
 
 def _check_soft_cap(
@@ -78,7 +260,7 @@ def _check_soft_cap(
     if priority in ("P0", "P1"):
         return None
 
-    daily_budget = float(policy.get("daily_budget_usd", 1.0))
+    daily_budget = float(policy.get("daily_budget_usd", 1.0))  # élőben, lásd _check_budget
     soft_cap_threshold = daily_budget * 0.80
 
     if state.spent_usd >= soft_cap_threshold:
@@ -127,79 +309,16 @@ def should_reply(
     # --- 0. fázis: Idempotencia ellenőrzés ---
     event_id = event.get("id")
     if event_id and state.has_replied(event_id):
-        return {
-            "reply": False,
-            "priority": "P2",
-            "reason": "duplicate_event",
-            "original_event_id": event_id,
-        }
-
-    text = event.get("text") or ""
-    text_lower = text.lower()
-
-    meta = event.get("meta") or {}
-    mentions_me = bool(meta.get("mentions_me"))
-    is_question = bool(meta.get("is_question")) or text.strip().endswith("?")
-
-    allow_kw = [k.lower() for k in policy.get("topics", {}).get("allow_keywords", [])]
-    block_kw = [k.lower() for k in policy.get("topics", {}).get("block_keywords", [])]
+        return {**_DUPLICATE_EVENT, "original_event_id": event_id}
 
     # --- 1. fázis: Alapvető döntés (priority meghatározása) ---
+    # Policy-ra specializált classifier (lásd _build_classifier), memoizálva
+    # Másolat: a sablon / memo bejegyzés közös, a hívó (és a scheduler info) módosíthatja
+    base_decision = _classify(event, policy).copy()
+    if not base_decision["reply"]:
+        return base_decision
 
-    # Blocked keyword → SKIP (ne spameljük az elutasításokat)
-    if keyword_hit(text_lower, block_kw):
-        return {
-            "reply": False,
-            "priority": "P2",
-            "reason": "blocked_keyword_skip",
-        }
-    # Mention → P0
-    elif mentions_me and policy.get("reply", {}).get("reply_to_mentions_always", True):
-        priority = "P0"
-        base_decision = {
-            "reply": True,
-            "priority": priority,
-            "reason": "mention",
-            "mode": "normal",
-        }
-    # Question
-    elif is_question and policy.get("reply", {}).get("reply_to_questions_always", True):
-        relevant = keyword_hit(text_lower, allow_kw)
-        if relevant:
-            priority = "P1"
-            base_decision = {
-                "reply": True,
-                "priority": priority,
-                "reason": "relevant_question",
-                "mode": "normal",
-            }
-        else:
-            mode = policy.get("reply", {}).get("offtopic_question_mode", "redirect")
-            if mode == "redirect":
-                priority = "P2"
-                base_decision = {
-                    "reply": True,
-                    "priority": priority,
-                    "reason": "offtopic_question_redirect",
-                    "mode": "redirect",
-                }
-            else:
-                return {
-                    "reply": False,
-                    "priority": "P2",
-                    "reason": "offtopic_question_skip",
-                }
-    # Non-question, relevant
-    elif keyword_hit(text_lower, allow_kw):
-        priority = "P2"
-        base_decision = {
-            "reply": True,
-            "priority": priority,
-            "reason": "relevant_statement",
-            "mode": "normal",
-        }
-    else:
-        return {"reply": False, "priority": "P2", "reason": "not_relevant"}
+    priority = base_decision["priority"]
 
     # --- 1.5 fázis: Budget ellenőrzés (SPEC §7) ---
     budget_skip = _check_budget(state, policy, priority)
@@ -237,9 +356,8 @@ def should_reply(
 
     # --- 3. fázis: P2 hourly cap ---
     if priority == "P2" and base_decision.get("mode") == "normal":
-        max_p2 = int(policy.get("reply", {}).get("max_replies_per_hour_p2", 2))
-        if state.p2_replies_this_hour >= max_p2:
-            return {"reply": False, "priority": "P2", "reason": "p2_hour_cap"}
+        if state.p2_replies_this_hour >= compiled_policy(policy).max_replies_per_hour_p2:
+            return _P2_HOUR_CAP.copy()
 
     # Scheduler info hozzáadása a döntéshez
     base_decision["scheduler"] = {
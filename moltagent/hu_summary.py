@@ -5,177 +5,210 @@ from __future__ import annotations
 
 from typing import Any, Dict, Optional
 
-
-def hu_event_gist(event_text: str) -> str:
+from .decision import event_features
+
+
+# --- Detektor táblák: (címke, kulcsszavak) ---
+# A szöveget egyszer kisbetűsítjük, és egyetlen menetben végigmegyünk a táblán:
+# az eredmény a talált címkék halmaza, a döntések ezen a halmazon futnak.
+
+# Bejövő esemény szövegének témái (hu_event_gist + summarize_en_to_hu_cheap)
+_EVENT_TAGS = (
+    ("secret", ("api key", "password", "secret", "token", "private key", "seed phrase")),
+    ("spending", ("cap spending", "drain credits", "spending", "credits", "billing")),
+    ("budget", ("budget",)),
+    ("rate_limit", ("rate limit", "rate limiting")),
+    ("rate", ("rate",)),
+    ("python", ("python",)),
+    ("agents", ("agents",)),
+    ("moltbook", ("moltbook",)),
+    ("memory", ("memory", "leak", "privacy", "pii")),
+    ("favorite_movie", ("favorite movie",)),
+    ("movie", ("movie",)),
+    ("template", ("policy template", "template", "what to reply", "reply policy", "response template")),
+)
+
+# EN válasz pontjai: azonosító → HU pont szövege (az azonosító egyben a kimeneti sorrend)
+(
+    _P_RATE_LIMIT,
+    _P_BUDGET,
+    _P_RULES,
+    _P_INTEGRATION,
+    _P_LOGGING,
+    _P_VERIFY,
+    _P_REJECT,
+    _P_TEMPLATES,
+) = range(8)
+
+_POINT_TEXT = (
+    "Állíts be híváskorlátot (rate limit), hogy ne tudjon túl gyorsan sok kérést küldeni.",
+    "Adj meg napi költési keretet (daily budget/spend cap), és állítsd meg a futást a keret elérésekor.",
+    "Rögzítsd egyértelműen, mit szabad és mit tilos csinálnia (szabályok + jogosultságok).",
+    "Az integrációknál kezeld külön a hitelesítést (API/auth), és tesztelj izolált környezetben.",
+    "Legyen naplózás/monitorozás, hogy visszakövethető legyen: mi történt és miért.",
+    "Ha bizonytalan a platform mezőiben/feature-eiben, jelezze és javasoljon ellenőrzést a dokumentációban/UI-ban.",
+    "Keret túllépésnél utasítsa el a kérést és adjon egyértelmű hibát (ne próbálja újra végtelenül).",
+    "Kezdésnek érdemes sablonokat készíteni: cél/feladat, hangnem, engedélyezett eszközök, teszt promptok.",
+)
+
+_POINT_DETECTORS = (
+    (_P_RATE_LIMIT, ("rate limit", "rate limiting", "requests per", "request/sec", "rps", "token-bucket", "fixed-window", "throttle")),
+    (_P_BUDGET, ("daily budget", "spend cap", "cap spending", "daily spend", "budget")),
+    (_P_RULES, ("permissions", "allowed", "disallowed", "policy", "rules", "guardrails")),
+    (_P_INTEGRATION, ("integration", "webhook", "api", "auth", "authentication")),
+    (_P_LOGGING, ("audit", "logging", "log", "monitor", "monitoring", "trace", "observability")),
+    (_P_VERIFY, ("verify", "check", "if unsure", "unknown", "not sure")),
+    (_P_REJECT, ("reject", "return a clear error", "clear error", "error")),
+    (_P_TEMPLATES, ("template", "templates", "starter", "minimal setup")),
+)
+
+# Eseményfüggő pont-prioritások (azonosítók, előrébb = fontosabb)
+_ORDER_BUDGET = (_P_BUDGET, _P_REJECT, _P_LOGGING, _P_RATE_LIMIT)
+_ORDER_PYTHON_RATE = (_P_RATE_LIMIT, _P_TEMPLATES, _P_LOGGING)
+_ORDER_TEMPLATE = (_P_TEMPLATES, _P_RULES, _P_LOGGING, _P_BUDGET, _P_RATE_LIMIT)
+_ORDER_MOLTBOOK_AGENTS = (_P_TEMPLATES, _P_RULES, _P_INTEGRATION, _P_RATE_LIMIT, _P_BUDGET)
+_ORDER_MEMORY = (_P_RULES, _P_LOGGING, _P_VERIFY)
+
+
+def _rank(order: tuple) -> tuple:
+    """Rendezési kulcs pontonként: előbb a prioritási sorrend, utána a többi eredeti sorrendben."""
+    return tuple(
+        order.index(pid) if pid in order else len(order) + pid
+        for pid in range(len(_POINT_TEXT))
+    )
+
+
+# Azon ágak rendezési kulcsai, ahol a prioritás után a többi pont is jöhet
+_RANK_BUDGET = _rank(_ORDER_BUDGET)
+_RANK_TEMPLATE = _rank(_ORDER_TEMPLATE)
+_RANK_MOLTBOOK_AGENTS = _rank(_ORDER_MOLTBOOK_AGENTS)
+
+# Titok/kulcs kérés: fix összefoglaló (elutasítás + biztonságos alternatíva)
+_SECRET_SUMMARY = " | ".join((
+    "Bizalmas adatot/kulcsot nem adunk ki; rövid elutasítás.",
+    "Adj biztonságos alternatívát: hogyan hozzon létre saját kulcsot + hogyan tárolja (env/.env, secret manager).",
+))
+
+
+def _scan(text_lower: str, table) -> list:
+    """Egy menet a detektor táblán: a talált címkék (tábla sorrendben)."""
+    found = []
+    for tag, keywords in table:
+        for k in keywords:
+            if k in text_lower:
+                found.append(tag)
+                break
+    return found
+
+
+def _join_points(point_ids: list, limit: int) -> str:
+    """Az első `limit` pont HU szövege, " | " elválasztóval."""
+    return " | ".join(_POINT_TEXT[pid] for pid in point_ids[:limit])
+
+
+def hu_event_gist(event_text: str, text_lower: Optional[str] = None) -> str:
     """
     0 extra költség: HU kivonat a bejövő event szövegéről.
     Nem fordít szó szerint, csak témacímkéz + 1 mondat.
+
+    text_lower: az esemény már kisbetűsített szövege (event_features), ha van.
     """
     t = (event_text or "").strip()
-    tl = t.lower()
+    tags = set(_scan(t.lower() if text_lower is None else text_lower, _EVENT_TAGS))
 
-    if any(k in tl for k in ["api key", "password", "secret", "token", "private key", "seed phrase"]):
+    if "secret" in tags:
         return "Bizalmas adatot kér (kulcs/jelszó) – ezt el kell utasítani."
-    if "cap spending" in tl or "drain credits" in tl or "spending" in tl or "credits" in tl or "billing" in tl:
+    if "spending" in tags:
         return "Kérdés a költési limitről / napi keretről (credit budget)."
-    if "rate limit" in tl or "rate limiting" in tl or ("python" in tl and "rate" in tl):
+    if "rate_limit" in tags or ("python" in tags and "rate" in tags):
         return "Kérdés a híváskorlátozásról (rate limit), Python példával."
-    if "agents" in tl and "moltbook" in tl:
+    if "agents" in tags and "moltbook" in tags:
         return "Általános kérdés: Moltbook ügynökök – mire jók, hogyan érdemes kezdeni."
-    if "memory" in tl or "leak" in tl or "privacy" in tl or "pii" in tl:
+    if "memory" in tags:
         return "Kérdés az ügynök memóriájáról / adatvédelemről (ne szivárogjon adat)."
-    if "favorite movie" in tl or "movie" in tl:
+    if "movie" in tags:
         return "Off-topic kérdés (kedvenc film) – udvarias visszaterelés kell."
     if t.endswith("?"):
         return "Általános kérdés – a bot valószínűleg rövid, praktikus választ ad."
     return "Általános bejegyzés/komment – relevancia alapján döntünk."
 
 
-def summarize_en_to_hu_cheap(reply_en: str, event_text: str) -> str:
+def summarize_en_to_hu_cheap(
+    reply_en: str,
+    event_text: str,
+    text_lower: Optional[str] = None,
+) -> str:
     """
     0 extra költség: magyar operator kivonat az EN válaszból, EVENT-SPECIFIKUSAN.
     Nem fordít szó szerint; 2-3 releváns HU pontot ad.
-    """
-    txt = (reply_en or "").strip().lower()
-    et = (event_text or "").strip().lower()
-
-    points = []
 
+    text_lower: az esemény már kisbetűsített szövege (event_features), ha van.
+    """
     # --- Candidate points (detectors) ---
-    if any(k in txt for k in ["rate limit", "rate limiting", "requests per", "request/sec", "rps", "token-bucket", "fixed-window", "throttle"]):
-        points.append("Állíts be híváskorlátot (rate limit), hogy ne tudjon túl gyorsan sok kérést küldeni.")
-
-    if any(k in txt for k in ["daily budget", "spend cap", "cap spending", "daily spend", "budget"]):
-        points.append("Adj meg napi költési keretet (daily budget/spend cap), és állítsd meg a futást a keret elérésekor.")
-
-    if any(k in txt for k in ["permissions", "allowed", "disallowed", "policy", "rules", "guardrails"]):
-        points.append("Rögzítsd egyértelműen, mit szabad és mit tilos csinálnia (szabályok + jogosultságok).")
-
-    if any(k in txt for k in ["integration", "webhook", "api", "auth", "authentication"]):
-        points.append("Az integrációknál kezeld külön a hitelesítést (API/auth), és tesztelj izolált környezetben.")
-
-    if any(k in txt for k in ["audit", "logging", "log", "monitor", "monitoring", "trace", "observability"]):
-        points.append("Legyen naplózás/monitorozás, hogy visszakövethető legyen: mi történt és miért.")
-
-    if any(k in txt for k in ["verify", "check", "if unsure", "unknown", "not sure"]):
-        points.append("Ha bizonytalan a platform mezőiben/feature-eiben, jelezze és javasoljon ellenőrzést a dokumentációban/UI-ban.")
-
-    if any(k in txt for k in ["reject", "return a clear error", "clear error", "error"]):
-        points.append("Keret túllépésnél utasítsa el a kérést és adjon egyértelmű hibát (ne próbálja újra végtelenül).")
-
-    if any(k in txt for k in ["template", "templates", "starter", "minimal setup"]):
-        points.append("Kezdésnek érdemes sablonokat készíteni: cél/feladat, hangnem, engedélyezett eszközök, teszt promptok.")
+    hit_ids = _scan((reply_en or "").lower(), _POINT_DETECTORS)
+    if text_lower is None:
+        text_lower = (event_text or "").lower()
+    et = set(_scan(text_lower, _EVENT_TAGS))
 
     # --- Event-specific prioritization ---
     # If off-topic movie question: keep only redirect-related points (or a single one)
-    if "favorite movie" in et or ("movie" in et and "moltbook" not in et):
+    if "favorite_movie" in et or ("movie" in et and "moltbook" not in et):
         return "Off-topic kérdés: udvarias visszaterelés a Moltbook ügynök témára (setup, szabályok, biztonság, költségkontroll)."
 
     # If secrets requested: focus on refusal & safe alternative
-    if any(k in et for k in ["api key", "password", "secret", "token", "private key", "seed phrase"]):
-        p = [
-            "Bizalmas adatot/kulcsot nem adunk ki; rövid elutasítás.",
-            "Adj biztonságos alternatívát: hogyan hozzon létre saját kulcsot + hogyan tárolja (env/.env, secret manager)."
-        ]
-        return " | ".join(p)
+    if "secret" in et:
+        return _SECRET_SUMMARY
 
     # Spending/budget question: prefer budget + reject + monitoring, then rate limit
-    if any(k in et for k in ["cap spending", "drain credits", "spending", "credits", "billing", "budget"]):
-        ordered = []
-        for key in [
-            "Adj meg napi költési keretet",
-            "Keret túllépésnél utasítsa el",
-            "Legyen naplózás/monitorozás",
-            "Állíts be híváskorlátot",
-        ]:
-            for p in points:
-                if key in p and p not in ordered:
-                    ordered.append(p)
-        for p in points:
-            if p not in ordered:
-                ordered.append(p)
-        if not ordered:
+    if "spending" in et or "budget" in et:
+        if not hit_ids:
             return "Költségkontroll: napi keret + híváskorlát + túlköltésnél leállítás/hiba."
-        return " | ".join(ordered[:3])
+        return _join_points(sorted(hit_ids, key=_RANK_BUDGET.__getitem__), 3)
 
     # Python rate limit question
-    if "python" in et and any(k in et for k in ["rate", "rate limit", "rate limiting"]):
-        ordered = []
-        for key in [
-            "Állíts be híváskorlátot",
-            "Kezdésnek érdemes sablonokat",
-            "Legyen naplózás/monitorozás",
-        ]:
-            for p in points:
-                if key in p and p not in ordered:
-                    ordered.append(p)
+    if "python" in et and "rate" in et:
+        ordered = [pid for pid in _ORDER_PYTHON_RATE if pid in hit_ids]
         if not ordered:
             return "Python híváskorlát: egyszerű limiter (token bucket / fixed window) + naplózás."
-        return " | ".join(ordered[:2])
+        return _join_points(ordered, 2)
 
     # Policy/template question
-    if any(k in et for k in ["policy template", "template", "what to reply", "reply policy", "response template"]):
-        ordered = []
-        for key in [
-            "Kezdésnek érdemes sablonokat készíteni",
-            "Rögzítsd egyértelműen, mit szabad",
-            "Legyen naplózás/monitorozás",
-            "Adj meg napi költési keretet",
-            "Állíts be híváskorlátot",
-        ]:
-            for p in points:
-                if key in p and p not in ordered:
-                    ordered.append(p)
-        for p in points:
-            if p not in ordered:
-                ordered.append(p)
-        if not ordered:
+    if "template" in et:
+        if not hit_ids:
             return "Válasz-sablon/policy: engedélyezett témák + tiltott témák + hangnem + eszkaláció + költségkorlátok."
-        return " | ".join(ordered[:3])
+        return _join_points(sorted(hit_ids, key=_RANK_TEMPLATE.__getitem__), 3)
 
     # General Moltbook agents question
     if "moltbook" in et and "agents" in et:
-        ordered = []
-        for key in [
-            "Kezdésnek érdemes sablonokat",
-            "Rögzítsd egyértelműen, mit szabad",
-            "Az integrációknál kezeld külön",
-            "Állíts be híváskorlátot",
-            "Adj meg napi költési keretet",
-        ]:
-            for p in points:
-                if key in p and p not in ordered:
-                    ordered.append(p)
-        for p in points:
-            if p not in ordered:
-                ordered.append(p)
-        if not ordered:
+        if not hit_ids:
             return "Kezdés: sablonok + szabályok/jogosultságok + fokozatos tesztelés + költségkontroll."
-        return " | ".join(ordered[:3])
+        return _join_points(sorted(hit_ids, key=_RANK_MOLTBOOK_AGENTS.__getitem__), 3)
 
     # Memory/privacy
-    if any(k in et for k in ["memory", "privacy", "pii", "leak"]):
-        ordered = []
-        for key in [
-            "Rögzítsd egyértelműen, mit szabad",
-            "Legyen naplózás/monitorozás",
-            "Ha bizonytalan a platform",
-        ]:
-            for p in points:
-                if key in p and p not in ordered:
-                    ordered.append(p)
+    if "memory" in et:
+        ordered = [pid for pid in _ORDER_MEMORY if pid in hit_ids]
         if not ordered:
             return "Adatvédelem: minimalizálás + szabályok/jogosultságok + naplózás."
-        return " | ".join(ordered[:3])
+        return _join_points(ordered, 3)
 
     # Fallback
-    if not points:
+    if not hit_ids:
         first = (reply_en or "").strip().splitlines()[0] if reply_en else ""
         if len(first) > 160:
             first = first[:157] + "..."
         return f"Lényeg: rövid technikai válasz. (EN alapján: {first})"
 
-    return " | ".join(points[:3])
+    return _join_points(hit_ids, 3)
+
+
+# Operator összefoglaló sablon; az opcionális szakaszok "\n"-nel kezdődnek, vagy üresek
+_OPERATOR_TMPL = (
+    "Esemény: {etype} / {author}\n"
+    "Tartalom (röviden): {snippet}\n"
+    "Esemény lényege (HU): {gist}\n"
+    "Döntés: {verdict} | Prioritás: {prio} | Ok: {reason}"
+    "{duplicate}{budget}{scheduler}{reply_gist}"
+)
 
 
 def hu_operator_summary(
@@ -186,47 +219,51 @@ def hu_operator_summary(
     """
     Teljes magyar operator összefoglaló generálása.
     """
-    etype = event.get("type")
-    author = event.get("author")
     text = (event.get("text") or "").strip()
-
+    # A döntésnél már kiszámolt kisbetűs szöveg (nem számoljuk újra)
+    text_lower = event_features(event)["text_lower"]
     reason = decision.get("reason")
-    prio = decision.get("priority")
-    did = decision.get("reply")
-
-    snippet = text if len(text) <= 120 else text[:117] + "..."
-
-    lines = []
-    lines.append(f"Esemény: {etype} / {author}")
-    lines.append(f"Tartalom (röviden): {snippet}")
-    lines.append(f"Esemény lényege (HU): {hu_event_gist(text)}")
-    lines.append(f"Döntés: {'VÁLASZ' if did else 'SKIP'} | Prioritás: {prio} | Ok: {reason}")
 
     # Idempotencia: duplicate event jelzése
+    duplicate = ""
     if reason == "duplicate_event":
         orig_id = decision.get("original_event_id", event.get("id"))
-        lines.append(f"Idempotencia: már válaszoltunk erre az eseményre ({orig_id})")
+        duplicate = f"\nIdempotencia: már válaszoltunk erre az eseményre ({orig_id})"
 
     # Budget info ha van (SPEC §7)
+    budget_line = ""
     budget = decision.get("budget")
     if budget:
         if reason == "budget_exhausted":
-            lines.append(f"Budget: LIMIT ELÉRVE - elköltött: ${budget['spent_usd']:.4f} / ${budget['daily_budget_usd']:.2f}")
+            budget_line = f"\nBudget: LIMIT ELÉRVE - elköltött: ${budget['spent_usd']:.4f} / ${budget['daily_budget_usd']:.2f}"
         elif reason == "daily_calls_cap":
-            lines.append(f"Budget: HÍVÁSSZÁM LIMIT - hívások: {budget['calls_today']} / {budget['max_calls_per_day']}")
+            budget_line = f"\nBudget: HÍVÁSSZÁM LIMIT - hívások: {budget['calls_today']} / {budget['max_calls_per_day']}"
 
     # Scheduler info ha van
+    sched_line = ""
     sched = decision.get("scheduler")
     if sched:
         if sched.get("wait_seconds"):
-            lines.append(f"Scheduler: várakozás {sched['wait_seconds']:.1f}s (dry-run: nem alszunk)")
+            sched_line = f"\nScheduler: várakozás {sched['wait_seconds']:.1f}s (dry-run: nem alszunk)"
         elif sched.get("used_burst"):
-            lines.append(f"Scheduler: burst használva ({sched.get('burst_type', '?')})")
+            sched_line = f"\nScheduler: burst használva ({sched.get('burst_type', '?')})"
         elif sched.get("reason"):
-            lines.append(f"Scheduler: {sched['reason']}")
+            sched_line = f"\nScheduler: {sched['reason']}"
 
+    reply_gist = ""
     if reply_en:
-        gist_hu = summarize_en_to_hu_cheap(reply_en, text)
-        lines.append(f"Válasz lényege (HU): {gist_hu}")
-
-    return "\n".join(lines)
+        reply_gist = f"\nVálasz lényege (HU): {summarize_en_to_hu_cheap(reply_en, text, text_lower)}"
+
+    return _OPERATOR_TMPL.format_map({
+        "etype": event.get("type"),
+        "author": event.get("author"),
+        "snippet": text if len(text) <= 120 else text[:117] + "...",
+        "gist": hu_event_gist(text, text_lower),
+        "verdict": "VÁLASZ" if decision.get("reply") else "SKIP",
+        "prio": decision.get("priority"),
+        "reason": reason,
+        "duplicate": duplicate,
+        "budget": budget_line,
+        "scheduler": sched_line,
+        "reply_gist": reply_gist,
+    })
@@ -11,13 +11,23 @@ from __future__ import annotations
 
 import json
 import logging
+import atexit
+import bisect
 import os
+import queue
+import threading
+import time
+from collections import deque
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Deque, Dict, Iterator, List, Optional
 
 from .config import LOG_DIR
-from .utils import append_jsonl
+from .policy import compiled_policy
+from .utils import append_jsonl, jsonl_line
+
+if TYPE_CHECKING:
+    from .state import State
 
 logger = logging.getLogger(__name__)
 
@@ -25,8 +35,93 @@ logger = logging.getLogger(__name__)
 MONITORING_LOG = os.path.join(LOG_DIR, "monitoring.jsonl")
 DAILY_SUMMARY_LOG = os.path.join(LOG_DIR, "daily_summary.jsonl")
 
+# Last formatted UTC timestamp: [epoch seconds, ISO string]
+_ts_cache: List[Any] = [0.0, ""]
+
+
+def _now_iso() -> str:
+    """UTC ISO timestamp, re-formatted at most once per second."""
+    t = time.time()
+    if abs(t - _ts_cache[0]) >= 1.0:
+        _ts_cache[:] = [t, datetime.fromtimestamp(t, timezone.utc).isoformat()]
+    return _ts_cache[1]
+
+
+# Background writer for monitoring records: the poll loop only enqueues,
+# a daemon thread batches the writes (one open() per file per batch).
+_LOG_BATCH_MAX = 64
+_log_q: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+_log_thread: Optional[threading.Thread] = None
+_log_thread_lock = threading.Lock()
+
+
+def _write_batch(batch: List[Any]) -> None:
+    """Write queued (path, entry) records grouped by file; release flush markers."""
+    by_path: Dict[str, List[bytes]] = {}
+    markers = []
+    for item in batch:
+        if isinstance(item, threading.Event):
+            markers.append(item)
+            continue
+        path, entry = item
+        by_path.setdefault(path, []).append(jsonl_line(entry))
+    for path, lines in by_path.items():
+        try:
+            with open(path, "ab") as f:
+                f.writelines(lines)
+        except OSError as e:
+            logger.error("Monitoring log write failed (%s): %s", path, e)
+    for marker in markers:
+        marker.set()
+
+
+def _log_worker() -> None:
+    """Drain the queue forever: block for one record, then take up to a batch."""
+    while True:
+        batch = [_log_q.get()]
+        while len(batch) < _LOG_BATCH_MAX:
+            try:
+                batch.append(_log_q.get_nowait())
+            except queue.Empty:
+                break
+        _write_batch(batch)
+
+
+def _enqueue_jsonl(path: str, entry: Dict[str, Any]) -> None:
+    """Queue a JSONL record for the background writer (started lazily)."""
+    global _log_thread
+    if _log_thread is None:
+        with _log_thread_lock:
+            if _log_thread is None:
+                _log_thread = threading.Thread(
+                    target=_log_worker, name="monitoring-log-writer", daemon=True
+                )
+                _log_thread.start()
+    _log_q.put((path, entry))
+
+
+def flush_monitoring_logs(timeout: float = 5.0) -> bool:
+    """
+    Wait until every record queued so far is written.
+
+    Returns:
+        True if the writer caught up within timeout (or was never started)
+    """
+    if _log_thread is None:
+        return True
+    marker = threading.Event()
+    _log_q.put(marker)
+    return marker.wait(timeout)
+
+
+atexit.register(flush_monitoring_logs)
 
-@dataclass
+
+# Counters error_rate is computed from (assigning one drops the memo)
+_ERROR_RATE_FIELDS = frozenset(("total_replied", "total_skipped", "total_errors"))
+
+
+@dataclass(slots=True)
 class DaemonStats:
     """Statistics for the daemon session."""
 
@@ -38,6 +133,8 @@ class DaemonStats:
     total_errors: int = 0
     budget_warnings: int = 0
     last_cycle_ts: str = ""
+    # Highest budget warning threshold (%) already reported today
+    last_budget_warning_pct: int = 0
 
     # Per-day tracking
     day_key: str = ""
@@ -46,10 +143,22 @@ class DaemonStats:
     day_errors: int = 0
     day_spent_usd: float = 0.0
 
-    # Error tracking (last N errors)
-    recent_errors: List[Dict[str, Any]] = field(default_factory=list)
+    # Error tracking (last N errors, bounded deque)
+    recent_errors: Deque[Dict[str, Any]] = field(default_factory=deque)
     max_recent_errors: int = 10
 
+    # Memoized error_rate; reset whenever one of _ERROR_RATE_FIELDS is assigned
+    _error_rate_cache: Optional[float] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # Bound the buffer so appends evict the oldest entry in O(1)
+        self.recent_errors = deque(self.recent_errors, maxlen=self.max_recent_errors)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        object.__setattr__(self, name, value)
+        if name in _ERROR_RATE_FIELDS:
+            object.__setattr__(self, "_error_rate_cache", None)
+
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for logging."""
         return {
@@ -71,21 +180,35 @@ class DaemonStats:
 
     @property
     def error_rate(self) -> float:
-        """Calculate error rate as percentage."""
-        total = self.total_replied + self.total_skipped + self.total_errors
-        if total == 0:
-            return 0.0
-        return (self.total_errors / total) * 100
+        """Error rate as percentage (cached until one of its counters changes)."""
+        rate = self._error_rate_cache
+        if rate is None:
+            total = self.total_replied + self.total_skipped + self.total_errors
+            rate = (self.total_errors / total) * 100 if total else 0.0
+            self._error_rate_cache = rate
+        return rate
+
+    def record_replied(self, n: int = 1) -> None:
+        """Count n replies (session + day)."""
+        self.total_replied += n
+        self.day_replied += n
+
+    def record_skipped(self, n: int = 1) -> None:
+        """Count n skipped events (session + day)."""
+        self.total_skipped += n
+        self.day_skipped += n
+
+    def record_error(self, n: int = 1) -> None:
+        """Count n errors (session + day)."""
+        self.total_errors += n
+        self.day_errors += n
 
     def add_error(self, error_info: Dict[str, Any]) -> None:
         """Add an error to recent errors list."""
         self.recent_errors.append({
             **error_info,
-            "ts": datetime.now(timezone.utc).isoformat(),
+            "ts": _now_iso(),
         })
-        # Keep only last N errors
-        if len(self.recent_errors) > self.max_recent_errors:
-            self.recent_errors = self.recent_errors[-self.max_recent_errors:]
 
     def reset_day(self, new_day_key: str) -> None:
         """Reset daily counters for a new day."""
@@ -94,6 +217,21 @@ class DaemonStats:
         self.day_skipped = 0
         self.day_errors = 0
         self.day_spent_usd = 0.0
+        self.last_budget_warning_pct = 0
+
+
+# Budget severity bands: usage below _SEV_THRESHOLDS[i] maps to _SEV_DATA[i]
+_SEV_THRESHOLDS = (0.90, 0.95, 1.0)
+_SEV_DATA = (
+    ("low", logging.INFO,
+     "📊 Budget at %(pct).1f%%: $%(spent).4f / $%(budget).2f"),
+    ("medium", logging.WARNING,
+     "⚠️  Budget warning: $%(spent).4f / $%(budget).2f (%(pct).1f%%)"),
+    ("high", logging.WARNING,
+     "⚠️  BUDGET CRITICAL: $%(spent).4f / $%(budget).2f (%(pct).1f%%)"),
+    ("critical", logging.ERROR,
+     "🚨 BUDGET EXHAUSTED: $%(spent).4f / $%(budget).2f (%(pct).1f%%)"),
+)
 
 
 def check_budget_warning(
@@ -124,33 +262,18 @@ def check_budget_warning(
             "daily_budget_usd": daily_budget_usd,
             "usage_pct": usage_pct * 100,
             "threshold_pct": warning_threshold * 100,
-            "ts": datetime.now(timezone.utc).isoformat(),
+            "ts": _now_iso(),
         }
 
-        # Log levels based on usage
-        if usage_pct >= 1.0:
-            logger.error(
-                f"🚨 BUDGET EXHAUSTED: ${spent_usd:.4f} / ${daily_budget_usd:.2f} "
-                f"({usage_pct*100:.1f}%)"
-            )
-            warning["severity"] = "critical"
-        elif usage_pct >= 0.95:
-            logger.warning(
-                f"⚠️  BUDGET CRITICAL: ${spent_usd:.4f} / ${daily_budget_usd:.2f} "
-                f"({usage_pct*100:.1f}%)"
-            )
-            warning["severity"] = "high"
-        elif usage_pct >= 0.90:
-            logger.warning(
-                f"⚠️  Budget warning: ${spent_usd:.4f} / ${daily_budget_usd:.2f} "
-                f"({usage_pct*100:.1f}%)"
-            )
-            warning["severity"] = "medium"
-        else:
-            logger.info(
-                f"📊 Budget at {usage_pct*100:.1f}%: ${spent_usd:.4f} / ${daily_budget_usd:.2f}"
-            )
-            warning["severity"] = "low"
+        # Severity band: one bisect instead of an elif ladder
+        severity, level, fmt = _SEV_DATA[bisect.bisect_right(_SEV_THRESHOLDS, usage_pct)]
+        warning["severity"] = severity
+        if logger.isEnabledFor(level):
+            logger.log(level, fmt, {
+                "spent": spent_usd,
+                "budget": daily_budget_usd,
+                "pct": usage_pct * 100,
+            })
 
         return warning
 
@@ -180,7 +303,7 @@ def log_daily_summary(
     summary = {
         "type": "daily_summary",
         "day_key": stats.day_key,
-        "ts": datetime.now(timezone.utc).isoformat(),
+        "ts": _now_iso(),
         "budget": {
             "spent_usd": state_spent_usd,
             "daily_budget_usd": daily_budget_usd,
@@ -202,17 +325,21 @@ def log_daily_summary(
     }
 
     # Log to file
-    append_jsonl(DAILY_SUMMARY_LOG, summary)
-
-    # Console output
-    logger.info("=" * 50)
-    logger.info(f"📊 DAILY SUMMARY - {stats.day_key}")
-    logger.info("=" * 50)
-    logger.info(f"   Budget: ${state_spent_usd:.4f} / ${daily_budget_usd:.2f} ({usage_pct:.1f}%)")
-    logger.info(f"   Calls: {state_calls_today}")
-    logger.info(f"   Replied: {stats.day_replied} | Skipped: {stats.day_skipped} | Errors: {stats.day_errors}")
-    logger.info(f"   Error rate: {stats.error_rate:.1f}%")
-    logger.info("=" * 50)
+    append_jsonl(DAILY_SUMMARY_LOG, summary, flush=True)
+
+    # Console output (formatted only if INFO is enabled)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("=" * 50)
+        logger.info("📊 DAILY SUMMARY - %s", stats.day_key)
+        logger.info("=" * 50)
+        logger.info("   Budget: $%.4f / $%.2f (%.1f%%)", state_spent_usd, daily_budget_usd, usage_pct)
+        logger.info("   Calls: %s", state_calls_today)
+        logger.info(
+            "   Replied: %s | Skipped: %s | Errors: %s",
+            stats.day_replied, stats.day_skipped, stats.day_errors,
+        )
+        logger.info("   Error rate: %.1f%%", stats.error_rate)
+        logger.info("=" * 50)
 
     return summary
 
@@ -227,7 +354,7 @@ def log_cycle_stats(
     entry = {
         "type": "cycle_stats",
         "cycle": cycle_num,
-        "ts": datetime.now(timezone.utc).isoformat(),
+        "ts": _now_iso(),
         "fetched": cycle_stats.get("fetched", 0),
         "replied": cycle_stats.get("replied", 0),
         "skipped": cycle_stats.get("skipped", 0),
@@ -235,7 +362,51 @@ def log_cycle_stats(
         "state_spent_usd": state_spent_usd,
         "state_calls_today": state_calls_today,
     }
-    append_jsonl(MONITORING_LOG, entry)
+    _enqueue_jsonl(MONITORING_LOG, entry)
+
+
+def _status_lines(
+    stats: DaemonStats,
+    state_spent_usd: float,
+    state_calls_today: int,
+    daily_budget_usd: float,
+    adapter_name: str,
+    is_dry_run: bool,
+) -> Iterator[str]:
+    """Yield the status report lines one by one."""
+    usage_pct = (state_spent_usd / daily_budget_usd * 100) if daily_budget_usd > 0 else 0
+
+    yield "=" * 50
+    yield "🦞 MOLTBOOK AGENT STATUS"
+    yield "=" * 50
+    yield f"Adapter: {adapter_name} {'(DRY-RUN)' if is_dry_run else '(LIVE)'}"
+    yield f"Session started: {stats.session_start}"
+    yield f"Uptime cycles: {stats.cycles}"
+    yield ""
+    yield "📊 TODAY'S ACTIVITY"
+    yield f"   Day: {stats.day_key}"
+    yield f"   Budget: ${state_spent_usd:.4f} / ${daily_budget_usd:.2f} ({usage_pct:.1f}%)"
+    yield f"   Calls: {state_calls_today}"
+    yield f"   Replied: {stats.day_replied}"
+    yield f"   Skipped: {stats.day_skipped}"
+    yield f"   Errors: {stats.day_errors}"
+    yield ""
+    yield "📈 SESSION TOTALS"
+    yield f"   Total fetched: {stats.total_fetched}"
+    yield f"   Total replied: {stats.total_replied}"
+    yield f"   Total skipped: {stats.total_skipped}"
+    yield f"   Total errors: {stats.total_errors}"
+    yield f"   Error rate: {stats.error_rate:.1f}%"
+    yield f"   Budget warnings: {stats.budget_warnings}"
+    yield ""
+
+    if stats.recent_errors:
+        yield "⚠️  RECENT ERRORS"
+        for err in list(stats.recent_errors)[-3:]:
+            yield f"   - {err.get('ts', '?')}: {err.get('message', 'Unknown')}"
+        yield ""
+
+    yield "=" * 50
 
 
 def get_status_report(
@@ -252,43 +423,27 @@ def get_status_report(
     Returns:
         Formatted status string
     """
-    usage_pct = (state_spent_usd / daily_budget_usd * 100) if daily_budget_usd > 0 else 0
+    return "\n".join(_status_lines(
+        stats, state_spent_usd, state_calls_today,
+        daily_budget_usd, adapter_name, is_dry_run,
+    ))
 
-    lines = [
-        "=" * 50,
-        "🦞 MOLTBOOK AGENT STATUS",
-        "=" * 50,
-        f"Adapter: {adapter_name} {'(DRY-RUN)' if is_dry_run else '(LIVE)'}",
-        f"Session started: {stats.session_start}",
-        f"Uptime cycles: {stats.cycles}",
-        "",
-        "📊 TODAY'S ACTIVITY",
-        f"   Day: {stats.day_key}",
-        f"   Budget: ${state_spent_usd:.4f} / ${daily_budget_usd:.2f} ({usage_pct:.1f}%)",
-        f"   Calls: {state_calls_today}",
-        f"   Replied: {stats.day_replied}",
-        f"   Skipped: {stats.day_skipped}",
-        f"   Errors: {stats.day_errors}",
-        "",
-        "📈 SESSION TOTALS",
-        f"   Total fetched: {stats.total_fetched}",
-        f"   Total replied: {stats.total_replied}",
-        f"   Total skipped: {stats.total_skipped}",
-        f"   Total errors: {stats.total_errors}",
-        f"   Error rate: {stats.error_rate:.1f}%",
-        f"   Budget warnings: {stats.budget_warnings}",
-        "",
-    ]
 
-    if stats.recent_errors:
-        lines.append("⚠️  RECENT ERRORS")
-        for err in stats.recent_errors[-3:]:
-            lines.append(f"   - {err.get('ts', '?')}: {err.get('message', 'Unknown')}")
-        lines.append("")
+class LazyStatusReport:
+    """
+    Status report that is only built when converted to str.
+
+    Usage: logger.info("%s", LazyStatusReport(stats, ...)) - nothing is
+    formatted unless a handler actually emits the record.
+    """
 
-    lines.append("=" * 50)
+    __slots__ = ("_args",)
 
-    return "\n".join(lines)
+    def __init__(self, *args: Any) -> None:
+        self._args = args
+
+    def __str__(self) -> str:
+        return get_status_report(*self._args)
 
 
 def check_error_rate_alert(
@@ -305,21 +460,82 @@ def check_error_rate_alert(
     Returns:
         Alert dict if threshold exceeded, None otherwise
     """
+    alert = _error_rate_alert(stats, threshold_pct)
+    if alert:
+        _enqueue_jsonl(MONITORING_LOG, alert)
+    return alert
+
+
+def _error_rate_alert(stats: DaemonStats, threshold_pct: float) -> Optional[Dict[str, Any]]:
+    """Build (and log) the error rate alert without queueing it."""
     if stats.error_rate >= threshold_pct:
         alert = {
             "type": "error_rate_alert",
             "error_rate_pct": stats.error_rate,
             "threshold_pct": threshold_pct,
             "total_errors": stats.total_errors,
-            "ts": datetime.now(timezone.utc).isoformat(),
+            "ts": _now_iso(),
         }
 
         logger.warning(
-            f"⚠️  High error rate: {stats.error_rate:.1f}% "
-            f"(threshold: {threshold_pct:.1f}%)"
+            "⚠️  High error rate: %.1f%% (threshold: %.1f%%)",
+            stats.error_rate, threshold_pct,
         )
-
-        append_jsonl(MONITORING_LOG, alert)
         return alert
 
     return None
+
+
+# Budget usage levels (%) that trigger one warning each per day
+BUDGET_WARNING_THRESHOLDS_PCT = (80, 90, 95, 100)
+
+
+def monitoring_tick(
+    stats: DaemonStats,
+    state: State,
+    policy: Dict[str, Any],
+    error_threshold_pct: float = 10.0,
+) -> List[Dict[str, Any]]:
+    """
+    Run the per-cycle monitoring checks in one pass.
+
+    Budget: warns once for the highest newly crossed threshold in
+    BUDGET_WARNING_THRESHOLDS_PCT (tracked in stats.last_budget_warning_pct).
+    Error rate: same as check_error_rate_alert. If anything fired, one
+    consolidated {"type": "monitoring_tick", "budget": ..., "error_rate": ...}
+    record is queued for the monitoring log (None for the check that did not).
+
+    Returns:
+        List of emitted alert dicts (empty if nothing fired)
+    """
+    warning: Optional[Dict[str, Any]] = None
+
+    daily_budget_usd = compiled_policy(policy).daily_budget_usd
+    spent_usd = state.spent_usd
+    if daily_budget_usd > 0:
+        current_pct = spent_usd / daily_budget_usd * 100
+        crossed = 0
+        for threshold in BUDGET_WARNING_THRESHOLDS_PCT:
+            if current_pct >= threshold:
+                crossed = threshold
+        if crossed > stats.last_budget_warning_pct:
+            warning = check_budget_warning(
+                spent_usd,
+                daily_budget_usd,
+                warning_threshold=crossed / 100,
+            )
+            if warning:
+                stats.budget_warnings += 1
+                stats.last_budget_warning_pct = crossed
+
+    alert = _error_rate_alert(stats, error_threshold_pct)
+
+    alerts = [a for a in (warning, alert) if a]
+    if alerts:
+        _enqueue_jsonl(MONITORING_LOG, {
+            "type": "monitoring_tick",
+            "ts": _now_iso(),
+            "budget": warning,
+            "error_rate": alert,
+        })
+    return alerts
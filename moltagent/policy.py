@@ -5,10 +5,13 @@ SPEC §13 - Policy modell.
 """
 from __future__ import annotations
 
-import json
-from typing import Any, Dict, Optional
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Tuple
 
-from .config import POLICY_FILE
+from .config import POLICY_FILE, DEFAULT_BURST_P0, DEFAULT_BURST_P1, DEFAULT_MAX_CALLS_PER_DAY
+from .utils import json_loads
 from .policy_model import (
     PolicyModel,
     validate_policy_file,
@@ -18,10 +21,19 @@ from .policy_model import (
 )
 
 
+# Validálás nélküli betöltések cache-e: path -> ((mtime_ns, size), policy dict)
+_raw_policy_cache: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+
+
 def load_policy(path: str = POLICY_FILE, validate: bool = True) -> Dict[str, Any]:
     """
     Betölti a policy.json fájlt.
 
+    validate=False esetén (pl. a daemon ciklusonkénti hot-reload-ja) a fájl
+    (mtime, méret) kulcsa alapján cache-elt dict-et adja vissza, amíg a fájl
+    nem változik - így a hozzá cache-elt compiled_policy nézet is megmarad.
+    Ezt a dict-et ne módosítsd helyben (előbb copy.deepcopy).
+
     Args:
         path: Policy fájl útvonala
         validate: Ha True, Pydantic validációt futtat
@@ -35,10 +47,159 @@ def load_policy(path: str = POLICY_FILE, validate: bool = True) -> Dict[str, Any
     if validate:
         model = load_and_validate_policy(path)
         return policy_to_dict(model)
-    else:
-        # Legacy mód - nincs validáció
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+
+    # Legacy mód - nincs validáció
+    try:
+        st = os.stat(path)
+        key = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        key = None
+    cached = _raw_policy_cache.get(path)
+    if key is not None and cached is not None and cached[0] == key:
+        return cached[1]
+
+    with open(path, "rb") as f:
+        policy = json_loads(f.read())
+    if key is not None:
+        _raw_policy_cache[path] = (key, policy)
+    return policy
+
+
+@dataclass(frozen=True, slots=True)
+class PolicyView:
+    """
+    A policy-ból egyszer előállított, csak olvasható nézet a hot path-okhoz.
+
+    A beágyazott dict.get() hívások és int()/bool() konverziók helyett a
+    döntési logika, a scheduler, a rate limit és a prompt építés ezeket a
+    mezőket olvassa.
+    """
+
+    # Költség és ütemezés
+    daily_budget_usd: float
+    max_calls_per_day: int
+    min_seconds_between_calls: float
+    scheduler_enabled: bool
+    burst_p0: int
+    burst_p1: int
+    # Döntés (1. fázis, P2 cap)
+    reply_to_mentions_always: bool
+    reply_to_questions_always: bool
+    offtopic_question_mode: str
+    max_replies_per_hour_p2: int
+    allow_keywords: Tuple[str, ...]
+    block_keywords: Tuple[str, ...]
+    # Prompt (stílus + domain)
+    lang: str
+    max_sentences: int
+    fmt: str
+    domain_context: str
+
+
+def compile_keywords(keywords: Iterable[str]) -> Tuple[str, ...]:
+    """
+    Kulcsszólista előfeldolgozása keyword_hit-hez.
+
+    Kisbetűsít, kiszűri a duplikátumokat, és elhagyja azokat a kulcsszavakat,
+    amelyek egy másik (rövidebb) kulcsszót tartalmaznak - részszöveg-egyezésnél
+    ezek nem változtatnak az eredményen (pl. "rate" mellett a "rate limit").
+    A rövidebb kulcsszavak kerülnek előre, így a találat hamarabb megvan.
+    """
+    unique = sorted({k.lower() for k in keywords}, key=len)
+    compiled: list[str] = []
+    for k in unique:
+        if not any(shorter in k for shorter in compiled):
+            compiled.append(k)
+    return tuple(compiled)
+
+
+def _compile_policy(policy: Dict[str, Any]) -> PolicyView:
+    """Felépíti a PolicyView-t a (nyers vagy validált) policy dict-ből."""
+    sched = policy.get("scheduler", {})
+    reply = policy.get("reply", {})
+    topics = policy.get("topics", {})
+    style = policy.get("style", {})
+    domain = policy.get("domain", {})
+    return PolicyView(
+        daily_budget_usd=float(policy.get("daily_budget_usd", 1.0)),
+        max_calls_per_day=int(policy.get("max_calls_per_day", DEFAULT_MAX_CALLS_PER_DAY)),
+        min_seconds_between_calls=float(policy.get("min_seconds_between_calls", 1.0)),
+        scheduler_enabled=bool(sched.get("enabled", True)),
+        burst_p0=int(sched.get("burst_p0", DEFAULT_BURST_P0)),
+        burst_p1=int(sched.get("burst_p1", DEFAULT_BURST_P1)),
+        reply_to_mentions_always=bool(reply.get("reply_to_mentions_always", True)),
+        reply_to_questions_always=bool(reply.get("reply_to_questions_always", True)),
+        offtopic_question_mode=reply.get("offtopic_question_mode", "redirect"),
+        max_replies_per_hour_p2=int(reply.get("max_replies_per_hour_p2", 2)),
+        allow_keywords=compile_keywords(topics.get("allow_keywords", [])),
+        block_keywords=compile_keywords(topics.get("block_keywords", [])),
+        lang=style.get("language", "en"),
+        max_sentences=int(style.get("max_sentences", 5)),
+        fmt=style.get("format", "steps"),
+        domain_context=domain.get("context", "").strip(),
+    )
+
+
+# Policy dict -> (policy, nézet, verzió, származtatott objektumok).
+# Nem a dict-en tároljuk, így az JSON-szerializálható marad. id() szerint
+# kulcsolva, a dict-re erős hivatkozással (így az id nem hasznosulhat újra
+# más dict-re, amíg a bejegyzés él). LRU, COMPILED_CACHE_SIZE elemig.
+COMPILED_CACHE_SIZE = 16
+_compiled_cache: "OrderedDict[int, Tuple[Dict[str, Any], PolicyView, int, Dict[str, Any]]]" = OrderedDict()
+
+
+def _compiled_entry(policy: Dict[str, Any]) -> Tuple[Dict[str, Any], PolicyView, int, Dict[str, Any]]:
+    key = id(policy)
+    entry = _compiled_cache.get(key)
+    if entry is not None and entry[0] is policy:
+        _compiled_cache.move_to_end(key)
+        return entry
+    view = _compile_policy(policy)
+    entry = (policy, view, hash(view), {})
+    _compiled_cache[key] = entry
+    _compiled_cache.move_to_end(key)
+    if len(_compiled_cache) > COMPILED_CACHE_SIZE:
+        _compiled_cache.popitem(last=False)
+    return entry
+
+
+def compiled_policy(policy: Dict[str, Any]) -> PolicyView:
+    """
+    A policy dict előfeldolgozott nézete (első használatkor épül fel, utána
+    a dict-hez cache-elve, a dict módosítása nélkül).
+
+    Megjegyzés: a nézet nem követi a dict későbbi módosítását - ha a policy-t
+    helyben módosítod, hívd meg az invalidate_compiled(policy)-t.
+    """
+    return _compiled_entry(policy)[1]
+
+
+def policy_version(policy: Dict[str, Any]) -> int:
+    """
+    A policy nézetének hash-e (memo kulcsokhoz): azonos tartalmú policy-k
+    verziója megegyezik.
+    """
+    return _compiled_entry(policy)[2]
+
+
+def policy_cache(policy: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    A policy-ból származtatott objektumok tára (pl. a decision classifier-e,
+    a reply constitution-je); a nézettel együtt érvénytelenedik.
+    """
+    return _compiled_entry(policy)[3]
+
+
+def invalidate_compiled(policy: Dict[str, Any]) -> None:
+    """A policy nézetét, verzióját és származtatott objektumait eldobja (helyben módosítás után)."""
+    entry = _compiled_cache.get(id(policy))
+    if entry is not None and entry[0] is policy:
+        del _compiled_cache[id(policy)]
+
+
+def clear_compiled_cache() -> None:
+    """Üríti a compiled_policy cache-t."""
+    _compiled_cache.clear()
 
 
 def get_scheduler_config(policy: Dict[str, Any]) -> Dict[str, Any]:
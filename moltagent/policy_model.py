@@ -10,21 +10,35 @@ SPEC §13.4 - Policy érvényesítés:
 from __future__ import annotations
 
 import json
+import os
 from typing import Any, Dict, List, Literal, Optional, Tuple
 
-from pydantic import BaseModel, Field, field_validator, ValidationError
+from pydantic import BaseModel, ConfigDict, Field, field_validator, ValidationError
+
+
+# --- Base ---
+
+class _FrozenModel(BaseModel):
+    """
+    Immutábilis alap modell.
+
+    A validált modell a _POLICY_CACHE-ben megosztott példány, ezért nem
+    módosítható. A Field(ge=..., le=...) korlátokat a pydantic-core natívan
+    ellenőrzi, így ezek maradnak (egy Python model_validator lassabb lenne).
+    """
+    model_config = ConfigDict(frozen=True)
 
 
 # --- Nested config models ---
 
-class SchedulerConfig(BaseModel):
+class SchedulerConfig(_FrozenModel):
     """Scheduler paraméterek (SPEC §8)."""
     enabled: bool = True
     burst_p0: int = Field(default=8, ge=0, le=50, description="P0 burst limit")
     burst_p1: int = Field(default=4, ge=0, le=50, description="P1 burst limit")
 
 
-class ReplyConfig(BaseModel):
+class ReplyConfig(_FrozenModel):
     """Válasz paraméterek (SPEC §6)."""
     max_replies_per_hour_p2: int = Field(default=2, ge=0, le=20, description="P2 hourly limit")
     reply_to_mentions_always: bool = True
@@ -32,18 +46,18 @@ class ReplyConfig(BaseModel):
     offtopic_question_mode: Literal["redirect", "skip"] = "redirect"
 
 
-class DomainConfig(BaseModel):
+class DomainConfig(_FrozenModel):
     """Domain kontextus."""
     context: str = ""
 
 
-class TopicsConfig(BaseModel):
+class TopicsConfig(_FrozenModel):
     """Témakör szűrés (SPEC §5)."""
     allow_keywords: List[str] = Field(default_factory=list)
     block_keywords: List[str] = Field(default_factory=list)
 
 
-class StyleConfig(BaseModel):
+class StyleConfig(_FrozenModel):
     """
     Válaszstílus (SPEC §10).
 
@@ -57,7 +71,7 @@ class StyleConfig(BaseModel):
     format: Literal["steps", "bullet", "paragraph"] = "steps"
 
 
-class OperatorConfig(BaseModel):
+class OperatorConfig(_FrozenModel):
     """
     Operátor összefoglaló konfig (SPEC §10).
 
@@ -72,7 +86,7 @@ class OperatorConfig(BaseModel):
 
 # --- Main policy model ---
 
-class PolicyModel(BaseModel):
+class PolicyModel(_FrozenModel):
     """
     Policy konfiguráció model.
 
@@ -115,10 +129,28 @@ class PolicyModel(BaseModel):
 
 # --- Validation functions ---
 
+def _format_errors(e: ValidationError) -> List[str]:
+    """Pydantic hibák → "mező.útvonal: üzenet (kapott: ...)" sorok."""
+    errors: List[str] = []
+    append = errors.append
+    for err in e.errors(include_url=False):
+        field_path = ".".join(map(str, err["loc"])) or "(policy)"
+        msg = err["msg"]
+        input_val = err.get("input", "")
+        if input_val and str(input_val) != msg:
+            append(f"{field_path}: {msg} (kapott: {input_val!r})")
+        else:
+            append(f"{field_path}: {msg}")
+    return errors
+
+
 def validate_policy_file(path: str) -> Tuple[bool, Optional[PolicyModel], List[str]]:
     """
     Validálja a policy fájlt.
 
+    A JSON parse és a validáció egy menetben fut (model_validate_json);
+    szintaktikai hibánál a json modul ad pontos sor/karakter üzenetet.
+
     Args:
         path: Policy fájl útvonala
 
@@ -128,37 +160,34 @@ def validate_policy_file(path: str) -> Tuple[bool, Optional[PolicyModel], List[s
         - policy_model: PolicyModel instance vagy None
         - errors: Hiba üzenetek listája
     """
-    errors: List[str] = []
-
     # 1. Fájl létezés ellenőrzése
     try:
-        with open(path, "r", encoding="utf-8") as f:
+        with open(path, "rb") as f:
             raw_content = f.read()
     except FileNotFoundError:
         return (False, None, [f"Policy fájl nem található: {path}"])
     except PermissionError:
         return (False, None, [f"Policy fájl nem olvasható: {path}"])
 
-    # 2. JSON parse
+    # 2. JSON parse + Pydantic validáció egy lépésben
+    try:
+        return (True, PolicyModel.model_validate_json(raw_content), [])
+    except ValidationError as e:
+        if not any(err["type"] == "json_invalid" for err in e.errors()):
+            return (False, None, _format_errors(e))
+
+    # 3. Nem parse-olható bájtok: json modul (pontos hibahely, BOM kezelés)
     try:
         data = json.loads(raw_content)
     except json.JSONDecodeError as e:
         return (False, None, [f"Hibás JSON szintaxis: {e.msg} (sor {e.lineno}, karakter {e.colno})"])
+    except UnicodeDecodeError as e:
+        return (False, None, [f"Hibás JSON kódolás: {e.reason} (bájt {e.start})"])
 
-    # 3. Pydantic validáció
     try:
-        model = PolicyModel(**data)
-        return (True, model, [])
+        return (True, PolicyModel.model_validate(data), [])
     except ValidationError as e:
-        for err in e.errors():
-            field_path = ".".join(str(x) for x in err["loc"])
-            msg = err["msg"]
-            input_val = err.get("input", "")
-            if input_val and str(input_val) != msg:
-                errors.append(f"{field_path}: {msg} (kapott: {input_val!r})")
-            else:
-                errors.append(f"{field_path}: {msg}")
-        return (False, None, errors)
+        return (False, None, _format_errors(e))
 
 
 def format_validation_result(
@@ -191,22 +220,48 @@ def format_validation_result(
     return "\n".join(lines)
 
 
+# Sikeresen validált policy-k: path -> (mtime_ns, size, PolicyModel)
+_POLICY_CACHE: Dict[str, Tuple[int, int, PolicyModel]] = {}
+
+
+def invalidate_policy_cache(path: Optional[str] = None) -> None:
+    """Törli a validált policy cache-t (egy fájlra, vagy path=None esetén teljesen)."""
+    if path is None:
+        _POLICY_CACHE.clear()
+    else:
+        _POLICY_CACHE.pop(path, None)
+
+
 def load_and_validate_policy(path: str) -> PolicyModel:
     """
     Betölti és validálja a policy fájlt.
 
+    Amíg a fájl (mtime, méret) nem változik, a korábban validált modellt adja
+    vissza (stat + dict lookup); a hibás fájlt nem cache-eljük.
+
     Raises:
         ValueError: Ha a validáció sikertelen
 
     Returns:
         Validált PolicyModel instance
     """
+    try:
+        st = os.stat(path)
+        key: Optional[Tuple[int, int]] = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        key = None
+    cached = _POLICY_CACHE.get(path)
+    if key is not None and cached is not None and cached[:2] == key:
+        return cached[2]
+
     success, model, errors = validate_policy_file(path)
 
     if not success or model is None:
         error_msg = format_validation_result(success, model, errors, path)
         raise ValueError(error_msg)
 
+    if key is not None:
+        _POLICY_CACHE[path] = (key[0], key[1], model)
     return model
 
 
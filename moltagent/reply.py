@@ -5,7 +5,9 @@ Error handling és retry logika integrálva.
 """
 from __future__ import annotations
 
+import threading
 import time
+from collections import OrderedDict
 from typing import Any, Dict, Optional, Tuple
 
 from openai import OpenAI
@@ -19,37 +21,23 @@ from .config import (
     RETRY_BASE_DELAY,
     RETRY_MAX_DELAY,
 )
+from .policy import compiled_policy, policy_cache, policy_version
 from .retry import call_with_retry, ReplyError, log_error
 from .state import State
 
+__all__ = [
+    "build_prompt",
+    "clear_prompt_cache",
+    "extract_text",
+    "rate_limit",
+    "make_outbound_reply",
+]
 
-def build_prompt(event: Dict[str, Any], policy: Dict[str, Any], mode: str) -> str:
-    """
-    Prompt építése az esemény és mód alapján.
-
-    Args:
-        event: Az esemény
-        policy: Policy konfiguráció
-        mode: "normal" | "redirect" | "refuse"
-    """
-    style = policy.get("style", {})
-    domain = policy.get("domain", {})
-
-    lang = style.get("language", "en")
-    max_sent = int(style.get("max_sentences", 5))
-    fmt = style.get("format", "steps")
-
-    domain_context = domain.get("context", "").strip()
 
-    # Mode-specific task shaping
-    if mode == "refuse":
-        task = "Refuse briefly and safely. Offer a legitimate alternative. Keep it short."
-    elif mode == "redirect":
-        task = "Give a short redirect: acknowledge the question, state you focus on Moltbook agents/cost control/integration, and invite a related question."
-    else:
-        task = "Write a helpful reply. Keep it practical and short."
+# A policy_cache-ben tárolt, kész "constitution" blokk kulcsa (lásd _constitution_for)
+CONSTITUTION_KEY = "_constitution"
 
-    constitution = f"""You are a concise assistant.
+_CONSTITUTION_TEMPLATE = """You are a concise assistant.
 
 Scope:
 {domain_context}
@@ -63,44 +51,142 @@ Rules:
 - Do NOT invent product features. If uncertain, say so and suggest how to verify.
 """
 
+# Mode-specific task shaping
+_TASK_BY_MODE = {
+    "refuse": "Refuse briefly and safely. Offer a legitimate alternative. Keep it short.",
+    "redirect": "Give a short redirect: acknowledge the question, state you focus on Moltbook agents/cost control/integration, and invite a related question.",
+    "normal": "Write a helpful reply. Keep it practical and short.",
+}
+
+
+def _constitution_for(policy: Dict[str, Any]) -> str:
+    """A policy-hoz tartozó constitution szöveg (egyszer renderelve, policy_cache-ben tárolva)."""
+    cache = policy_cache(policy)
+    constitution = cache.get(CONSTITUTION_KEY)
+    if constitution is None:
+        view = compiled_policy(policy)
+        constitution = _CONSTITUTION_TEMPLATE.format(
+            domain_context=view.domain_context,
+            lang=view.lang,
+            max_sent=view.max_sentences,
+            fmt=view.fmt,
+        )
+        cache[CONSTITUTION_KEY] = constitution
+    return constitution
+
+
+# Kész promptok memo-ja: ugyanaz az esemény újrapróbálva (azonos policy
+# verzió és mód mellett) nem épül újra. LRU, PROMPT_CACHE_SIZE elemig.
+PROMPT_CACHE_SIZE = 128
+_prompt_cache: "OrderedDict[Tuple[Any, ...], str]" = OrderedDict()
+
+
+def clear_prompt_cache() -> None:
+    """Üríti a prompt memo cache-t."""
+    _prompt_cache.clear()
+
+
+def build_prompt(event: Dict[str, Any], policy: Dict[str, Any], mode: str) -> str:
+    """
+    Prompt építése az esemény és mód alapján.
+
+    Azonos (esemény, policy verzió, mód) esetén a korábban épített promptot
+    adja vissza; a kulcsban a szöveg is szerepel, így a szerkesztett esemény
+    új promptot kap. Azonosító nélkül nem cache-elünk.
+
+    Args:
+        event: Az esemény
+        policy: Policy konfiguráció
+        mode: "normal" | "redirect" | "refuse"
+    """
     etype = event.get("type", "event")
     author = event.get("author", "user")
     text = event.get("text", "")
 
-    prompt = f"""{constitution}
+    event_id = event.get("id")
+    if not event_id:
+        return _render_prompt(policy, mode, etype, author, text)
 
-Event type: {etype}
-Author: {author}
-Event text:
-{text}
+    key = (event_id, policy_version(policy), mode, etype, author, text)
+    prompt = _prompt_cache.get(key)
+    if prompt is not None:
+        _prompt_cache.move_to_end(key)
+        return prompt
 
-Task:
-{task}
-"""
+    prompt = _render_prompt(policy, mode, etype, author, text)
+    _prompt_cache[key] = prompt
+    if len(_prompt_cache) > PROMPT_CACHE_SIZE:
+        _prompt_cache.popitem(last=False)
     return prompt
 
 
+def _render_prompt(policy: Dict[str, Any], mode: str, etype: Any, author: Any, text: Any) -> str:
+    """A prompt szövegének összeállítása (cache nélkül)."""
+    constitution = _constitution_for(policy)
+    task = _TASK_BY_MODE.get(mode, _TASK_BY_MODE["normal"])
+
+    return (
+        f"{constitution}\n\n"
+        f"Event type: {etype}\n"
+        f"Author: {author}\n"
+        f"Event text:\n{text}\n\n"
+        f"Task:\n{task}\n"
+    )
+
+
+# A response.output tartalmi részeinek szöveges típusai
+_TEXT_CONTENT_TYPES = frozenset(("output_text", "text"))
+
+
 def extract_text(response) -> str:
     """Kinyeri a szöveges választ az OpenAI response-ból."""
-    t = (getattr(response, "output_text", "") or "").strip()
+    # Gyors út: az SDK szinte mindig kitölti az output_text-et
+    t = getattr(response, "output_text", None)
     if t:
-        return t
+        t = t.strip()
+        if t:
+            return t
 
+    # Lassú út: üzenet-elemek szöveges részei
     parts = []
-    for item in getattr(response, "output", []) or []:
+    for item in getattr(response, "output", None) or ():
         if getattr(item, "type", None) == "message":
-            for c in getattr(item, "content", []) or []:
-                if getattr(c, "type", None) in ("output_text", "text"):
+            for c in getattr(item, "content", None) or ():
+                if getattr(c, "type", None) in _TEXT_CONTENT_TYPES:
                     parts.append(getattr(c, "text", ""))
     return "".join(parts).strip()
 
 
+# Folyamaton belüli pacing: a szálak egymás után kapnak időrést, és a
+# legutóbb kiadott rés ideje a perzisztált last_call_ts mellett számít.
+_rate_lock = threading.Lock()
+_last_grant_ts = 0.0
+
+
 def rate_limit(policy: Dict[str, Any], state: State) -> None:
-    """Rate limiting - minimum idő hívások között."""
-    min_s = float(policy.get("min_seconds_between_calls", 1.0))
-    elapsed = time.time() - state.last_call_ts
-    if elapsed < min_s:
-        time.sleep(min_s - elapsed)
+    """
+    Rate limiting - minimum idő hívások között.
+
+    A last_call_ts a state fájlban perzisztált falióra-idő (restart után is
+    érvényes), ezért time.time()-ot használunk, nem monotonic órát. Ha az óra
+    visszaugrott (last_call_ts a jövőben van), legfeljebb min_s-et várunk.
+
+    Több szálból hívva a várakozás egy zár alatt történik, és a kiadott
+    időrést a következő hívó is látja (még mielőtt a state frissülne), így a
+    min_s a teljes folyamatra érvényes, nem szálanként.
+    """
+    global _last_grant_ts
+    min_s = compiled_policy(policy).min_seconds_between_calls
+    if min_s <= 0.0:
+        return
+    with _rate_lock:
+        now = time.time()
+        elapsed = now - max(state.last_call_ts, _last_grant_ts)
+        wait = 0.0
+        if elapsed < min_s:
+            wait = min_s - max(elapsed, 0.0)
+            time.sleep(wait)
+        _last_grant_ts = now + wait
 
 
 def _call_openai_api(
@@ -170,8 +256,12 @@ def make_outbound_reply(
 
     text = extract_text(r) or "[no_text]"
     usage = getattr(r, "usage", None)
-    in_tok = int(getattr(usage, "input_tokens", 0) or 0) if usage else 0
-    out_tok = int(getattr(usage, "output_tokens", 0) or 0) if usage else 0
+    if usage is not None:
+        # Az SDK ResponseUsage mezői int típusúak
+        in_tok = usage.input_tokens or 0
+        out_tok = usage.output_tokens or 0
+    else:
+        in_tok = out_tok = 0
 
     # Sikeres hívás logolása (opcionális - csak ha volt retry)
     return text, in_tok, out_tok
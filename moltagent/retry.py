@@ -9,13 +9,15 @@ SPEC - Error handling:
 """
 from __future__ import annotations
 
-import json
+import atexit
 import os
+import random
+import threading
 import time
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from functools import wraps
-from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple, Type
 
 from openai import (
     APIConnectionError,
@@ -25,6 +27,7 @@ from openai import (
 )
 
 from .config import LOG_DIR
+from .utils import jsonl_line
 
 
 # --- Config ---
@@ -41,9 +44,15 @@ RETRYABLE_EXCEPTIONS: Tuple[Type[Exception], ...] = (
     RateLimitError,
 )
 
+# Retry-After fejléc lehetséges kulcsai (sima dict headers esetén számít a kisbetű)
+_RETRY_AFTER_KEYS: Tuple[str, ...] = ("retry-after", "Retry-After")
+
 # Error log file
 ERROR_LOG = os.path.join(LOG_DIR, "errors.jsonl")
 
+# Saját RNG a jitterhez (nem a modul-globális random példány)
+_JITTER_RNG = random.Random()
+
 
 # --- Custom exceptions ---
 
@@ -70,6 +79,62 @@ class ReplyError(Exception):
 
 # --- Error logging ---
 
+# Nyitva tartott errors.jsonl handle: nem nyitjuk/zárjuk minden hibánál.
+# Újranyitás, ha az ERROR_LOG útvonal változik vagy a fájlt törölték.
+_err_fh: Optional[BinaryIO] = None
+_err_path: Optional[str] = None
+_err_lock = threading.Lock()
+
+
+def _error_log_handle() -> BinaryIO:
+    """Az aktuális ERROR_LOG-hoz tartozó (szükség esetén újranyitott) handle."""
+    global _err_fh, _err_path
+    fh = _err_fh
+    if fh is not None and not fh.closed and _err_path == ERROR_LOG:
+        try:
+            if os.fstat(fh.fileno()).st_nlink > 0:
+                return fh
+        except OSError:
+            pass
+    _close_error_log()
+    os.makedirs(LOG_DIR, exist_ok=True)
+    _err_fh = open(ERROR_LOG, "ab", buffering=8192)
+    _err_path = ERROR_LOG
+    return _err_fh
+
+
+# A másodperc-pontosságú ISO előtag másodpercenként egyszer formázódik,
+# a mikroszekundumot minden bejegyzéshez csak hozzáfűzzük.
+_ts_prefix_cache: List[Any] = [-1, ""]
+
+
+def _utc_iso_now() -> str:
+    """UTC ISO-8601 időbélyeg mikroszekundumokkal (isoformat-kompatibilis)."""
+    t = time.time()
+    sec = int(t)
+    if sec != _ts_prefix_cache[0]:
+        _ts_prefix_cache[:] = [
+            sec,
+            datetime.fromtimestamp(sec, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S"),
+        ]
+    return f"{_ts_prefix_cache[1]}.{int((t - sec) * 1e6):06d}+00:00"
+
+
+def _close_error_log() -> None:
+    """Lezárja a nyitott errors.jsonl handle-t (ha van)."""
+    global _err_fh, _err_path
+    if _err_fh is not None:
+        try:
+            _err_fh.close()
+        except OSError:
+            pass
+    _err_fh = None
+    _err_path = None
+
+
+atexit.register(_close_error_log)
+
+
 def log_error(
     event_id: Optional[str],
     error_type: str,
@@ -89,10 +154,8 @@ def log_error(
         resolved: Sikerült-e végül
         extra: Extra adatok
     """
-    os.makedirs(LOG_DIR, exist_ok=True)
-
     entry = {
-        "ts": datetime.now(timezone.utc).isoformat(),
+        "ts": _utc_iso_now(),
         "event_id": event_id,
         "error_type": error_type,
         "message": message,
@@ -103,8 +166,11 @@ def log_error(
         entry["extra"] = extra
 
     try:
-        with open(ERROR_LOG, "a", encoding="utf-8") as f:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        line = jsonl_line(entry)
+        with _err_lock:
+            fh = _error_log_handle()
+            fh.write(line)
+            fh.flush()  # egy write() syscall; a sor azonnal olvasható
     except Exception:
         # Ha a logolás nem sikerül, ne álljon le az agent
         pass
@@ -130,16 +196,14 @@ def calculate_delay(
     Returns:
         Várakozási idő másodpercben
     """
-    import random
-
-    delay = base_delay * (2 ** attempt)
-    delay = min(delay, max_delay)
+    delay = min(base_delay * (1 << attempt), max_delay)
 
     # Jitter hozzáadása
-    jitter_amount = delay * jitter
-    delay += random.uniform(-jitter_amount, jitter_amount)
+    if jitter:
+        jitter_amount = delay * jitter
+        delay += _JITTER_RNG.uniform(-jitter_amount, jitter_amount)
 
-    return max(0, delay)
+    return max(0.0, delay)
 
 
 def get_retry_after(exception: Exception) -> Optional[float]:
@@ -152,6 +216,7 @@ def get_retry_after(exception: Exception) -> Optional[float]:
     Returns:
         Várakozási idő másodpercben, vagy None
     """
+    # isinstance: az SDK-k (és wrapper-ek) RateLimitError alosztályai is rate limitek
     if isinstance(exception, RateLimitError):
         # OpenAI RateLimitError-nak lehet retry_after attribútuma
         retry_after = getattr(exception, "retry_after", None)
@@ -165,12 +230,14 @@ def get_retry_after(exception: Exception) -> Optional[float]:
         response = getattr(exception, "response", None)
         if response:
             headers = getattr(response, "headers", {})
-            retry_header = headers.get("retry-after") or headers.get("Retry-After")
-            if retry_header:
-                try:
-                    return float(retry_header)
-                except ValueError:
-                    pass
+            for key in _RETRY_AFTER_KEYS:
+                retry_header = headers.get(key)
+                if retry_header:
+                    try:
+                        return float(retry_header)
+                    except ValueError:
+                        pass
+                    break
 
     return None
 
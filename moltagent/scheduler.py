@@ -12,18 +12,18 @@ Scheduler (Daily Pacer) - egyenletes napi hívás-elosztás.
 """
 from __future__ import annotations
 
-import math
 from dataclasses import dataclass
 from typing import Any, Dict, Optional
 
-from .config import DAY_SECONDS, DEFAULT_BURST_P0, DEFAULT_BURST_P1, DEFAULT_MAX_CALLS_PER_DAY
+from .config import DAY_SECONDS
+from .policy import compiled_policy
 from .state import State
 from .utils import seconds_since_midnight
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class SchedulerDecision:
-    """Scheduler döntés eredménye."""
+    """Scheduler döntés eredménye (immutábilis, __dict__ nélkül)."""
 
     allowed: bool
     reason: str
@@ -32,26 +32,36 @@ class SchedulerDecision:
     burst_type: Optional[str] = None  # "p0" | "p1" | None
 
 
-def compute_earned_calls(max_calls_per_day: int) -> float:
+def compute_earned_calls(max_calls_per_day: int, elapsed_today: Optional[float] = None) -> int:
     """
-    Kiszámolja, hány hívás "járna" eddig a nap folyamán.
-    earned_calls = (eltelt_idő_ma / nap_hossza) * max_calls_per_day
+    Kiszámolja, hány teljes hívás "járna" eddig a nap folyamán.
+    earned_calls = floor(eltelt_mp_ma * max_calls_per_day / nap_hossza)
+
+    Egész aritmetikával számol (egész másodpercekre csonkolva), így nem kell
+    külön math.floor a hívó oldalon.
+
+    elapsed_today: éjfél óta eltelt másodpercek (ha None, most mérjük).
     """
-    elapsed = seconds_since_midnight()
-    return (elapsed / DAY_SECONDS) * max_calls_per_day
+    elapsed = seconds_since_midnight() if elapsed_today is None else elapsed_today
+    return (int(elapsed) * max_calls_per_day) // DAY_SECONDS
 
 
-def compute_wait_seconds(calls_today: int, max_calls_per_day: int) -> float:
+def compute_wait_seconds(
+    calls_today: int,
+    max_calls_per_day: int,
+    elapsed_today: Optional[float] = None,
+) -> float:
     """
     Kiszámolja, mennyi időt kell várni, hogy a következő hívás "megérjen".
+
+    elapsed_today: éjfél óta eltelt másodpercek (ha None, most mérjük).
     """
     if max_calls_per_day <= 0:
         return 0.0
 
-    # calls_today + 1 híváshoz szükséges idő
-    needed_fraction = (calls_today + 1) / max_calls_per_day
-    needed_seconds = needed_fraction * DAY_SECONDS
-    elapsed = seconds_since_midnight()
+    # calls_today + 1 híváshoz szükséges idő (egész szorzat, egyetlen osztás)
+    needed_seconds = (calls_today + 1) * DAY_SECONDS / max_calls_per_day
+    elapsed = seconds_since_midnight() if elapsed_today is None else elapsed_today
 
     wait = needed_seconds - elapsed
     return max(0.0, wait)
@@ -75,16 +85,15 @@ def scheduler_check(
     Returns:
         SchedulerDecision a döntéssel
     """
-    # Scheduler konfig
-    sched = policy.get("scheduler", {})
-    enabled = bool(sched.get("enabled", True))
+    # Scheduler konfig (előfeldolgozott policy nézetből)
+    view = compiled_policy(policy)
 
-    if not enabled:
+    if not view.scheduler_enabled:
         return SchedulerDecision(allowed=True, reason="scheduler_disabled")
 
-    max_calls = int(policy.get("max_calls_per_day", DEFAULT_MAX_CALLS_PER_DAY))
-    burst_p0 = int(sched.get("burst_p0", DEFAULT_BURST_P0))
-    burst_p1 = int(sched.get("burst_p1", DEFAULT_BURST_P1))
+    max_calls = view.max_calls_per_day
+    burst_p0 = view.burst_p0
+    burst_p1 = view.burst_p1
 
     # 1. Ellenőrzés: elértük-e a napi limitet?
     if state.calls_today >= max_calls:
@@ -93,9 +102,9 @@ def scheduler_check(
             reason="scheduler_daily_calls_cap",
         )
 
-    # 2. Kiszámoljuk az earned calls-t
-    earned = compute_earned_calls(max_calls)
-    earned_floor = math.floor(earned)
+    # 2. Kiszámoljuk az earned calls-t (egy időpont a teljes döntéshez)
+    elapsed_today = seconds_since_midnight()
+    earned_floor = compute_earned_calls(max_calls, elapsed_today)
 
     # 3. Ha a hívásszám még a "megérdemelt" alatt van → OK
     if state.calls_today < earned_floor:
@@ -121,7 +130,7 @@ def scheduler_check(
             )
 
     # 5. P2 vagy kimerült burst → várni kell
-    wait_secs = compute_wait_seconds(state.calls_today, max_calls)
+    wait_secs = compute_wait_seconds(state.calls_today, max_calls, elapsed_today)
 
     return SchedulerDecision(
         allowed=False,
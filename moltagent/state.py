@@ -5,17 +5,63 @@ Crash recovery támogatással:
 - Atomi írás (temp file + rename)
 - fsync() a lemezre íráshoz
 - Korrupt state kezelés
+
+A megválaszolt event_id-k nem a state fájlban, hanem egy mellette lévő,
+csak hozzáfűzött JSONL naplóban (replied_log_path) vannak: mentéskor csak
+az új azonosítók íródnak ki, nem a teljes lista.
 """
 from __future__ import annotations
 
-import json
+import atexit
 import os
+import threading
+import time
+from collections.abc import MutableSet
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional, Set
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 from .config import STATE_FILE, LOG_DIR
-from .utils import day_key_local, hour_key_local
+from .utils import append_jsonl, day_key_local, hour_key_local, json_dumps, json_loads, jsonl_line
+
+__all__ = [
+    "State",
+    "compact_state",
+    "ensure_today",
+    "force_sync_state",
+    "load_state",
+    "replied_log_path",
+    "save_state",
+    "start_flush_thread",
+]
+
+# Ennyi azonosítónként a replied napló újraíródik (duplikátumok nélkül)
+REPLIED_COMPACT_EVERY = 10000
+
+# A state fájl fsync-je kötegelve: legfeljebb ennyi mentésenként / másodpercenként
+STATE_FSYNC_EVERY = 32
+STATE_FSYNC_INTERVAL_SEC = 5.0
+
+# A save_state által írt kulcsok és típusaik: ha egy fájl pontosan ezeket
+# tartalmazza, pontosan ilyen típussal, konverzió nélkül betölthető
+_SAVED_TYPES: Dict[str, type] = {
+    "day_key": str,
+    "spent_usd": float,
+    "calls_today": int,
+    "last_call_ts": float,
+    "p2_replies_this_hour": int,
+    "hour_key": str,
+    "burst_used_p0": int,
+    "burst_used_p1": int,
+}
+_SAVED_KEYS = frozenset(_SAVED_TYPES)
+
+_saves_since_fsync = 0
+_last_fsync_ts = 0.0
+_unsynced_state_file: Optional[str] = None
+
+# save_state sorosítása (a háttér-flusher és a fő szál között)
+_save_lock = threading.Lock()
 
 
 @dataclass
@@ -33,20 +79,212 @@ class State:
     burst_used_p0: int = 0
     burst_used_p1: int = 0
 
-    # Idempotencia: megválaszolt event_id-k (NEM resetelődik naponta)
-    replied_event_ids: Set[str] = field(default_factory=set)
+    # Idempotencia: megválaszolt event_id-k (NEM resetelődik naponta).
+    # Mindig _RepliedIdSet (lásd __setattr__), így a közvetlen add() is a
+    # replied naplóba kerül.
+    replied_event_ids: MutableSet[str] = field(default_factory=set)
+
+    # Van-e a lemezen lévőhöz képest mentetlen változás (save_state törli)
+    _dirty: bool = field(default=True, init=False, repr=False, compare=False)
 
     def __post_init__(self):
         if not self.hour_key:
             self.hour_key = hour_key_local()
 
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name == "replied_event_ids":
+            # Más state halmaza (pl. dataclasses.replace): közös adat, saját
+            # kiírandó lista; idegen halmaz: minden eleme kiírandó
+            if isinstance(value, _RepliedIdSet):
+                value = value._fork()
+            else:
+                value = _RepliedIdSet(value, list(value))
+        # Publikus mező írása (pl. calls_today += 1) piszkossá teszi a state-et
+        object.__setattr__(self, name, value)
+        if name[0] != "_":
+            object.__setattr__(self, "_dirty", True)
+
+    @property
+    def _unlogged(self) -> List[str]:
+        """A replied naplóba még ki nem írt azonosítók (save_state üríti)."""
+        return self.replied_event_ids._unlogged
+
+    @_unlogged.setter
+    def _unlogged(self, event_ids: List[str]) -> None:
+        self.replied_event_ids._unlogged = event_ids
+
+    def _needs_save(self) -> bool:
+        """Van-e mentetlen számláló, kiíratlan vagy törölt azonosító."""
+        ids = self.replied_event_ids
+        return self._dirty or bool(ids._unlogged) or ids._compact
+
     def has_replied(self, event_id: str) -> bool:
         """Ellenőrzi, hogy az event_id már meg lett-e válaszolva."""
         return event_id in self.replied_event_ids
 
     def mark_replied(self, event_id: str) -> None:
         """Megjelöli az event_id-t megválaszoltként."""
-        self.replied_event_ids.add(event_id)
+        ids = self.replied_event_ids
+        if event_id not in ids:
+            ids.add(event_id)
+            self._dirty = True
+
+
+def replied_log_path(state_file: str = STATE_FILE) -> str:
+    """A state fájl melletti replied napló útvonala (agent_state.replied_events.jsonl)."""
+    return os.path.splitext(state_file)[0] + ".replied_events.jsonl"
+
+
+class _RepliedIdSet(MutableSet):
+    """
+    A megválaszolt azonosítók halmaza, a replied naplóba még ki nem írtak listájával.
+
+    Minden írás ezen megy át: add / update az új azonosítót a _unlogged
+    listába is felveszi (ebből ír save_state a naplóba), a discard pedig a
+    napló tömörítését kéri (_compact), mert a hozzáfűzött naplóból törölni
+    nem lehet.
+
+    Copy-on-write: olvasáskor (in / len / iterálás) a kapott (pl. a replied
+    napló cache-elt) halmazt használja; csak az első módosítás készít saját
+    másolatot. Így a csak számlálókat olvasó load_state hívások nem másolnak
+    N elemet.
+    """
+
+    __slots__ = ("_ids", "_owned", "_unlogged", "_compact")
+
+    def __init__(self, ids: Iterable[str] = frozenset(), unlogged: Optional[List[str]] = None):
+        self._ids = ids
+        self._owned = False
+        self._unlogged = [] if unlogged is None else unlogged
+        self._compact = False
+
+    def _own(self) -> Set[str]:
+        if not self._owned:
+            self._ids = set(self._ids)
+            self._owned = True
+        return self._ids
+
+    def _fork(self) -> "_RepliedIdSet":
+        """Másolat közös adattal (mindkettő copy-on-write) és saját kiírandó listával."""
+        self._owned = False
+        other = _RepliedIdSet(self._ids, list(self._unlogged))
+        other._compact = self._compact
+        return other
+
+    def __copy__(self) -> "_RepliedIdSet":
+        return self._fork()
+
+    @classmethod
+    def _from_iterable(cls, it: Iterable[str]) -> Set[str]:
+        # |, &, - stb. eredménye sima halmaz (nem nézet egy generátor körül)
+        return set(it)
+
+    def __contains__(self, event_id: object) -> bool:
+        return event_id in self._ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __repr__(self) -> str:
+        return f"_RepliedIdSet({set(self._ids)!r})"
+
+    def add(self, event_id: str) -> None:
+        if event_id not in self._ids:
+            self._own().add(event_id)
+            self._unlogged.append(event_id)
+
+    def discard(self, event_id: str) -> None:
+        if event_id in self._ids:
+            self._own().discard(event_id)
+            self._compact = True
+
+    def update(self, event_ids: Iterable[str]) -> None:
+        for event_id in event_ids:
+            self.add(event_id)
+
+
+# Már beolvasott replied napló: path -> (st_ino, feldolgozott bájtok, azonosítók)
+_replied_log_cache: Dict[str, Tuple[int, int, Set[str]]] = {}
+
+
+def _load_replied_log(path: str) -> "_RepliedIdSet":
+    """
+    A replied napló azonosítói; a sérült (pl. félbeszakadt) sorokat kihagyja.
+
+    Csak a legutóbbi betöltés óta hozzáfűzött teljes sorokat dolgozza fel
+    (_replied_log_cache); új fájl (más inode) vagy rövidülés esetén elölről.
+    A cache-elt halmazt _RepliedIdSet nézetként adja vissza (a hívó
+    módosítása nem hat vissza). Az új sorok helyben kerülnek a cache-elt
+    halmazba (nincs N elemes másolás): a még nem módosított, korábban kiadott
+    nézetek is látják őket - ezek valóban megválaszolt azonosítók.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        _replied_log_cache.pop(path, None)
+        return _RepliedIdSet(set())
+    with f:
+        stat = os.fstat(f.fileno())
+        cached = _replied_log_cache.get(path)
+        if cached is not None and cached[0] == stat.st_ino and cached[1] <= stat.st_size:
+            _, offset, ids = cached
+            f.seek(offset)
+        else:
+            offset, ids = 0, set()
+        data = f.read()
+
+    end = data.rfind(b"\n") + 1  # a lezáratlan utolsó sort a következő betöltés olvassa
+    if end:
+        for line in data[:end].splitlines():
+            try:
+                ids.add(json_loads(line)["event_id"])
+            except (ValueError, KeyError, TypeError):
+                continue
+    _replied_log_cache[path] = (stat.st_ino, offset + end, ids)
+    return _RepliedIdSet(ids)
+
+
+def _append_replied_log(path: str, event_ids: List[str]) -> None:
+    """Új azonosítók hozzáfűzése a replied naplóhoz (egy write + fsync)."""
+    buf = b"".join(jsonl_line({"event_id": event_id}) for event_id in event_ids)
+    with open(path, "ab") as f:
+        f.write(buf)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def compact_state(st: State, state_file: str = STATE_FILE) -> None:
+    """
+    A replied naplót a memóriabeli halmazból újraírja (duplikátumok nélkül).
+
+    Atomi: temp fájl + fsync + rename, így félbeszakadt tömörítés után a
+    régi napló marad érvényben.
+    """
+    path = replied_log_path(state_file)
+    temp_file = path + ".tmp"
+    # A pillanatkép előtt számolva: a később hozzáfűzöttek a listában maradnak
+    ids = st.replied_event_ids
+    n = len(ids._unlogged)
+    compact, ids._compact = ids._compact, False
+    try:
+        buf = b"".join(jsonl_line({"event_id": event_id}) for event_id in sorted(st.replied_event_ids))
+        with open(temp_file, "wb") as f:
+            f.write(buf)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, path)
+    except Exception:
+        try:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+        except Exception:
+            pass
+        ids._compact = ids._compact or compact
+        raise
+    del ids._unlogged[:n]
 
 
 def _log_state_error(error_type: str, message: str, backup_path: Optional[str] = None) -> None:
@@ -60,12 +298,21 @@ def _log_state_error(error_type: str, message: str, backup_path: Optional[str] =
             "message": message,
             "backup_path": backup_path,
         }
-        with open(error_log, "a", encoding="utf-8") as f:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        append_jsonl(error_log, entry, flush=True)
     except Exception:
         pass  # Ha a logolás nem sikerül, ne álljon le
 
 
+def _fresh_state(today: str, hour: str, state_file: str) -> State:
+    """Új state nullázott számlálókkal, de a replied napló azonosítóival."""
+    st = State(
+        day_key=today,
+        hour_key=hour,
+        replied_event_ids=_load_replied_log(replied_log_path(state_file)),
+    )
+    return st
+
+
 def load_state(state_file: str = STATE_FILE) -> State:
     """
     Betölti az állapotot fájlból, vagy újat hoz létre.
@@ -73,17 +320,17 @@ def load_state(state_file: str = STATE_FILE) -> State:
     Crash recovery:
     - Korrupt JSON → backup + fresh state + log
     - Hiányzó fájl → fresh state
+    (A replied napló azonosítói fresh state esetén is megmaradnak.)
     """
     today = day_key_local()
     hour = hour_key_local()
 
-    if not os.path.exists(state_file):
-        return State(day_key=today, hour_key=hour)
-
     try:
-        with open(state_file, "r", encoding="utf-8") as f:
-            data: Dict[str, Any] = json.load(f)
-    except json.JSONDecodeError as e:
+        with open(state_file, "rb") as f:
+            data: Dict[str, Any] = json_loads(f.read())
+    except FileNotFoundError:
+        return _fresh_state(today, hour, state_file)
+    except ValueError as e:  # json / orjson JSONDecodeError
         # Korrupt JSON - backup + fresh state
         timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
         backup_path = f"{state_file}.corrupt.{timestamp}"
@@ -96,16 +343,20 @@ def load_state(state_file: str = STATE_FILE) -> State:
             )
         except Exception:
             pass
-        return State(day_key=today, hour_key=hour)
+        return _fresh_state(today, hour, state_file)
     except Exception:
-        return State(day_key=today, hour_key=hour)
+        return _fresh_state(today, hour, state_file)
 
-    # replied_event_ids NEM resetelődik naponta
-    replied_ids = set(data.get("replied_event_ids", []))
+    # replied_event_ids NEM resetelődik naponta: a napló + (régi formátumú
+    # state esetén) a fájlban tárolt lista uniója. Csak a naplóban még nem
+    # szereplő (régi formátumú) azonosítók kerülnek a kiírandók közé.
+    replied_ids = _load_replied_log(replied_log_path(state_file))
+    legacy_ids = [i for i in data.get("replied_event_ids", ()) if i not in replied_ids]
+    replied_ids.update(legacy_ids)
 
     # Ha új nap van, reseteljük a napi számlálókat (de replied_event_ids marad!)
     if data.get("day_key") != today:
-        return State(
+        st = State(
             day_key=today,
             spent_usd=0.0,
             calls_today=0,
@@ -116,7 +367,48 @@ def load_state(state_file: str = STATE_FILE) -> State:
             burst_used_p1=0,
             replied_event_ids=replied_ids,
         )
+        return st
 
+    if data.keys() == _SAVED_KEYS and _has_saved_types(data):
+        st = _load_trusted(data, replied_ids, legacy_ids)
+    else:
+        st = _load_validated(data, today, hour, replied_ids, legacy_ids)
+
+    # Reset hourly cap if hour changed
+    if st.hour_key != hour:
+        st.hour_key = hour
+        st.p2_replies_this_hour = 0
+
+    return st
+
+
+def _has_saved_types(data: Dict[str, Any]) -> bool:
+    """Minden mező pontosan a save_state által írt típusú-e (pl. kézzel írt "7" nem)."""
+    for key, typ in _SAVED_TYPES.items():
+        if type(data[key]) is not typ:
+            return False
+    return True
+
+
+def _load_trusted(data: Dict[str, Any], replied_ids: _RepliedIdSet, legacy_ids: List[str]) -> State:
+    """Saját (save_state) formátumú fájl: mezők közvetlen beállítása, konverzió nélkül."""
+    st = State.__new__(State)
+    st.__dict__.update(
+        data,
+        replied_event_ids=replied_ids,
+        _dirty=bool(legacy_ids),
+    )
+    return st
+
+
+def _load_validated(
+    data: Dict[str, Any],
+    today: str,
+    hour: str,
+    replied_ids: _RepliedIdSet,
+    legacy_ids: List[str],
+) -> State:
+    """Ismeretlen / régi formátumú fájl: mezőnkénti típuskonverzióval."""
     st = State(
         day_key=today,
         spent_usd=float(data.get("spent_usd", 0.0)),
@@ -128,13 +420,47 @@ def load_state(state_file: str = STATE_FILE) -> State:
         burst_used_p1=int(data.get("burst_used_p1", 0) or 0),
         replied_event_ids=replied_ids,
     )
+    # A fájlból betöltött state tiszta, hacsak nincs kiírandó régi azonosító
+    st._dirty = bool(legacy_ids)
+    return st
 
-    # Reset hourly cap if hour changed
-    if st.hour_key != hour:
-        st.hour_key = hour
-        st.p2_replies_this_hour = 0
 
-    return st
+def _fsync_due() -> bool:
+    """Esedékes-e a state fájl fsync-je (STATE_FSYNC_EVERY / _INTERVAL_SEC)."""
+    return (
+        _saves_since_fsync + 1 >= STATE_FSYNC_EVERY
+        or time.monotonic() - _last_fsync_ts >= STATE_FSYNC_INTERVAL_SEC
+    )
+
+
+def _mark_synced() -> None:
+    global _saves_since_fsync, _last_fsync_ts, _unsynced_state_file
+    _saves_since_fsync = 0
+    _last_fsync_ts = time.monotonic()
+    _unsynced_state_file = None
+
+
+def force_sync_state(state_file: Optional[str] = None) -> None:
+    """
+    A legutóbb mentett (még nem fsync-elt) state fájl lemezre kényszerítése.
+
+    Leálláskor hívandó; atexit-ként is regisztrálva van.
+    """
+    path = state_file or _unsynced_state_file
+    if path is None:
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    _mark_synced()
+
+
+atexit.register(force_sync_state)
 
 
 def save_state(st: State, state_file: str = STATE_FILE) -> None:
@@ -143,9 +469,58 @@ def save_state(st: State, state_file: str = STATE_FILE) -> None:
 
     Crash recovery:
     - Temp fájlba ír, majd atomi rename
-    - fsync() biztosítja a lemezre írást
     - Ha a rename sikertelen, a régi state megmarad
+    - fsync() kötegelve: STATE_FSYNC_EVERY mentésenként vagy
+      STATE_FSYNC_INTERVAL_SEC másodpercenként (és force_sync_state-kor).
+      Tartóssági ablak: folyamat-crash nem veszít adatot (a page cache
+      megmarad), de áramszünet/OS-crash esetén az utolsó legfeljebb
+      ennyi mentés számlálói elveszhetnek (korrupt fájl → fresh state).
+      A replied napló minden hozzáfűzéskor fsync-elt, így dupla válasz
+      ekkor sem lesz.
+
+    Az új megválaszolt azonosítók előbb a replied naplóba kerülnek (így egy
+    közbeni crash után sem válaszolunk újra); REPLIED_COMPACT_EVERY
+    azonosítónként a napló tömörítődik (compact_state).
+
+    Sikeres mentés után st._dirty hamis; a hívások _save_lock alatt
+    sorosítva futnak (start_flush_thread).
     """
+    with _save_lock:
+        _save_state_locked(st, state_file)
+
+
+def _save_state_locked(st: State, state_file: str) -> None:
+    # A pillanatkép előtt törölve: a közben érkező módosítás újra piszkosít
+    st._dirty = False
+    try:
+        _write_state_locked(st, state_file)
+    except Exception:
+        st._dirty = True
+        raise
+
+
+def _write_state_locked(st: State, state_file: str) -> None:
+    global _saves_since_fsync, _unsynced_state_file
+    # Csak az eddig összegyűlt n azonosító íródik ki és törlődik: a közben
+    # (pl. másik szálból) mark_replied-dal hozzáfűzöttek a listában maradnak
+    ids = st.replied_event_ids
+    unlogged = ids._unlogged
+    n = len(unlogged)
+    crossed = False
+    if n:
+        _append_replied_log(replied_log_path(state_file), unlogged[:n])
+        del unlogged[:n]
+        total = len(ids)
+        crossed = (total - n) // REPLIED_COMPACT_EVERY != total // REPLIED_COMPACT_EVERY
+    if ids._compact:
+        # Törölt azonosító: a hozzáfűzött naplóból csak újraírással tűnik el
+        compact_state(st, state_file)
+    elif crossed:
+        try:
+            compact_state(st, state_file)
+        except OSError:
+            pass  # a tömörítés opcionális: a hozzáfűzött napló így is érvényes
+
     data = {
         "day_key": st.day_key,
         "spent_usd": st.spent_usd,
@@ -155,21 +530,31 @@ def save_state(st: State, state_file: str = STATE_FILE) -> None:
         "hour_key": st.hour_key,
         "burst_used_p0": st.burst_used_p0,
         "burst_used_p1": st.burst_used_p1,
-        "replied_event_ids": sorted(st.replied_event_ids),
     }
 
+    # Egyetlen bájt-blob, egyetlen write() (nincs indent, nincs darabolt írás)
+    buf = json_dumps(data)
+
     # Atomi írás: temp file + rename
     temp_file = state_file + ".tmp"
 
     try:
-        with open(temp_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+        with open(temp_file, "wb") as f:
+            f.write(buf)
             f.flush()
-            os.fsync(f.fileno())  # Force write to disk
+            sync = _fsync_due()
+            if sync:
+                os.fsync(f.fileno())  # Force write to disk
 
         # Atomi rename (POSIX-on garantáltan atomi)
         os.replace(temp_file, state_file)
 
+        if sync:
+            _mark_synced()
+        else:
+            _saves_since_fsync += 1
+            _unsynced_state_file = state_file
+
     except Exception:
         # Ha bármi hiba, próbáljuk törölni a temp fájlt
         try:
@@ -180,10 +565,16 @@ def save_state(st: State, state_file: str = STATE_FILE) -> None:
         raise
 
 
-def ensure_today(st: State) -> State:
-    """Ellenőrzi, hogy a state a mai napra vonatkozik-e, és resetel ha kell."""
-    today = day_key_local()
-    hour = hour_key_local()
+def ensure_today(st: State, today: Optional[str] = None, hour: Optional[str] = None) -> State:
+    """
+    Ellenőrzi, hogy a state a mai napra vonatkozik-e, és resetel ha kell.
+
+    today / hour: a hívó által már kiszámolt kulcsok (None → most számolja).
+    """
+    if today is None:
+        today = day_key_local()
+    if hour is None:
+        hour = hour_key_local()
 
     if st.day_key != today:
         st.day_key = today
@@ -196,5 +587,37 @@ def ensure_today(st: State) -> State:
         st.hour_key = hour
         st.p2_replies_this_hour = 0
 
-    save_state(st)
+    # Csak ha volt reset vagy mentetlen módosítás (nem minden eseménynél)
+    if st._needs_save():
+        save_state(st)
     return st
+
+
+def start_flush_thread(
+    st: State,
+    interval: float = 2.0,
+    state_file: str = STATE_FILE,
+) -> threading.Event:
+    """
+    Háttérszál, ami interval másodpercenként elmenti st-t, ha piszkos.
+
+    Visszaadja a leállító Event-et; set() után a szál még egy utolsó
+    mentést végez. Csak akkor használható, ha st az egyetlen élő példány
+    (aki minden eseménynél load_state-tel újratölt, az ne indítsa).
+    """
+    stop = threading.Event()
+
+    def _flush() -> None:
+        if st._needs_save():
+            try:
+                save_state(st, state_file)
+            except Exception:
+                pass  # a következő körben újrapróbálja (_dirty igaz maradt)
+
+    def _run() -> None:
+        while not stop.wait(interval):
+            _flush()
+        _flush()
+
+    threading.Thread(target=_run, name="state-flush", daemon=True).start()
+    return stop
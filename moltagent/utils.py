@@ -3,10 +3,22 @@ Segédfüggvények: idő, JSON, stb.
 """
 from __future__ import annotations
 
+import atexit
+import gzip
 import json
 import os
+import shutil
+import threading
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from .config import LOG_ROTATE_MAX_BYTES, LOG_ROTATE_KEEP
+
+try:  # opcionális: gyorsabb JSON szerializálás, ha telepítve van
+    import orjson
+except ImportError:  # pragma: no cover - a stdlib json a fallback
+    orjson = None
 
 # -------------------------
 # TIMEZONE (Budapest-ish fixed offset)
@@ -20,14 +32,40 @@ def now_local() -> datetime:
     return datetime.now(tz=TZ)
 
 
+_TZ_OFFSET_SEC = int(TZ_HOURS * 3600)
+
+# (órás bucket, day_key, hour_key): a kulcsok csak órahatáron változnak
+_key_cache: Tuple[int, str, str] = (-1, "", "")
+
+
+def hour_bucket_local() -> int:
+    """Aktuális helyi óra egész sorszáma (epoch óta eltelt helyi órák)."""
+    return (int(time.time()) + _TZ_OFFSET_SEC) // 3600
+
+
+def _local_keys() -> Tuple[str, str]:
+    """Napi és órás kulcs; csak új órás bucket esetén formáz újra."""
+    global _key_cache
+    bucket = hour_bucket_local()
+    cached_bucket, day, hour = _key_cache
+    if bucket == cached_bucket:
+        return day, hour
+    now = datetime.fromtimestamp(bucket * 3600 - _TZ_OFFSET_SEC, tz=TZ)
+    # f-string: nincs strftime formátum-feldolgozás
+    day = f"{now.year:04d}-{now.month:02d}-{now.day:02d}"
+    hour = f"{day}-{now.hour:02d}"
+    _key_cache = (bucket, day, hour)
+    return day, hour
+
+
 def day_key_local() -> str:
     """Mai nap kulcsa: YYYY-MM-DD."""
-    return now_local().strftime("%Y-%m-%d")
+    return _local_keys()[0]
 
 
 def hour_key_local() -> str:
     """Aktuális óra kulcsa: YYYY-MM-DD-HH."""
-    return now_local().strftime("%Y-%m-%d-%H")
+    return _local_keys()[1]
 
 
 def seconds_since_midnight() -> float:
@@ -42,10 +80,151 @@ def ensure_dirs(log_dir: str) -> None:
     os.makedirs(log_dir, exist_ok=True)
 
 
-def append_jsonl(path: str, obj: Dict[str, Any]) -> None:
-    """JSONL fájlhoz hozzáfűz egy sort."""
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+def json_dumps(obj: Any) -> bytes:
+    """Tömör JSON UTF-8 bájtként (orjson, ha elérhető; különben stdlib json)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass  # pl. nem-str kulcs / túl nagy int: a stdlib json kezeli
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def jsonl_line(obj: Dict[str, Any]) -> bytes:
+    """Egy JSONL sor UTF-8 bájtként (lásd json_dumps)."""
+    return json_dumps(obj) + b"\n"
+
+
+def json_loads(data: bytes) -> Any:
+    """JSON bájtok → Python objektum (orjson, ha elérhető; különben stdlib json).
+
+    Amit az orjson elutasít (pl. NaN / Infinity), azt a stdlib json még
+    egyszer megpróbálja - így a viselkedés és a hibaüzenetek is a régiek.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+# Nyitva tartott, pufferelt JSONL író handle-ök útvonal szerint:
+# path -> [handle, flush óta írt sorok száma]
+JSONL_BUFFER_SIZE = 64 * 1024
+JSONL_FLUSH_EVERY = 100
+_jsonl_writers: Dict[str, List[Any]] = {}
+_jsonl_lock = threading.Lock()
+
+
+def append_jsonl(path: str, obj: Dict[str, Any], flush: bool = False) -> None:
+    """
+    JSONL fájlhoz hozzáfűz egy sort.
+
+    A fájl egyszer nyílik meg és nyitva marad (nincs open/close soronként);
+    a puffer JSONL_FLUSH_EVERY soronként, flush=True esetén azonnal,
+    illetve flush_jsonl / rotate_jsonl_if_needed / kilépéskor ürül.
+    Az audit naplók (decision / operator / outbound / daily summary)
+    flush=True-val íródnak; pufferelve csak a nagy forgalmú event napló.
+    """
+    line = jsonl_line(obj)
+    with _jsonl_lock:
+        writer = _jsonl_writers.get(path)
+        if writer is not None and flush and _jsonl_moved(writer[0], path):
+            # Kívülről törölt / rotált fájl: a régi handle-be írt sor elveszne
+            _sync_jsonl_writer(path)
+            writer = None
+        if writer is None:
+            writer = _jsonl_writers[path] = [open(path, "ab", buffering=JSONL_BUFFER_SIZE), 0]
+        f: BinaryIO = writer[0]
+        f.write(line)
+        writer[1] += 1
+        if flush or writer[1] >= JSONL_FLUSH_EVERY:
+            f.flush()
+            writer[1] = 0
+
+
+def _jsonl_moved(f: BinaryIO, path: str) -> bool:
+    """A handle már nem a path-on lévő fájlé (törölték vagy lecserélték)."""
+    try:
+        return not os.path.samestat(os.fstat(f.fileno()), os.stat(path))
+    except OSError:
+        return True
+
+
+def _sync_jsonl_writer(path: str) -> None:
+    """Üríti path handle-jét; ha a fájlt közben törölték/lecserélték, le is zárja."""
+    writer = _jsonl_writers.get(path)
+    if writer is None:
+        return
+    f: BinaryIO = writer[0]
+    f.flush()
+    writer[1] = 0
+    if _jsonl_moved(f, path):
+        f.close()
+        del _jsonl_writers[path]
+
+
+def flush_jsonl(path: Optional[str] = None) -> None:
+    """Kiírja az append_jsonl pufferét (path=None: minden nyitott fájlét)."""
+    with _jsonl_lock:
+        for p in [path] if path is not None else list(_jsonl_writers):
+            _sync_jsonl_writer(p)
+
+
+def close_jsonl(path: Optional[str] = None) -> None:
+    """Kiírja és lezárja az append_jsonl handle-(ö)ket (path=None: mindet)."""
+    with _jsonl_lock:
+        for p in [path] if path is not None else list(_jsonl_writers):
+            writer = _jsonl_writers.pop(p, None)
+            if writer is not None:
+                try:
+                    writer[0].close()
+                except OSError:
+                    pass
+
+
+atexit.register(close_jsonl)
+
+
+def rotate_jsonl_if_needed(
+    path: str,
+    max_bytes: int = LOG_ROTATE_MAX_BYTES,
+    keep: int = LOG_ROTATE_KEEP,
+) -> bool:
+    """
+    Méret alapú rotáció: ha a log nagyobb, mint max_bytes, akkor
+    path → path.1.gz (a régebbi archívumok eggyel eltolva, max keep darab).
+
+    Így az aktív log mérete korlátos, a shell parancsai (tail/why/...)
+    elsőként csak a friss fájlt olvassák.
+
+    Returns:
+        True ha történt rotáció.
+    """
+    flush_jsonl(path)  # a méret a pufferelt sorokkal együtt számít
+    try:
+        if os.path.getsize(path) <= max_bytes:
+            return False
+    except OSError:
+        return False
+
+    oldest = f"{path}.{keep}.gz"
+    if os.path.exists(oldest):
+        os.remove(oldest)
+    for i in range(keep - 1, 0, -1):
+        src = f"{path}.{i}.gz"
+        if os.path.exists(src):
+            os.replace(src, f"{path}.{i + 1}.gz")
+
+    # Először átnevezzük, hogy az új írások már friss fájlba menjenek
+    close_jsonl(path)
+    rotated = f"{path}.1"
+    os.replace(path, rotated)
+    with open(rotated, "rb") as src_f, gzip.open(f"{path}.1.gz", "wb") as dst_f:
+        shutil.copyfileobj(src_f, dst_f)
+    os.remove(rotated)
+    return True
 
 
 def estimate_tokens(text: str, chars_per_token: float = 4.0) -> int:
@@ -0,0 +1,29 @@
+"""
+Shared pytest fixtures.
+"""
+import pytest
+
+from moltagent.decision import should_reply
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "fast: pure-Python unit test (no file, clock or network I/O); select with -m fast"
+    )
+
+
+@pytest.fixture
+def decide(monkeypatch):
+    """
+    should_reply harness: ensure_today returns the given state unchanged,
+    and scheduler_check returns `scheduler` if one is given.
+
+    Usage: decide(event, policy, state, scheduler=SimpleNamespace(allowed=...))
+    """
+    def _decide(event, policy, state, scheduler=None):
+        monkeypatch.setattr("moltagent.decision.ensure_today", lambda st: st)
+        if scheduler is not None:
+            monkeypatch.setattr("moltagent.decision.scheduler_check", lambda *args, **kwargs: scheduler)
+        return should_reply(event, policy, state)
+
+    return _decide
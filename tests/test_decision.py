@@ -1,31 +1,53 @@
 """
 Tests for moltagent.decision (Reply decision logic)
 """
+import dataclasses
 import pytest
-from unittest.mock import patch, MagicMock
-
-from moltagent.decision import should_reply, keyword_hit, _check_budget, _check_soft_cap
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from moltagent.decision import (
+    should_reply,
+    keyword_hit,
+    event_features,
+    FEATURES_KEY,
+    _check_budget,
+    _check_soft_cap,
+    _phase1_cache,
+    clear_phase1_cache,
+)
+from moltagent.policy import compile_keywords, invalidate_compiled
 from moltagent.state import State
 
+pytestmark = pytest.mark.fast
 
-@pytest.fixture
-def base_state():
-    """Fresh state for testing."""
-    return State(
-        day_key="2026-02-03",
-        hour_key="2026-02-03-12",
-        calls_today=0,
-        p2_replies_this_hour=0,
-        burst_used_p0=0,
-        burst_used_p1=0,
-        replied_event_ids=set(),
-    )
 
+# should_reply only reads replied_event_ids: one shared immutable empty set
+_EMPTY_IDS = frozenset()
 
-@pytest.fixture
-def base_policy():
-    """Default policy for testing."""
-    return {
+_STATE_TEMPLATE = State(
+    day_key="2026-02-03",
+    hour_key="2026-02-03-12",
+    calls_today=0,
+    p2_replies_this_hour=0,
+    burst_used_p0=0,
+    burst_used_p1=0,
+    replied_event_ids=_EMPTY_IDS,
+)
+
+def make_state(**overrides):
+    """Fresh decision-test state: _STATE_TEMPLATE with field overrides."""
+    return dataclasses.replace(_STATE_TEMPLATE, **overrides)
+
+
+def make_policy(**overrides):
+    """
+    Fresh default policy (a new literal each call, no deepcopy).
+
+    A dict override is merged into the nested section one level deep, e.g.
+    make_policy(daily_budget_usd=0.01, scheduler={"enabled": True}).
+    """
+    policy = {
         "max_calls_per_day": 200,
         "scheduler": {
             "enabled": False,  # Disable scheduler for basic tests
@@ -41,22 +63,156 @@ def base_policy():
             "block_keywords": ["api key", "password", "secret"],
         },
     }
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(policy.get(key), dict):
+            policy[key] = {**policy[key], **value}
+        else:
+            policy[key] = value
+    return policy
+
+
+@pytest.fixture
+def base_state():
+    """Fresh state for testing."""
+    return make_state()
+
+
+@pytest.fixture
+def base_policy():
+    """Default policy for testing (free to mutate)."""
+    return make_policy()
+
+
+@pytest.fixture(scope="session")
+def policy_ro():
+    """Shared read-only default policy: its compiled caches are built once per session."""
+    return make_policy()
+
+
+def _sched(**overrides):
+    """Plain scheduler_check result stub (defaults: allowed within pace)."""
+    fields = {
+        "allowed": True,
+        "reason": "scheduler_within_pace",
+        "wait_seconds": 0.0,
+        "used_burst": False,
+        "burst_type": None,
+    }
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+@pytest.fixture(autouse=True)
+def _stub_ensure_today(monkeypatch):
+    """ensure_today returns the state it gets (no clock, no disk)."""
+    monkeypatch.setattr("moltagent.decision.ensure_today", lambda st: st)
+
+
+_KW_BC = ("budget", "cost")
+_KW_B = ("budget",)
+_KW_EMPTY = ()
 
 
 class TestKeywordHit:
     """Tests for keyword_hit helper."""
 
-    def test_keyword_found(self):
-        assert keyword_hit("how do i set a budget?", ["budget", "cost"]) is True
+    @pytest.mark.parametrize("text,keywords,expected", [
+        ("how do i set a budget?", _KW_BC, True),   # keyword found
+        ("hello world", _KW_BC, False),             # keyword not found
+        ("what about budgeting?", _KW_B, True),     # partial match
+        ("anything", _KW_EMPTY, False),             # empty keywords
+    ])
+    def test_keyword_hit(self, text, keywords, expected):
+        assert keyword_hit(text, keywords) is expected
+
+
+class TestCompileKeywords:
+    """Tests for keyword precompilation."""
 
-    def test_keyword_not_found(self):
-        assert keyword_hit("hello world", ["budget", "cost"]) is False
+    def test_lowercased_and_deduplicated(self):
+        assert compile_keywords(["Budget", "budget", "AGENT"]) == ("agent", "budget")
 
-    def test_partial_match(self):
-        assert keyword_hit("what about budgeting?", ["budget"]) is True
+    def test_redundant_longer_keywords_dropped(self):
+        assert compile_keywords(["rate limit", "rate", "moltbook"]) == ("rate", "moltbook")
 
-    def test_empty_keywords(self):
-        assert keyword_hit("anything", []) is False
+    def test_empty(self):
+        assert compile_keywords([]) == ()
+
+    def test_same_hits_as_raw_list(self):
+        raw = ["Rate Limit", "rate", "API key", "budget"]
+        compiled = compile_keywords(raw)
+        lowered = [k.lower() for k in raw]
+        for text in ("what is the rate?", "my api key leaked", "hello", "budgeting"):
+            assert keyword_hit(text, compiled) == keyword_hit(text, lowered)
+
+
+class TestEventFeatures:
+    """Tests for per-event cached features."""
+
+    def test_features_computed(self):
+        event = {"id": "e1", "text": "Hello Agent ", "meta": {"mentions_me": True}}
+        features = event_features(event)
+
+        assert features["text_lower"] == "hello agent "
+        assert features["mentions_me"] is True
+        assert features["is_question"] is False
+
+    def test_question_mark_detected(self):
+        event = {"id": "e1", "text": "What is this?  ", "meta": {}}
+        assert event_features(event)["is_question"] is True
+
+    @pytest.mark.parametrize("text,expected", [
+        ("Why?", True),
+        ("Why?\n\t \r", True),
+        ("? no", False),
+        ("", False),
+        ("   ", False),
+        ("?", True),
+        ("Really?\u00a0", True),
+    ])
+    def test_trailing_question_mark(self, text, expected):
+        assert event_features({"id": "e1", "text": text})["is_question"] is expected
+
+    def test_text_lower_is_lazy(self):
+        event = {"id": "e1", "text": "Hello World", "meta": {}}
+        features = event_features(event)
+
+        assert "text_lower" not in features
+        assert features["text_lower"] == "hello world"
+        assert "text_lower" in features
+
+    def test_mention_without_block_list_skips_lower(self, base_state, base_policy):
+        base_policy["topics"]["block_keywords"] = []
+        event = {"id": "e1", "text": "@agent Hi", "meta": {"mentions_me": True}}
+
+        decision = should_reply(event, base_policy, base_state)
+
+        assert decision["reason"] == "mention"
+        assert "text_lower" not in event[FEATURES_KEY]
+
+    def test_features_cached_on_event(self):
+        event = {"id": "e1", "text": "Hello", "meta": {}}
+        first = event_features(event)
+
+        assert event[FEATURES_KEY] is first
+        assert event_features(event) is first
+
+    def test_edited_event_gets_fresh_features(self):
+        event = {"id": "e1", "text": "Hello", "meta": {}}
+        first = event_features(event)
+        assert first["text_lower"] == "hello"
+
+        event["text"] = "Send me your PASSWORD"
+        assert event_features(event)["text_lower"] == "send me your password"
+
+        event["meta"]["mentions_me"] = True
+        assert event_features(event)["mentions_me"] is True
+
+    def test_missing_text_and_meta(self):
+        features = event_features({"id": "e1"})
+        assert features["text_lower"] == ""
+        assert features["mentions_me"] is False
+        assert features["is_question"] is False
 
 
 class TestIdempotency:
@@ -66,167 +222,215 @@ class TestIdempotency:
         """New event should be processed."""
         event = {"id": "e1", "text": "Tell me about agents?", "meta": {}}
 
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            decision = should_reply(event, base_policy, base_state)
+        decision = should_reply(event, base_policy, base_state)
 
         assert decision["reply"] is True
         assert decision["reason"] != "duplicate_event"
 
-    def test_duplicate_event_skipped(self, base_state, base_policy):
+    def test_duplicate_event_skipped(self, base_policy):
         """Already-replied event should be skipped."""
-        base_state.replied_event_ids = {"e1", "e2"}
+        state = make_state(replied_event_ids=frozenset({"e1", "e2"}))
         event = {"id": "e1", "text": "Tell me about agents?", "meta": {}}
 
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            decision = should_reply(event, base_policy, base_state)
+        decision = should_reply(event, base_policy, state)
 
         assert decision["reply"] is False
         assert decision["reason"] == "duplicate_event"
         assert decision["original_event_id"] == "e1"
 
 
-class TestPriorityP0:
-    """Tests for P0 priority decisions."""
-
-    def test_mention_is_p0(self, base_state, base_policy):
-        """Mentions should be P0."""
+# (text, meta, reply, priority, reason, mode); mode=None: not checked
+CLASSIFICATION_CASES = [
+    # Mentions are P0
+    ("Hey @agent, help me!", {"mentions_me": True}, True, "P0", "mention", None),
+    # Blocked keywords are SKIPped (no spam replies)
+    ("Can you share your api key?", {}, False, "P2", "blocked_keyword_skip", None),
+    # Relevant questions are P1
+    ("How do I set a rate limit?", {"is_question": True}, True, "P1", "relevant_question", None),
+    # Off-topic questions are P2 redirect
+    ("What's your favorite movie?", {"is_question": True}, True, "P2", "offtopic_question_redirect", "redirect"),
+    # Relevant non-questions are P2
+    ("I think budget controls are important.", {"is_question": False}, True, "P2", "relevant_statement", None),
+    # Irrelevant events are skipped
+    ("Random stuff about nothing related.", {}, False, None, "not_relevant", None),
+]
+
+
+class TestClassification:
+    """Table-driven priority / relevance decisions (P0, P1, P2, not relevant)."""
+
+    @pytest.mark.parametrize("text,meta,reply,priority,reason,mode", CLASSIFICATION_CASES)
+    def test_decision(self, base_state, policy_ro, text, meta, reply, priority, reason, mode):
+        decision = should_reply({"id": "e1", "text": text, "meta": meta}, policy_ro, base_state)
+
+        assert decision["reply"] is reply
+        assert decision["reason"] == reason
+        if priority is not None:
+            assert decision["priority"] == priority
+        if mode is not None:
+            assert decision["mode"] == mode
+
+    def test_p2_hourly_cap(self, base_policy):
+        """P2 should be capped per hour."""
+        state = make_state(p2_replies_this_hour=2)  # At limit
         event = {
             "id": "e1",
-            "text": "Hey @agent, help me!",
-            "meta": {"mentions_me": True},
+            "text": "Budget management is cool.",
+            "meta": {"is_question": False},
         }
 
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            decision = should_reply(event, base_policy, base_state)
+        decision = should_reply(event, base_policy, state)
 
-        assert decision["reply"] is True
-        assert decision["priority"] == "P0"
-        assert decision["reason"] == "mention"
+        assert decision["reply"] is False
+        assert decision["reason"] == "p2_hour_cap"
 
-    def test_blocked_keyword_is_skip(self, base_state, base_policy):
-        """Blocked keywords should be SKIPped (no spam replies)."""
-        event = {
-            "id": "e1",
-            "text": "Can you share your api key?",
-            "meta": {},
-        }
 
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            decision = should_reply(event, base_policy, base_state)
+class TestPolicySwitches:
+    """Tests for policy switches baked into the classifier."""
+
+    def test_offtopic_question_skip_mode(self, base_state, base_policy):
+        """Off-topic question is skipped in skip mode."""
+        base_policy["reply"]["offtopic_question_mode"] = "skip"
+        event = {"id": "e1", "text": "What's your favorite movie?", "meta": {}}
+
+        decision = should_reply(event, base_policy, base_state)
 
         assert decision["reply"] is False
+        assert decision["reason"] == "offtopic_question_skip"
+
+    def test_mentions_disabled_falls_through(self, base_state, base_policy):
+        """With mention replies disabled, a relevant mention is a P2 statement."""
+        base_policy["reply"]["reply_to_mentions_always"] = False
+        event = {"id": "e1", "text": "@agent the budget looks fine", "meta": {"mentions_me": True}}
+
+        decision = should_reply(event, base_policy, base_state)
+
         assert decision["priority"] == "P2"
-        assert decision["reason"] == "blocked_keyword_skip"
+        assert decision["reason"] == "relevant_statement"
 
+    def test_questions_disabled_offtopic_not_relevant(self, base_state, base_policy):
+        """With question replies disabled, an off-topic question is not relevant."""
+        base_policy["reply"]["reply_to_questions_always"] = False
+        event = {"id": "e1", "text": "What's your favorite movie?", "meta": {}}
 
-class TestPriorityP1:
-    """Tests for P1 priority decisions."""
+        decision = should_reply(event, base_policy, base_state)
 
-    def test_relevant_question_is_p1(self, base_state, base_policy):
-        """Relevant questions should be P1."""
-        event = {
-            "id": "e1",
-            "text": "How do I set a rate limit?",
-            "meta": {"is_question": True},
-        }
+        assert decision["reply"] is False
+        assert decision["reason"] == "not_relevant"
 
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            decision = should_reply(event, base_policy, base_state)
+    def test_returned_decision_does_not_leak_into_templates(self, base_state, base_policy):
+        """Reply decisions are copies: scheduler info never lands on a shared template."""
+        event = {"id": "e1", "text": "@agent hi", "meta": {"mentions_me": True}}
 
-        assert decision["reply"] is True
-        assert decision["priority"] == "P1"
-        assert decision["reason"] == "relevant_question"
+        first = should_reply(event, base_policy, base_state)
+        second = should_reply({**event, "id": "e2"}, base_policy, base_state)
 
+        assert first is not second
+        assert "scheduler" in first
 
-class TestPriorityP2:
-    """Tests for P2 priority decisions."""
 
-    def test_offtopic_question_redirect(self, base_state, base_policy):
-        """Off-topic questions should be P2 redirect."""
-        event = {
-            "id": "e1",
-            "text": "What's your favorite movie?",
-            "meta": {"is_question": True},
-        }
+class TestPhase1Memo:
+    """Tests for the (event_id, policy version) phase-1 memo."""
 
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            decision = should_reply(event, base_policy, base_state)
+    @pytest.fixture(autouse=True)
+    def _clear(self):
+        clear_phase1_cache()
+        yield
+        clear_phase1_cache()
 
-        assert decision["reply"] is True
-        assert decision["priority"] == "P2"
-        assert decision["reason"] == "offtopic_question_redirect"
-        assert decision["mode"] == "redirect"
+    def test_refetched_event_skips_classifier(self, base_state, base_policy):
+        """A fresh dict for the same event reuses the phase-1 result."""
+        event = {"id": "e1", "text": "What is a good budget?", "meta": {}}
 
-    def test_relevant_statement_is_p2(self, base_state, base_policy):
-        """Relevant non-questions should be P2."""
-        event = {
-            "id": "e1",
-            "text": "I think budget controls are important.",
-            "meta": {"is_question": False},
-        }
+        first = should_reply(dict(event), base_policy, base_state)
+        with patch("moltagent.decision.event_features") as features:
+            second = should_reply(dict(event), base_policy, base_state)
 
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            decision = should_reply(event, base_policy, base_state)
+        features.assert_not_called()
+        assert second["reason"] == first["reason"] == "relevant_question"
 
-        assert decision["reply"] is True
-        assert decision["priority"] == "P2"
-        assert decision["reason"] == "relevant_statement"
+    def test_edited_text_reclassified(self, base_state, base_policy):
+        """Same id with different text is a different cache key."""
+        first = should_reply({"id": "e1", "text": "What is a good budget?"}, base_policy, base_state)
+        second = should_reply({"id": "e1", "text": "nice weather"}, base_policy, base_state)
 
-    def test_p2_hourly_cap(self, base_state, base_policy):
-        """P2 should be capped per hour."""
-        base_state.p2_replies_this_hour = 2  # At limit
-        event = {
-            "id": "e1",
-            "text": "Budget management is cool.",
-            "meta": {"is_question": False},
-        }
+        assert first["reply"] is True
+        assert second["reason"] == "not_relevant"
 
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            decision = should_reply(event, base_policy, base_state)
+    def test_policy_change_reclassified(self, base_state, base_policy):
+        """A policy with different content gets a different version."""
+        event = {"id": "e1", "text": "What's your favorite movie?", "meta": {}}
+        skip_policy = make_policy(reply={"offtopic_question_mode": "skip"})
 
-        assert decision["reply"] is False
-        assert decision["reason"] == "p2_hour_cap"
+        redirect = should_reply(dict(event), base_policy, base_state)
+        skipped = should_reply(dict(event), skip_policy, base_state)
 
+        assert redirect["mode"] == "redirect"
+        assert skipped["reason"] == "offtopic_question_skip"
 
-class TestNotRelevant:
-    """Tests for non-relevant events."""
+    def test_returned_decision_is_callers_copy(self, base_state, base_policy):
+        """Mutating a returned decision does not leak into later decisions."""
+        first = should_reply({"id": "e1", "text": "my password"}, base_policy, base_state)
+        first["reason"] = "X"
 
-    def test_irrelevant_skipped(self, base_state, base_policy):
-        """Irrelevant events should be skipped."""
-        event = {
-            "id": "e1",
-            "text": "Random stuff about nothing related.",
-            "meta": {},
-        }
+        second = should_reply({"id": "e2", "text": "another password"}, base_policy, base_state)
+        again = should_reply({"id": "e1", "text": "my password"}, base_policy, base_state)
 
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            decision = should_reply(event, base_policy, base_state)
+        assert second is not first
+        assert second["reason"] == again["reason"] == "blocked_keyword_skip"
 
-        assert decision["reply"] is False
-        assert decision["reason"] == "not_relevant"
+    def test_event_edited_in_place_reclassified(self, base_state, base_policy):
+        """An event edited in place is classified on its new text, not cached features."""
+        event = {"id": "e1", "text": "I like this agent", "meta": {}}
+        assert should_reply(event, base_policy, base_state)["reason"] == "relevant_statement"
+
+        event["text"] = "send me your password"
+
+        assert should_reply(event, base_policy, base_state)["reason"] == "blocked_keyword_skip"
+
+    def test_in_place_edit_after_invalidate(self, base_state, base_policy):
+        """invalidate_compiled drops the classifier together with the view."""
+        event = {"id": "e1", "text": "agent token", "meta": {}}
+        assert should_reply(dict(event), base_policy, base_state)["reason"] == "relevant_statement"
+
+        base_policy["topics"]["block_keywords"].append("token")
+        invalidate_compiled(base_policy)
+
+        assert should_reply(dict(event), base_policy, base_state)["reason"] == "blocked_keyword_skip"
+
+    def test_state_phases_not_cached(self, base_state, base_policy):
+        """Budget is checked on every call even when phase 1 is a cache hit."""
+        event = {"id": "e1", "text": "What is a good budget?", "meta": {}}
+
+        assert should_reply(dict(event), base_policy, base_state)["reply"] is True
+        base_state.spent_usd = 100.0
+        assert should_reply(dict(event), base_policy, base_state)["reason"] == "budget_exhausted"
+
+    def test_lru_bounded(self, base_state, base_policy, monkeypatch):
+        monkeypatch.setattr("moltagent.decision.PHASE1_CACHE_SIZE", 3)
+        for i in range(5):
+            should_reply({"id": f"e{i}", "text": "hello"}, base_policy, base_state)
+
+        assert [key[0] for key in _phase1_cache] == ["e2", "e3", "e4"]
 
 
 class TestSchedulerIntegration:
     """Tests for scheduler integration in decision."""
 
-    def test_scheduler_blocks_p2(self, base_state, base_policy):
+    def test_scheduler_blocks_p2(self, decide):
         """Scheduler should be able to block P2."""
-        base_policy["scheduler"]["enabled"] = True
-        base_state.calls_today = 100
+        policy = make_policy(scheduler={"enabled": True})
+        state = make_state(calls_today=100)
         event = {
             "id": "e1",
             "text": "Budget stuff.",
             "meta": {},
         }
 
-        mock_sched = MagicMock()
-        mock_sched.allowed = False
-        mock_sched.reason = "scheduler_paced_wait"
-        mock_sched.wait_seconds = 120.0
-
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            with patch("moltagent.decision.scheduler_check", return_value=mock_sched):
-                decision = should_reply(event, base_policy, base_state)
+        decision = decide(
+            event, policy, state,
+            scheduler=_sched(allowed=False, reason="scheduler_paced_wait", wait_seconds=120.0),
+        )
 
         assert decision["reply"] is False
         assert decision["reason"] == "scheduler_paced_wait"
@@ -246,8 +450,7 @@ class TestBudgetHardCap:
             "meta": {},
         }
 
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            decision = should_reply(event, base_policy, base_state)
+        decision = should_reply(event, base_policy, base_state)
 
         assert decision["reply"] is False
         assert decision["reason"] == "budget_exhausted"
@@ -255,22 +458,6 @@ class TestBudgetHardCap:
         assert decision["budget"]["spent_usd"] == 1.0
         assert decision["budget"]["daily_budget_usd"] == 1.0
 
-    def test_budget_over_limit_skip(self, base_state, base_policy):
-        """Budget túllépve → SKIP budget_exhausted"""
-        base_policy["daily_budget_usd"] = 1.0
-        base_state.spent_usd = 1.5  # Over limit
-        event = {
-            "id": "e1",
-            "text": "Tell me about agents?",
-            "meta": {},
-        }
-
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            decision = should_reply(event, base_policy, base_state)
-
-        assert decision["reply"] is False
-        assert decision["reason"] == "budget_exhausted"
-
     def test_daily_calls_cap_skip(self, base_state, base_policy):
         """Max hívásszám elérve → SKIP daily_calls_cap (AC-2)"""
         base_policy["max_calls_per_day"] = 100
@@ -281,8 +468,7 @@ class TestBudgetHardCap:
             "meta": {},
         }
 
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            decision = should_reply(event, base_policy, base_state)
+        decision = should_reply(event, base_policy, base_state)
 
         assert decision["reply"] is False
         assert decision["reason"] == "daily_calls_cap"
@@ -302,8 +488,7 @@ class TestBudgetHardCap:
             "meta": {},
         }
 
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            decision = should_reply(event, base_policy, base_state)
+        decision = should_reply(event, base_policy, base_state)
 
         assert decision["reply"] is False
         assert "budget" in decision
@@ -313,58 +498,6 @@ class TestBudgetHardCap:
         assert budget["calls_today"] == 10
         assert budget["max_calls_per_day"] == 50
 
-    def test_budget_priority_preserved_p0(self, base_state, base_policy):
-        """P0 esemény budget SKIP-nél is P0 marad (AC-4)"""
-        base_policy["daily_budget_usd"] = 0.01
-        base_state.spent_usd = 1.0
-        event = {
-            "id": "e1",
-            "text": "@agent help!",
-            "meta": {"mentions_me": True},
-        }
-
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            decision = should_reply(event, base_policy, base_state)
-
-        assert decision["reply"] is False
-        assert decision["reason"] == "budget_exhausted"
-        assert decision["priority"] == "P0"  # Priority preserved!
-
-    def test_budget_priority_preserved_p1(self, base_state, base_policy):
-        """P1 esemény budget SKIP-nél is P1 marad"""
-        base_policy["daily_budget_usd"] = 0.01
-        base_state.spent_usd = 1.0
-        event = {
-            "id": "e1",
-            "text": "How do I set a rate limit?",
-            "meta": {"is_question": True},
-        }
-
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            decision = should_reply(event, base_policy, base_state)
-
-        assert decision["reply"] is False
-        assert decision["reason"] == "budget_exhausted"
-        assert decision["priority"] == "P1"  # Priority preserved!
-
-    def test_dedup_before_budget(self, base_state, base_policy):
-        """Duplicate event előbb fut mint budget check (AC-5)"""
-        base_policy["daily_budget_usd"] = 0.01
-        base_state.spent_usd = 1.0  # Budget exhausted
-        base_state.replied_event_ids = {"e1"}  # Already replied
-        event = {
-            "id": "e1",
-            "text": "Tell me about agents?",
-            "meta": {},
-        }
-
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            decision = should_reply(event, base_policy, base_state)
-
-        # Dedup should win over budget
-        assert decision["reply"] is False
-        assert decision["reason"] == "duplicate_event"
-
     def test_budget_before_scheduler(self, base_state, base_policy):
         """Budget check előbb fut mint scheduler (AC-6)"""
         base_policy["daily_budget_usd"] = 0.01
@@ -377,33 +510,14 @@ class TestBudgetHardCap:
         }
 
         # Scheduler should not even be called if budget is exhausted
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            with patch("moltagent.decision.scheduler_check") as mock_sched:
-                decision = should_reply(event, base_policy, base_state)
-                # Scheduler should NOT be called
-                mock_sched.assert_not_called()
+        with patch("moltagent.decision.scheduler_check") as mock_sched:
+            decision = should_reply(event, base_policy, base_state)
+            # Scheduler should NOT be called
+            mock_sched.assert_not_called()
 
         assert decision["reply"] is False
         assert decision["reason"] == "budget_exhausted"
 
-    def test_budget_ok_allows_reply(self, base_state, base_policy):
-        """Budget OK → valid reply allowed"""
-        base_policy["daily_budget_usd"] = 10.0
-        base_policy["max_calls_per_day"] = 200
-        base_state.spent_usd = 0.5
-        base_state.calls_today = 10
-        event = {
-            "id": "e1",
-            "text": "Tell me about agents?",
-            "meta": {},
-        }
-
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            decision = should_reply(event, base_policy, base_state)
-
-        assert decision["reply"] is True
-        assert decision["reason"] == "relevant_question"
-
     def test_check_budget_helper_exhausted(self, base_state, base_policy):
         """_check_budget helper: budget exhausted"""
         base_policy["daily_budget_usd"] = 1.0
@@ -437,6 +551,17 @@ class TestBudgetHardCap:
 
         assert result is None
 
+    def test_in_place_budget_edit_enforced(self, base_state, base_policy):
+        """Limits are read live: an in-place edit applies without invalidate_compiled."""
+        base_state.spent_usd = 0.5
+        assert _check_budget(base_state, base_policy, "P1") is None
+        assert _check_soft_cap(base_state, base_policy, "P2") is None
+
+        base_policy["daily_budget_usd"] = 0.1
+
+        assert _check_budget(base_state, base_policy, "P1")["reason"] == "budget_exhausted"
+        assert _check_soft_cap(base_state, base_policy, "P2")["reason"] == "soft_cap_p2_blocked"
+
 
 class TestBudgetSoftCap:
     """Tests for budget soft cap (SPEC §7b)."""
@@ -451,15 +576,14 @@ class TestBudgetSoftCap:
             "meta": {},
         }
 
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            decision = should_reply(event, base_policy, base_state)
+        decision = should_reply(event, base_policy, base_state)
 
         assert decision["reply"] is False
         assert decision["reason"] == "soft_cap_p2_blocked"
         assert decision["priority"] == "P2"
         assert decision["budget"]["soft_cap_percentage"] == 0.80
 
-    def test_soft_cap_allows_p0_at_80_percent(self, base_state, base_policy):
+    def test_soft_cap_allows_p0_at_80_percent(self, base_state, base_policy, decide):
         """P0 átmegy 80% felett (AC-2)"""
         base_policy["daily_budget_usd"] = 1.0
         base_state.spent_usd = 0.80  # At 80%
@@ -469,21 +593,13 @@ class TestBudgetSoftCap:
             "meta": {"mentions_me": True},
         }
 
-        # Scheduler mock (engedélyez)
-        mock_sched = MagicMock()
-        mock_sched.allowed = True
-        mock_sched.reason = "scheduler_within_pace"
-        mock_sched.used_burst = False
-        mock_sched.burst_type = None
-
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            with patch("moltagent.decision.scheduler_check", return_value=mock_sched):
-                decision = should_reply(event, base_policy, base_state)
+        # Scheduler stub (engedélyez)
+        decision = decide(event, base_policy, base_state, scheduler=_sched())
 
         assert decision["reply"] is True
         assert decision["priority"] == "P0"
 
-    def test_soft_cap_allows_p1_at_80_percent(self, base_state, base_policy):
+    def test_soft_cap_allows_p1_at_80_percent(self, base_state, base_policy, decide):
         """P1 átmegy 80% felett (AC-3)"""
         base_policy["daily_budget_usd"] = 1.0
         base_state.spent_usd = 0.85  # Over 80%
@@ -493,36 +609,12 @@ class TestBudgetSoftCap:
             "meta": {"is_question": True},
         }
 
-        # Scheduler mock
-        mock_sched = MagicMock()
-        mock_sched.allowed = True
-        mock_sched.reason = "scheduler_within_pace"
-        mock_sched.used_burst = False
-        mock_sched.burst_type = None
-
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            with patch("moltagent.decision.scheduler_check", return_value=mock_sched):
-                decision = should_reply(event, base_policy, base_state)
+        # Scheduler stub
+        decision = decide(event, base_policy, base_state, scheduler=_sched())
 
         assert decision["reply"] is True
         assert decision["priority"] == "P1"
 
-    def test_soft_cap_allows_p2_below_80_percent(self, base_state, base_policy):
-        """P2 átmegy 80% alatt (AC-4)"""
-        base_policy["daily_budget_usd"] = 1.0
-        base_state.spent_usd = 0.79  # Just below 80%
-        event = {
-            "id": "e1",
-            "text": "Budget stuff.",  # P2 (relevant statement)
-            "meta": {},
-        }
-
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            decision = should_reply(event, base_policy, base_state)
-
-        assert decision["reply"] is True
-        assert decision["priority"] == "P2"
-
     def test_soft_cap_budget_info_in_decision(self, base_state, base_policy):
         """Budget info tartalmazza: soft_cap_threshold, soft_cap_percentage (AC-5)"""
         base_policy["daily_budget_usd"] = 2.0
@@ -533,8 +625,7 @@ class TestBudgetSoftCap:
             "meta": {},
         }
 
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            decision = should_reply(event, base_policy, base_state)
+        decision = should_reply(event, base_policy, base_state)
 
         assert decision["reply"] is False
         assert decision["reason"] == "soft_cap_p2_blocked"
@@ -544,38 +635,6 @@ class TestBudgetSoftCap:
         assert budget["soft_cap_threshold"] == 1.60
         assert budget["soft_cap_percentage"] == 0.80
 
-    def test_hard_cap_before_soft_cap(self, base_state, base_policy):
-        """Hard cap (100%) előbb fut → budget_exhausted reason (AC-6)"""
-        base_policy["daily_budget_usd"] = 1.0
-        base_state.spent_usd = 1.0  # 100% - hard cap
-        event = {
-            "id": "e1",
-            "text": "Budget stuff.",  # P2
-            "meta": {},
-        }
-
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            decision = should_reply(event, base_policy, base_state)
-
-        assert decision["reply"] is False
-        # Hard cap reason, NOT soft cap
-        assert decision["reason"] == "budget_exhausted"
-
-    def test_soft_cap_priority_preserved(self, base_state, base_policy):
-        """Priority megőrződik a SKIP döntésben (AC-7)"""
-        base_policy["daily_budget_usd"] = 1.0
-        base_state.spent_usd = 0.90  # Over 80%
-        event = {
-            "id": "e1",
-            "text": "Budget stuff.",  # P2
-            "meta": {},
-        }
-
-        with patch("moltagent.decision.ensure_today", return_value=base_state):
-            decision = should_reply(event, base_policy, base_state)
-
-        assert decision["priority"] == "P2"  # Priority preserved
-
     def test_check_soft_cap_helper_blocks_p2(self, base_state, base_policy):
         """_check_soft_cap helper: blocks P2 at 80%"""
         base_policy["daily_budget_usd"] = 1.0
@@ -613,3 +672,64 @@ class TestBudgetSoftCap:
         result = _check_soft_cap(base_state, base_policy, "P2")
 
         assert result is None
+
+
+# (state overrides, policy overrides, text, meta, reply, reason, priority); priority=None: not checked
+BUDGET_CASES = [
+    pytest.param(
+        {"spent_usd": 1.5}, {"daily_budget_usd": 1.0},
+        "Tell me about agents?", {}, False, "budget_exhausted", None,
+        id="hard_cap_over_limit",
+    ),
+    pytest.param(
+        {"spent_usd": 1.0}, {"daily_budget_usd": 0.01},
+        "@agent help!", {"mentions_me": True}, False, "budget_exhausted", "P0",
+        id="hard_cap_keeps_p0",
+    ),
+    pytest.param(
+        {"spent_usd": 1.0}, {"daily_budget_usd": 0.01},
+        "How do I set a rate limit?", {"is_question": True}, False, "budget_exhausted", "P1",
+        id="hard_cap_keeps_p1",
+    ),
+    pytest.param(
+        {"spent_usd": 1.0, "replied_event_ids": frozenset({"e1"})}, {"daily_budget_usd": 0.01},
+        "Tell me about agents?", {}, False, "duplicate_event", None,
+        id="dedup_before_budget",
+    ),
+    pytest.param(
+        {"spent_usd": 0.5, "calls_today": 10}, {"daily_budget_usd": 10.0, "max_calls_per_day": 200},
+        "Tell me about agents?", {}, True, "relevant_question", None,
+        id="budget_ok_allows_reply",
+    ),
+    pytest.param(
+        {"spent_usd": 0.79}, {"daily_budget_usd": 1.0},
+        "Budget stuff.", {}, True, "relevant_statement", "P2",
+        id="soft_cap_allows_p2_below_80",
+    ),
+    pytest.param(
+        {"spent_usd": 1.0}, {"daily_budget_usd": 1.0},
+        "Budget stuff.", {}, False, "budget_exhausted", None,
+        id="hard_cap_before_soft_cap",
+    ),
+    pytest.param(
+        {"spent_usd": 0.90}, {"daily_budget_usd": 1.0},
+        "Budget stuff.", {}, False, "soft_cap_p2_blocked", "P2",
+        id="soft_cap_keeps_p2",
+    ),
+]
+
+
+class TestBudgetMatrix:
+    """Table-driven hard cap / soft cap / dedup ordering (SPEC §7, §7b)."""
+
+    @pytest.mark.parametrize("state_ov,policy_ov,text,meta,reply,reason,priority", BUDGET_CASES)
+    def test_decision_matrix(self, state_ov, policy_ov, text, meta, reply, reason, priority):
+        state = make_state(**state_ov)
+        policy = make_policy(**policy_ov)
+
+        decision = should_reply({"id": "e1", "text": text, "meta": meta}, policy, state)
+
+        assert decision["reply"] is reply
+        assert decision["reason"] == reason
+        if priority is not None:
+            assert decision["priority"] == priority
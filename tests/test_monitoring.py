@@ -0,0 +1,222 @@
+"""
+Tests for moltagent.monitoring (background JSONL writer)
+"""
+import json
+import os
+
+import pytest
+
+from moltagent import monitoring
+from moltagent.state import State
+from moltagent.monitoring import (
+    DaemonStats,
+    LazyStatusReport,
+    check_budget_warning,
+    check_error_rate_alert,
+    flush_monitoring_logs,
+    get_status_report,
+    monitoring_tick,
+    log_cycle_stats,
+    log_daily_summary,
+)
+
+
+@pytest.fixture
+def monitoring_log(tmp_path, monkeypatch):
+    path = str(tmp_path / "monitoring.jsonl")
+    monkeypatch.setattr(monitoring, "MONITORING_LOG", path)
+    return path
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+class TestBackgroundLogWriter:
+    def test_cycle_stats_written_after_flush(self, monitoring_log):
+        for i in range(100):
+            log_cycle_stats(i, {"fetched": 1, "replied": 1}, 0.01, i)
+        assert flush_monitoring_logs()
+
+        rows = _read(monitoring_log)
+        assert [r["cycle"] for r in rows] == list(range(100))
+        assert rows[0]["type"] == "cycle_stats"
+
+    def test_error_rate_alert_queued(self, monitoring_log):
+        stats = DaemonStats(total_replied=1, total_errors=1)
+        alert = check_error_rate_alert(stats, threshold_pct=10.0)
+        assert alert is not None
+        assert flush_monitoring_logs()
+
+        rows = _read(monitoring_log)
+        assert rows == [alert]
+
+    def test_no_alert_below_threshold(self, monitoring_log):
+        stats = DaemonStats(total_replied=100, total_errors=1)
+        assert check_error_rate_alert(stats, threshold_pct=10.0) is None
+        assert flush_monitoring_logs()
+        assert not os.path.exists(monitoring_log)
+
+
+class TestBudgetWarningSeverity:
+    @pytest.mark.parametrize("spent,severity", [
+        (0.80, "low"),
+        (0.8999, "low"),
+        (0.90, "medium"),
+        (0.95, "high"),
+        (1.00, "critical"),
+        (1.50, "critical"),
+    ])
+    def test_severity_bands(self, spent, severity):
+        warning = check_budget_warning(spent, 1.0)
+        assert warning["severity"] == severity
+
+    def test_below_threshold_or_no_budget(self):
+        assert check_budget_warning(0.5, 1.0) is None
+        assert check_budget_warning(5.0, 0.0) is None
+
+    def test_log_message(self, caplog):
+        with caplog.at_level("WARNING", logger="moltagent.monitoring"):
+            check_budget_warning(0.95, 1.0)
+        assert "BUDGET CRITICAL: $0.9500 / $1.00 (95.0%)" in caplog.text
+
+
+class TestDailySummary:
+    def test_summary_on_disk_without_close(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "daily_summary.jsonl")
+        monkeypatch.setattr(monitoring, "DAILY_SUMMARY_LOG", path)
+
+        summary = log_daily_summary(DaemonStats(day_key="2026-02-03"), 0.5, 10, 1.0)
+
+        assert _read(path) == [summary]
+
+
+class TestStatusReport:
+    def test_report_lines(self):
+        stats = DaemonStats(session_start="s", cycles=2)
+        report = get_status_report(stats, 0.5, 4, 2.0, "mock", True)
+
+        assert "Adapter: mock (DRY-RUN)" in report
+        assert "Budget: $0.5000 / $2.00 (25.0%)" in report
+        assert "RECENT ERRORS" not in report
+
+    def test_recent_errors_last_three(self):
+        stats = DaemonStats()
+        for i in range(5):
+            stats.add_error({"message": f"err{i}"})
+        report = get_status_report(stats, 0.0, 0, 1.0, "live", False)
+
+        assert "err1" not in report
+        assert all(f"err{i}" in report for i in (2, 3, 4))
+
+    def test_lazy_report_only_built_on_str(self):
+        stats = DaemonStats()
+        lazy = LazyStatusReport(stats, 0.0, 0, 1.0, "mock", True)
+        stats.cycles = 7  # changes before formatting are visible
+
+        assert str(lazy) == get_status_report(stats, 0.0, 0, 1.0, "mock", True)
+        assert "Uptime cycles: 7" in str(lazy)
+
+
+class TestDaemonStats:
+    def test_slots_no_instance_dict(self):
+        stats = DaemonStats()
+        assert not hasattr(stats, "__dict__")
+        with pytest.raises(AttributeError):
+            stats.unknown_counter = 1
+
+    def test_record_methods_update_total_and_day(self):
+        stats = DaemonStats()
+        stats.record_replied(3)
+        stats.record_skipped()
+        stats.record_error(2)
+
+        assert (stats.total_replied, stats.total_skipped, stats.total_errors) == (3, 1, 2)
+        assert (stats.day_replied, stats.day_skipped, stats.day_errors) == (3, 1, 2)
+
+    def test_error_rate_cached_and_invalidated(self):
+        stats = DaemonStats()
+        assert stats.error_rate == 0.0
+
+        stats.record_replied(3)
+        stats.record_error()
+        assert stats.error_rate == 25.0
+
+        stats.total_errors = 3  # direct assignment also drops the memo
+        assert stats.error_rate == 50.0
+
+    def test_error_rate_from_init(self):
+        assert DaemonStats(total_replied=1, total_errors=1).error_rate == 50.0
+        assert "_error_rate_cache" not in DaemonStats().to_dict()
+
+    def test_recent_errors_bounded(self):
+        stats = DaemonStats(max_recent_errors=3)
+        for i in range(10):
+            stats.add_error({"message": str(i)})
+        assert [e["message"] for e in stats.recent_errors] == ["7", "8", "9"]
+
+
+class TestMonitoringTick:
+    def _state(self, spent):
+        return State(day_key="2026-02-03", hour_key="2026-02-03-12", spent_usd=spent)
+
+    def test_nothing_fires(self, monitoring_log):
+        stats = DaemonStats(total_replied=10)
+        assert monitoring_tick(stats, self._state(0.1), {"daily_budget_usd": 1.0}) == []
+        assert stats.budget_warnings == 0
+
+    def test_budget_warning_once_per_threshold(self, monitoring_log):
+        stats = DaemonStats(total_replied=10)
+        policy = {"daily_budget_usd": 1.0}
+
+        first = monitoring_tick(stats, self._state(0.85), policy)
+        again = monitoring_tick(stats, self._state(0.86), policy)
+        higher = monitoring_tick(stats, self._state(0.96), policy)
+
+        assert [a["threshold_pct"] for a in first] == [80.0]
+        assert again == []
+        assert [a["severity"] for a in higher] == ["high"]
+        assert stats.budget_warnings == 2
+        assert stats.last_budget_warning_pct == 95
+
+        assert flush_monitoring_logs()
+        rows = _read(monitoring_log)
+        assert [r["type"] for r in rows] == ["monitoring_tick", "monitoring_tick"]
+        assert [r["budget"]["threshold_pct"] for r in rows] == [80.0, 95.0]
+        assert all(r["error_rate"] is None for r in rows)
+
+    def test_jump_reports_highest_threshold(self, monitoring_log):
+        stats = DaemonStats()
+        alerts = monitoring_tick(stats, self._state(1.2), {"daily_budget_usd": 1.0})
+
+        assert [a["threshold_pct"] for a in alerts] == [100.0]
+        assert stats.budget_warnings == 1
+
+    def test_reset_day_rearms_warnings(self, monitoring_log):
+        stats = DaemonStats()
+        policy = {"daily_budget_usd": 1.0}
+        monitoring_tick(stats, self._state(0.9), policy)
+        stats.reset_day("2026-02-04")
+
+        assert len(monitoring_tick(stats, self._state(0.9), policy)) == 1
+
+    def test_error_rate_alert_included(self, monitoring_log):
+        stats = DaemonStats(total_replied=1, total_errors=1)
+        alerts = monitoring_tick(stats, self._state(0.0), {"daily_budget_usd": 1.0})
+
+        assert [a["type"] for a in alerts] == ["error_rate_alert"]
+
+    def test_one_record_per_tick(self, monitoring_log):
+        stats = DaemonStats(total_replied=1, total_errors=1)
+        alerts = monitoring_tick(stats, self._state(0.9), {"daily_budget_usd": 1.0})
+
+        assert flush_monitoring_logs()
+        rows = _read(monitoring_log)
+        assert len(rows) == 1
+        assert rows[0]["type"] == "monitoring_tick"
+        assert [rows[0]["budget"], rows[0]["error_rate"]] == alerts
+
+    def test_zero_budget_skips_budget_check(self, monitoring_log):
+        stats = DaemonStats()
+        assert monitoring_tick(stats, self._state(5.0), {"daily_budget_usd": 0}) == []
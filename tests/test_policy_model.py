@@ -3,13 +3,14 @@ Policy validáció tesztek.
 
 SPEC §13.4 - Policy érvényesítés
 """
+import itertools
 import json
 import os
-import tempfile
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Callable, Dict
 
 import pytest
+from pydantic import ValidationError
 
 from moltagent.policy_model import (
     PolicyModel,
@@ -21,15 +22,23 @@ from moltagent.policy_model import (
     load_and_validate_policy,
     policy_to_dict,
     format_validation_result,
+    invalidate_policy_cache,
+)
+from moltagent.policy import (
+    load_policy,
+    validate_policy,
+    get_validation_message,
+    compiled_policy,
+    PolicyView,
+    invalidate_compiled,
 )
-from moltagent.policy import load_policy, validate_policy, get_validation_message
 
 
 # --- Fixtures ---
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def valid_policy() -> Dict[str, Any]:
-    """Érvényes policy dict."""
+    """Érvényes policy dict (session-szintű, a tesztek csak olvassák)."""
     return {
         "daily_budget_usd": 1.0,
         "max_calls_per_day": 200,
@@ -58,11 +67,29 @@ def valid_policy() -> Dict[str, Any]:
 
 
 @pytest.fixture
-def policy_file(valid_policy: Dict[str, Any]) -> str:
-    """Létrehoz egy ideiglenes policy fájlt."""
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-        json.dump(valid_policy, f)
-        return f.name
+def policy_file(valid_policy: Dict[str, Any], tmp_path: Path) -> str:
+    """Létrehoz egy ideiglenes policy fájlt (tesztenként új, mert több teszt felülírja)."""
+    path = tmp_path / "policy.json"
+    path.write_text(json.dumps(valid_policy), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def write_policy(tmp_path: Path) -> Callable[[Any], str]:
+    """Policy tartalmat ír tmp_path alá; str/bytes nyersen, minden más JSON-ként."""
+    counter = itertools.count()
+
+    def _write(payload: Any) -> str:
+        path = tmp_path / f"policy_{next(counter)}.json"
+        if isinstance(payload, bytes):
+            path.write_bytes(payload)
+        elif isinstance(payload, str):
+            path.write_text(payload, encoding="utf-8")
+        else:
+            path.write_text(json.dumps(payload), encoding="utf-8")
+        return str(path)
+
+    return _write
 
 
 # --- PolicyModel tesztek ---
@@ -91,55 +118,31 @@ class TestPolicyModel:
         model = PolicyModel(daily_budget_usd=1.23456789)
         assert model.daily_budget_usd == 1.2346
 
-    def test_budget_type_error(self):
-        """AC-3: Típushiba."""
-        with pytest.raises(Exception):  # ValidationError
-            PolicyModel(daily_budget_usd="abc")
-
-    def test_budget_out_of_range_low(self):
-        """AC-4: Érték túl kicsi."""
-        with pytest.raises(Exception):
-            PolicyModel(daily_budget_usd=0.001)  # min 0.01
-
-    def test_budget_out_of_range_high(self):
-        """AC-4: Érték túl nagy."""
-        with pytest.raises(Exception):
-            PolicyModel(daily_budget_usd=999.0)  # max 100
-
-    def test_max_calls_out_of_range(self):
-        """AC-4: max_calls_per_day túl nagy."""
-        with pytest.raises(Exception):
-            PolicyModel(max_calls_per_day=9999)  # max 1000
-
     def test_fixed_style_language_en(self):
         """AC-6: style.language fix 'en'."""
         model = PolicyModel()
         assert model.style.language == "en"
 
-    def test_fixed_style_language_error(self):
-        """AC-6: style.language != 'en' hibát dob."""
-        with pytest.raises(Exception):
-            PolicyModel(style={"language": "hu"})
-
     def test_fixed_operator_language_hu(self):
         """AC-6: operator.language fix 'hu'."""
         model = PolicyModel()
         assert model.operator.language == "hu"
 
-    def test_fixed_operator_language_error(self):
-        """AC-6: operator.language != 'hu' hibát dob."""
-        with pytest.raises(Exception):
-            PolicyModel(operator={"language": "en"})
-
-    def test_scheduler_burst_limits(self):
-        """Scheduler burst limitek validálva."""
-        with pytest.raises(Exception):
-            PolicyModel(scheduler={"burst_p0": 100})  # max 50
-
-    def test_reply_p2_limit(self):
-        """Reply P2 limit validálva."""
-        with pytest.raises(Exception):
-            PolicyModel(reply={"max_replies_per_hour_p2": 100})  # max 20
+    @pytest.mark.parametrize("kwargs", [
+        pytest.param({"daily_budget_usd": "abc"}, id="budget_type_error"),         # AC-3
+        pytest.param({"daily_budget_usd": 0.001}, id="budget_too_low"),            # AC-4, min 0.01
+        pytest.param({"daily_budget_usd": 999.0}, id="budget_too_high"),           # AC-4, max 100
+        pytest.param({"max_calls_per_day": 9999}, id="max_calls_too_high"),        # AC-4, max 1000
+        pytest.param({"style": {"language": "hu"}}, id="style_language_fixed"),    # AC-6
+        pytest.param({"operator": {"language": "en"}}, id="operator_language_fixed"),  # AC-6
+        pytest.param({"scheduler": {"burst_p0": 100}}, id="scheduler_burst_p0"),   # max 50
+        pytest.param({"reply": {"max_replies_per_hour_p2": 100}}, id="reply_p2_limit"),  # max 20
+    ])
+    def test_invalid_value_raises(self, kwargs: Dict[str, Any]):
+        """AC-3/4/6: Hibás mező → ValidationError, a hibás mező útvonalával."""
+        with pytest.raises(ValidationError) as exc_info:
+            PolicyModel(**kwargs)
+        assert exc_info.value.errors()[0]["loc"][0] == next(iter(kwargs))
 
 
 # --- validate_policy_file tesztek ---
@@ -153,7 +156,6 @@ class TestValidatePolicyFile:
         assert success is True
         assert model is not None
         assert len(errors) == 0
-        os.unlink(policy_file)
 
     def test_missing_file(self):
         """AC-7: Policy fájl nem található."""
@@ -162,50 +164,70 @@ class TestValidatePolicyFile:
         assert model is None
         assert "nem található" in errors[0]
 
-    def test_invalid_json(self):
+    def test_invalid_json(self, write_policy: Callable[[Any], str]):
         """AC-2: Hibás JSON."""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-            f.write('{ "budget": 1.0, }')  # Extra vessző
-            path = f.name
+        path = write_policy('{ "budget": 1.0, }')  # Extra vessző
 
         success, model, errors = validate_policy_file(path)
         assert success is False
         assert "JSON" in errors[0]
-        os.unlink(path)
 
-    def test_type_error_in_file(self):
+    def test_type_error_in_file(self, write_policy: Callable[[Any], str]):
         """AC-3: Típushiba a fájlban."""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-            json.dump({"daily_budget_usd": "abc"}, f)
-            path = f.name
+        path = write_policy({"daily_budget_usd": "abc"})
 
         success, model, errors = validate_policy_file(path)
         assert success is False
         assert "daily_budget_usd" in errors[0]
-        os.unlink(path)
 
-    def test_value_out_of_range_in_file(self):
+    def test_value_out_of_range_in_file(self, write_policy: Callable[[Any], str]):
         """AC-4: Érték túl nagy a fájlban."""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-            json.dump({"daily_budget_usd": 999.0}, f)
-            path = f.name
+        path = write_policy({"daily_budget_usd": 999.0})
 
         success, model, errors = validate_policy_file(path)
         assert success is False
         assert "daily_budget_usd" in errors[0]
-        os.unlink(path)
 
-    def test_minimal_valid_policy(self):
+    def test_minimal_valid_policy(self, write_policy: Callable[[Any], str]):
         """Minimális érvényes policy (csak defaults)."""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-            json.dump({}, f)  # Üres - minden default
-            path = f.name
+        path = write_policy({})  # Üres - minden default
 
         success, model, errors = validate_policy_file(path)
         assert success is True
         assert model is not None
         assert model.daily_budget_usd == 1.0
-        os.unlink(path)
+
+    def test_invalid_json_position(self, write_policy: Callable[[Any], str]):
+        """Szintaktikai hibánál pontos sor/karakter."""
+        path = write_policy('{\n  "daily_budget_usd": 1.0,\n}')
+
+        success, model, errors = validate_policy_file(path)
+        assert success is False
+        assert "(sor 3, karakter 1)" in errors[0]
+
+    def test_utf8_bom_accepted(self, write_policy: Callable[[Any], str]):
+        """UTF-8 BOM-os fájl is betölthető (json fallback)."""
+        path = write_policy(b'\xef\xbb\xbf{"daily_budget_usd": 2.0}')
+
+        success, model, errors = validate_policy_file(path)
+        assert success is True
+        assert model.daily_budget_usd == 2.0
+
+    def test_non_object_root(self, write_policy: Callable[[Any], str]):
+        """Nem objektum gyökér → validációs hiba, nem kivétel."""
+        path = write_policy([1, 2])
+
+        success, model, errors = validate_policy_file(path)
+        assert success is False
+        assert errors[0].startswith("(policy):")
+
+    def test_multiple_errors_reported(self, write_policy: Callable[[Any], str]):
+        """Minden hibás mező megjelenik, beágyazott útvonallal."""
+        path = write_policy({"daily_budget_usd": "abc", "scheduler": {"burst_p0": 99}})
+
+        success, model, errors = validate_policy_file(path)
+        assert success is False
+        assert [e.split(":")[0] for e in errors] == ["daily_budget_usd", "scheduler.burst_p0"]
 
 
 # --- format_validation_result tesztek ---
@@ -241,25 +263,157 @@ class TestLoadPolicy:
         policy = load_policy(policy_file, validate=True)
         assert isinstance(policy, dict)
         assert policy["daily_budget_usd"] == 1.0
-        os.unlink(policy_file)
 
     def test_load_without_validation(self, policy_file: str):
         """load_policy validáció nélkül (legacy)."""
         policy = load_policy(policy_file, validate=False)
         assert isinstance(policy, dict)
-        os.unlink(policy_file)
 
-    def test_load_invalid_raises(self):
+    def test_load_without_validation_cached_until_changed(self, policy_file: str):
+        """validate=False: ugyanaz a dict, amíg a fájl nem változik."""
+        first = load_policy(policy_file, validate=False)
+        assert load_policy(policy_file, validate=False) is first
+
+        with open(policy_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        data["daily_budget_usd"] = 2.5
+        with open(policy_file, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        st = os.stat(policy_file)
+        os.utime(policy_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+        reloaded = load_policy(policy_file, validate=False)
+        assert reloaded is not first
+        assert reloaded["daily_budget_usd"] == 2.5
+
+    def test_load_invalid_raises(self, write_policy: Callable[[Any], str]):
         """Hibás policy ValueError-t dob."""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-            json.dump({"daily_budget_usd": "abc"}, f)
-            path = f.name
+        path = write_policy({"daily_budget_usd": "abc"})
 
         with pytest.raises(ValueError) as exc_info:
             load_policy(path, validate=True)
 
         assert "HIBA" in str(exc_info.value)
-        os.unlink(path)
+
+
+# --- validált policy cache tesztek ---
+
+class TestValidatedPolicyCache:
+    """load_and_validate_policy (path, mtime, méret) cache."""
+
+    def test_unchanged_file_returns_cached_model(self, policy_file: str):
+        first = load_and_validate_policy(policy_file)
+        assert load_and_validate_policy(policy_file) is first
+
+    def test_changed_file_revalidated(self, policy_file: str):
+        first = load_and_validate_policy(policy_file)
+        with open(policy_file, "w", encoding="utf-8") as f:
+            json.dump({"daily_budget_usd": 3.0}, f)
+
+        second = load_and_validate_policy(policy_file)
+        assert second is not first
+        assert second.daily_budget_usd == 3.0
+
+    def test_invalidate(self, policy_file: str):
+        first = load_and_validate_policy(policy_file)
+        invalidate_policy_cache(policy_file)
+        assert load_and_validate_policy(policy_file) is not first
+
+        second = load_and_validate_policy(policy_file)
+        invalidate_policy_cache()
+        assert load_and_validate_policy(policy_file) is not second
+
+    def test_invalid_file_not_cached(self, policy_file: str):
+        load_and_validate_policy(policy_file)
+        with open(policy_file, "w", encoding="utf-8") as f:
+            json.dump({"daily_budget_usd": "abc"}, f)
+
+        with pytest.raises(ValueError):
+            load_and_validate_policy(policy_file)
+        with pytest.raises(ValueError):
+            load_and_validate_policy(policy_file)
+
+    def test_cached_model_is_frozen(self, policy_file: str):
+        """A megosztott cache-elt modell (és a beágyazott konfigok) nem módosíthatók."""
+        model = load_and_validate_policy(policy_file)
+        with pytest.raises(ValidationError):
+            model.max_calls_per_day = 1
+        with pytest.raises(ValidationError):
+            model.scheduler.burst_p0 = 0
+
+
+# --- compiled_policy tesztek ---
+
+
+class TestCompiledPolicy:
+    """Előfeldolgozott policy nézet tesztek."""
+
+    def test_defaults_for_empty_policy(self):
+        """Üres policy → alapértelmezett értékek."""
+        view = compiled_policy({})
+        assert isinstance(view, PolicyView)
+        assert view.daily_budget_usd == 1.0
+        assert view.max_calls_per_day == 200
+        assert view.reply_to_mentions_always is True
+        assert view.offtopic_question_mode == "redirect"
+        assert view.max_replies_per_hour_p2 == 2
+        assert view.allow_keywords == ()
+        assert view.scheduler_enabled is True
+        assert (view.burst_p0, view.burst_p1) == (8, 4)
+        assert view.min_seconds_between_calls == 1.0
+        assert (view.lang, view.max_sentences, view.fmt) == ("en", 5, "steps")
+        assert view.domain_context == ""
+
+    def test_style_scheduler_fields(self):
+        """Stílus, domain és scheduler mezők a nézetben."""
+        view = compiled_policy({
+            "min_seconds_between_calls": 2,
+            "scheduler": {"enabled": False, "burst_p0": 3, "burst_p1": 1},
+            "style": {"max_sentences": "3", "format": "bullet"},
+            "domain": {"context": "  Moltbook agents  "},
+        })
+        assert view.min_seconds_between_calls == 2.0
+        assert view.scheduler_enabled is False
+        assert (view.burst_p0, view.burst_p1) == (3, 1)
+        assert (view.max_sentences, view.fmt) == (3, "bullet")
+        assert view.domain_context == "Moltbook agents"
+
+    def test_view_is_frozen_and_slotted(self):
+        view = compiled_policy({})
+        assert not hasattr(view, "__dict__")
+        with pytest.raises(AttributeError):
+            view.max_calls_per_day = 1
+
+    def test_values_from_validated_policy(self, valid_policy: Dict[str, Any]):
+        """Validált policy dict mezői a nézetben."""
+        policy = policy_to_dict(PolicyModel(**valid_policy))
+        view = compiled_policy(policy)
+        assert view.daily_budget_usd == valid_policy["daily_budget_usd"]
+        assert view.max_calls_per_day == valid_policy["max_calls_per_day"]
+
+    def test_keywords_lowercased(self):
+        """Kulcsszavak kisbetűsítve."""
+        view = compiled_policy({"topics": {"allow_keywords": ["Agent"], "block_keywords": ["API Key"]}})
+        assert view.allow_keywords == ("agent",)
+        assert view.block_keywords == ("api key",)
+
+    def test_cached_without_touching_policy(self):
+        """A nézet cache-elődik, a policy dict változatlan (JSON-szerializálható) marad."""
+        policy = {"daily_budget_usd": 2.0}
+        view = compiled_policy(policy)
+        assert compiled_policy(policy) is view
+        assert policy == {"daily_budget_usd": 2.0}
+        json.dumps(policy)
+
+    def test_invalidate_after_in_place_edit(self):
+        """Helyben módosítás után az invalidate_compiled új nézetet ad."""
+        policy = {"topics": {"block_keywords": ["secret"]}}
+        assert compiled_policy(policy).block_keywords == ("secret",)
+
+        policy["topics"]["block_keywords"].append("password")
+        invalidate_compiled(policy)
+
+        assert compiled_policy(policy).block_keywords == ("secret", "password")
 
 
 # --- get_validation_message tesztek ---
@@ -271,14 +425,10 @@ class TestGetValidationMessage:
         """Érvényes policy üzenet."""
         msg = get_validation_message(policy_file)
         assert "✅" in msg
-        os.unlink(policy_file)
 
-    def test_invalid_message(self):
+    def test_invalid_message(self, write_policy: Callable[[Any], str]):
         """Hibás policy üzenet."""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-            json.dump({"daily_budget_usd": 999.0}, f)
-            path = f.name
+        path = write_policy({"daily_budget_usd": 999.0})
 
         msg = get_validation_message(path)
         assert "❌" in msg
-        os.unlink(path)
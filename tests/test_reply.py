@@ -0,0 +1,208 @@
+"""
+Tests for moltagent.reply (prompt building)
+"""
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from moltagent import reply
+from moltagent.policy import compiled_policy
+from moltagent.reply import (
+    build_prompt,
+    clear_prompt_cache,
+    extract_text,
+    make_outbound_reply,
+    rate_limit,
+)
+from moltagent.state import State
+
+
+EVENT = {"id": "e1", "type": "comment", "author": "alice", "text": "How do I cap spending?"}
+
+
+class TestBuildPrompt:
+    """Tests for build_prompt."""
+
+    def test_prompt_sections(self):
+        policy = {"style": {"max_sentences": 3, "format": "bullet"}, "domain": {"context": "  Moltbook agents  "}}
+        prompt = build_prompt(EVENT, policy, "normal")
+
+        assert prompt.startswith("You are a concise assistant.\n\nScope:\nMoltbook agents\n")
+        assert "- Max 3 sentences." in prompt
+        assert "- Format: bullet" in prompt
+        assert "Event type: comment\nAuthor: alice\nEvent text:\nHow do I cap spending?\n" in prompt
+        assert prompt.endswith("Task:\nWrite a helpful reply. Keep it practical and short.\n")
+
+    def test_task_by_mode(self):
+        assert "Refuse briefly" in build_prompt(EVENT, {}, "refuse")
+        assert "short redirect" in build_prompt(EVENT, {}, "redirect")
+        assert build_prompt(EVENT, {}, "unknown") == build_prompt(EVENT, {}, "normal")
+
+    def test_constitution_rendered_once_per_policy(self):
+        policy = {}
+        build_prompt({"text": "first"}, policy, "normal")
+
+        with patch.object(reply, "_CONSTITUTION_TEMPLATE") as template:
+            build_prompt({"text": "other"}, policy, "refuse")
+        template.format.assert_not_called()
+        assert policy == {}
+
+    def test_event_defaults_and_braces(self):
+        prompt = build_prompt({"text": "use {fmt} here"}, {}, "normal")
+
+        assert "Event type: event\nAuthor: user\n" in prompt
+        assert "use {fmt} here" in prompt
+
+
+class TestPromptCache:
+    """Tests for the build_prompt memo."""
+
+    def setup_method(self):
+        clear_prompt_cache()
+
+    def teardown_method(self):
+        clear_prompt_cache()
+
+    def test_repeat_returns_cached_prompt(self):
+        policy = {}
+        compiled_policy(policy)
+        first = build_prompt(EVENT, policy, "normal")
+
+        with patch("moltagent.reply._render_prompt") as render:
+            assert build_prompt(EVENT, policy, "normal") is first
+        render.assert_not_called()
+
+    def test_key_covers_mode_text_and_policy(self):
+        policy = {}
+        compiled_policy(policy)
+        build_prompt(EVENT, policy, "normal")
+
+        assert "Refuse briefly" in build_prompt(EVENT, policy, "refuse")
+        edited = dict(EVENT, text="edited text")
+        assert "edited text" in build_prompt(edited, policy, "normal")
+
+        other = {"style": {"max_sentences": 1}}
+        compiled_policy(other)
+        assert "- Max 1 sentences." in build_prompt(EVENT, other, "normal")
+
+    def test_no_id_not_cached(self):
+        build_prompt({"text": "no id"}, {}, "normal")
+        assert len(reply._prompt_cache) == 0
+
+    def test_cache_is_bounded(self):
+        policy = {}
+        compiled_policy(policy)
+        with patch("moltagent.reply.PROMPT_CACHE_SIZE", 2):
+            for i in range(5):
+                build_prompt(dict(EVENT, id=f"e{i}"), policy, "normal")
+        assert len(reply._prompt_cache) == 2
+
+
+class TestExtractText:
+    """Tests for extract_text."""
+
+    def test_output_text_fast_path(self):
+        response = SimpleNamespace(output_text="  Hello  ", output=None)
+        assert extract_text(response) == "Hello"
+
+    def test_falls_back_to_output_items(self):
+        response = SimpleNamespace(
+            output_text="   ",
+            output=[
+                SimpleNamespace(type="reasoning", content=[SimpleNamespace(type="text", text="skip")]),
+                SimpleNamespace(type="message", content=[
+                    SimpleNamespace(type="output_text", text="Hi "),
+                    SimpleNamespace(type="refusal", text="no"),
+                    SimpleNamespace(type="text", text="there"),
+                ]),
+            ],
+        )
+        assert extract_text(response) == "Hi there"
+
+    def test_empty_response(self):
+        assert extract_text(SimpleNamespace()) == ""
+        assert extract_text(SimpleNamespace(output_text=None, output=None)) == ""
+
+
+class TestRateLimit:
+    """Tests for rate_limit."""
+
+    def setup_method(self):
+        reply._last_grant_ts = 0.0
+
+    def _state(self, last_call_ts):
+        return State(day_key="2026-02-03", hour_key="2026-02-03-12", last_call_ts=last_call_ts)
+
+    def test_sleeps_remaining_interval(self):
+        with patch("moltagent.reply.time") as t:
+            t.time.return_value = 100.25
+            rate_limit({"min_seconds_between_calls": 1.0}, self._state(100.0))
+        t.sleep.assert_called_once_with(0.75)
+
+    def test_no_sleep_when_interval_passed(self):
+        with patch("moltagent.reply.time") as t:
+            t.time.return_value = 200.0
+            rate_limit({"min_seconds_between_calls": 1.0}, self._state(100.0))
+        t.sleep.assert_not_called()
+
+    def test_disabled_interval_returns_early(self):
+        with patch("moltagent.reply.time") as t:
+            rate_limit({"min_seconds_between_calls": 0}, self._state(100.0))
+        t.time.assert_not_called()
+        t.sleep.assert_not_called()
+
+    def test_clock_jump_back_waits_at_most_interval(self):
+        with patch("moltagent.reply.time") as t:
+            t.time.return_value = 100.0
+            rate_limit({"min_seconds_between_calls": 2.0}, self._state(5000.0))
+        t.sleep.assert_called_once_with(2.0)
+
+    def test_back_to_back_callers_share_the_interval(self):
+        """A második hívó a kiadott időréshez igazodik, a (még régi) state-től függetlenül."""
+        state = self._state(100.0)
+        with patch("moltagent.reply.time") as t:
+            t.time.return_value = 200.0
+            rate_limit({"min_seconds_between_calls": 1.0}, state)
+            t.sleep.assert_not_called()
+
+            t.time.return_value = 200.25
+            rate_limit({"min_seconds_between_calls": 1.0}, state)
+        t.sleep.assert_called_once_with(0.75)
+
+    def test_threads_are_serialized(self):
+        """Párhuzamos szálak min_s távolságú réseket kapnak."""
+        clock = [1000.0]
+
+        def fake_sleep(s):
+            clock[0] += s
+
+        state = self._state(0.0)
+        policy = {"min_seconds_between_calls": 1.0}
+        with patch("moltagent.reply.time") as t:
+            t.time.side_effect = lambda: clock[0]
+            t.sleep.side_effect = fake_sleep
+            threads = [threading.Thread(target=rate_limit, args=(policy, state)) for _ in range(4)]
+            for th in threads:
+                th.start()
+            for th in threads:
+                th.join()
+        assert clock[0] == pytest.approx(1003.0)
+
+
+class TestMakeOutboundReply:
+    """Tests for make_outbound_reply result unpacking."""
+
+    def _reply(self, response):
+        with patch("moltagent.reply.call_with_retry", return_value=response):
+            return make_outbound_reply(EVENT, {}, "normal", client=None)
+
+    def test_usage_tokens(self):
+        usage = SimpleNamespace(input_tokens=12, output_tokens=5)
+        response = SimpleNamespace(output_text="Hi", output=None, usage=usage)
+        assert self._reply(response) == ("Hi", 12, 5)
+
+    def test_missing_usage_and_text(self):
+        response = SimpleNamespace(output_text="", output=None, usage=None)
+        assert self._reply(response) == ("[no_text]", 0, 0)
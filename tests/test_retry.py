@@ -6,7 +6,7 @@ Fázis 3 - Error handling & recovery
 import json
 import os
 import tempfile
-import time
+from datetime import datetime
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -23,6 +23,31 @@ from moltagent.retry import (
 )
 
 
+# --- Fake clock ---
+
+class FakeClock:
+    """Hamis óra: a sleep csak előre tekeri az időt, nem vár valóban."""
+
+    def __init__(self, start: float = 1700000000.0):
+        self._now = start
+        self.sleeps = []
+
+    def time(self) -> float:
+        return self._now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self._now += seconds
+
+
+@pytest.fixture(autouse=True)
+def fake_clock(monkeypatch):
+    """A retry modul time-ját hamis órára cseréli (nincs valódi várakozás)."""
+    clock = FakeClock()
+    monkeypatch.setattr("moltagent.retry.time", clock)
+    return clock
+
+
 # --- Mock exceptions ---
 
 class MockRateLimitError(Exception):
@@ -133,6 +158,28 @@ class TestGetRetryAfter:
                 assert hasattr(err, "retry_after")
                 assert err.retry_after == 5.0
 
+    def test_rate_limit_retry_after_value(self):
+        """RateLimitError esetén a retry_after attribútum számít."""
+        err = MockRateLimitError(retry_after="7")
+        with patch("moltagent.retry.RateLimitError", MockRateLimitError):
+            assert get_retry_after(err) == 7.0
+
+    def test_rate_limit_retry_after_header(self):
+        """Attribútum hiányában a Retry-After fejlécet olvassuk."""
+        err = MockRateLimitError()
+        err.response = MagicMock(headers={"Retry-After": "3"})
+        with patch("moltagent.retry.RateLimitError", MockRateLimitError):
+            assert get_retry_after(err) == 3.0
+
+    def test_rate_limit_subclass_honored(self):
+        """RateLimitError alosztálya (pl. SDK wrapper) is rate limitnek számít."""
+        class SdkRateLimitError(MockRateLimitError):
+            pass
+
+        err = SdkRateLimitError(retry_after=4)
+        with patch("moltagent.retry.RateLimitError", MockRateLimitError):
+            assert get_retry_after(err) == 4.0
+
 
 # --- call_with_retry tests ---
 
@@ -243,6 +290,62 @@ class TestLogError:
 
             assert entry["extra"]["status_code"] == 400
 
+    def test_log_error_reuses_handle(self, tmp_path):
+        """Több hiba ugyanabba a nyitott fájlba, sorrendben."""
+        from moltagent import retry
+        log_file = str(tmp_path / "errors.jsonl")
+
+        with patch("moltagent.retry.ERROR_LOG", log_file), \
+                patch("moltagent.retry.LOG_DIR", str(tmp_path)):
+            log_error(event_id="e1", error_type="A", message="first")
+            fh = retry._err_fh
+            log_error(event_id="e2", error_type="B", message="second")
+            assert retry._err_fh is fh
+
+        with open(log_file) as f:
+            assert [json.loads(line)["event_id"] for line in f] == ["e1", "e2"]
+
+    def test_log_error_reopens_deleted_file(self, tmp_path):
+        """Törölt log fájl után új fájlba ír."""
+        log_file = str(tmp_path / "errors.jsonl")
+
+        with patch("moltagent.retry.ERROR_LOG", log_file), \
+                patch("moltagent.retry.LOG_DIR", str(tmp_path)):
+            log_error(event_id="e1", error_type="A", message="old")
+            os.remove(log_file)
+            log_error(event_id="e2", error_type="B", message="new")
+
+        with open(log_file) as f:
+            assert [json.loads(line)["event_id"] for line in f] == ["e2"]
+
+    def test_log_error_writes_utf8(self, tmp_path):
+        """Ékezetes üzenet escape nélkül, UTF-8-ként kerül a fájlba."""
+        log_file = str(tmp_path / "errors.jsonl")
+
+        with patch("moltagent.retry.ERROR_LOG", log_file), \
+                patch("moltagent.retry.LOG_DIR", str(tmp_path)):
+            log_error(event_id="e1", error_type="A", message="árvíztűrő hiba")
+
+        with open(log_file, "rb") as f:
+            raw = f.read()
+        assert "árvíztűrő hiba".encode("utf-8") in raw
+        assert raw.endswith(b"\n")
+
+    def test_log_error_timestamp_is_utc_iso(self, tmp_path):
+        """A ts mező UTC ISO-8601, mikroszekundumokkal."""
+        log_file = str(tmp_path / "errors.jsonl")
+
+        with patch("moltagent.retry.ERROR_LOG", log_file), \
+                patch("moltagent.retry.LOG_DIR", str(tmp_path)), \
+                patch("moltagent.retry.time") as mock_time:
+            mock_time.time.return_value = 1700000000.25
+            log_error(event_id="e1", error_type="A", message="m")
+
+        with open(log_file) as f:
+            ts = json.loads(f.readline())["ts"]
+        assert ts == "2023-11-14T22:13:20.250000+00:00"
+        assert datetime.fromisoformat(ts).timestamp() == 1700000000.25
+
 
 # --- retry_on_error decorator tests ---
 
@@ -286,18 +389,19 @@ class TestRetryOnErrorDecorator:
 class TestRetryIntegration:
     """Integration tests for retry logic."""
 
-    def test_retry_timing(self):
+    def test_retry_timing(self, fake_clock):
         """Retry várakozik a megfelelő időt."""
         with patch("moltagent.retry.RETRYABLE_EXCEPTIONS", (MockAPITimeoutError,)):
             func = MagicMock(side_effect=MockAPITimeoutError("timeout"))
 
-            start = time.time()
+            start = fake_clock.time()
             with pytest.raises(ReplyError):
                 call_with_retry(func, max_retries=2, base_delay=0.1, max_delay=1.0)
-            elapsed = time.time() - start
+            elapsed = fake_clock.time() - start
 
-            # Minimum várakozási idő: 0.1 (1st retry) + 0.2 (2nd retry) = 0.3s
-            assert elapsed >= 0.2  # Allow some margin
+            # 0.1 (1st retry) + 0.2 (2nd retry), ±10% jitter
+            assert fake_clock.sleeps == [pytest.approx(0.1, rel=0.1), pytest.approx(0.2, rel=0.1)]
+            assert elapsed >= 0.27
 
     def test_retry_count_in_error(self):
         """Retry count szerepel a hibában."""
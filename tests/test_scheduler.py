@@ -13,6 +13,8 @@ from moltagent.scheduler import (
 )
 from moltagent.state import State
 
+pytestmark = pytest.mark.fast
+
 
 @pytest.fixture
 def base_state():
@@ -61,6 +63,19 @@ class TestComputeEarnedCalls:
         with patch("moltagent.scheduler.seconds_since_midnight", return_value=21600):
             assert compute_earned_calls(200) == 50.0
 
+    def test_returns_floored_int(self):
+        """Just before 6am the partial call is not counted yet."""
+        with patch("moltagent.scheduler.seconds_since_midnight", return_value=21599.9):
+            earned = compute_earned_calls(200)
+        assert earned == 49
+        assert isinstance(earned, int)
+
+    def test_explicit_elapsed_skips_clock(self):
+        """An explicit elapsed_today is used instead of reading the clock."""
+        with patch("moltagent.scheduler.seconds_since_midnight") as clock:
+            assert compute_earned_calls(200, 43200) == 100.0
+        clock.assert_not_called()
+
 
 class TestComputeWaitSeconds:
     """Tests for wait time calculation."""
@@ -80,6 +95,12 @@ class TestComputeWaitSeconds:
             # Should wait until 43632s (101/200 * 86400)
             assert wait == pytest.approx(432.0, rel=0.01)
 
+    def test_explicit_elapsed_skips_clock(self):
+        """An explicit elapsed_today is used instead of reading the clock."""
+        with patch("moltagent.scheduler.seconds_since_midnight") as clock:
+            assert compute_wait_seconds(100, 200, 43200) == pytest.approx(432.0)
+        clock.assert_not_called()
+
 
 class TestSchedulerCheck:
     """Tests for scheduler_check decision logic."""
@@ -165,6 +186,27 @@ class TestSchedulerCheck:
         assert decision.wait_seconds == 300.0
 
 
+    def test_clock_read_once_per_check(self, base_state, base_policy):
+        """scheduler_check reads the time of day once and shares it."""
+        base_state.calls_today = 100
+
+        with patch("moltagent.scheduler.seconds_since_midnight", return_value=21600) as clock:
+            decision = scheduler_check(base_state, "P2", base_policy)
+
+        assert clock.call_count == 1
+        assert decision.allowed is False
+        assert decision.reason == "scheduler_paced_wait"
+
+
+    def test_decision_is_frozen_and_slotted(self):
+        """SchedulerDecision carries no __dict__ and rejects mutation."""
+        decision = SchedulerDecision(allowed=True, reason="scheduler_within_pace")
+
+        assert not hasattr(decision, "__dict__")
+        with pytest.raises(AttributeError):
+            decision.allowed = False
+
+
 class TestUpdateBurstCounters:
     """Tests for burst counter updates."""
 
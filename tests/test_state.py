@@ -1,12 +1,25 @@
 """
 Tests for moltagent.state (State management and idempotency)
 """
+import copy
+import dataclasses
 import json
 import os
+import threading
 import pytest
 from unittest.mock import patch
 
-from moltagent.state import State, load_state, save_state, ensure_today
+from moltagent import state as state_mod
+from moltagent.state import (
+    State,
+    compact_state,
+    ensure_today,
+    force_sync_state,
+    load_state,
+    replied_log_path,
+    save_state,
+    start_flush_thread,
+)
 
 
 @pytest.fixture
@@ -129,6 +142,54 @@ class TestLoadState:
         assert state.replied_event_ids == {"e1", "e2"}
 
 
+class TestLoadTrustedPath:
+    """Tests for the fast path on files written by save_state."""
+
+    def test_roundtrip_skips_init(self, temp_state_file, mock_today):
+        """A save_state file loads without calling State.__init__."""
+        original = State(
+            day_key="2026-02-03",
+            hour_key="2026-02-03-12",
+            spent_usd=0.5,
+            calls_today=3,
+            burst_used_p1=1,
+        )
+        original.mark_replied("evt_1")
+        save_state(original, temp_state_file)
+
+        with patch.object(State, "__init__", side_effect=AssertionError("slow path")):
+            loaded = load_state(temp_state_file)
+
+        assert loaded == original
+        assert loaded._dirty is False
+        assert loaded._unlogged == []
+
+    def test_foreign_file_is_coerced(self, temp_state_file, mock_today):
+        """Files with unexpected keys still go through type coercion."""
+        with open(temp_state_file, "w") as f:
+            json.dump({"day_key": "2026-02-03", "calls_today": "7", "extra": 1}, f)
+
+        loaded = load_state(temp_state_file)
+
+        assert loaded.calls_today == 7
+        assert loaded.hour_key == "2026-02-03-12"
+
+    def test_saved_keys_with_wrong_types_are_coerced(self, temp_state_file, mock_today):
+        """A hand-edited file with the saved key set but str numbers is still coerced."""
+        save_state(State(day_key="2026-02-03", hour_key="2026-02-03-12"), temp_state_file)
+        with open(temp_state_file) as f:
+            data = json.load(f)
+        data["calls_today"] = "7"
+        data["spent_usd"] = 1
+        with open(temp_state_file, "w") as f:
+            json.dump(data, f)
+
+        loaded = load_state(temp_state_file)
+
+        assert loaded.calls_today == 7
+        assert type(loaded.spent_usd) is float
+
+
 class TestSaveState:
     """Tests for save_state function."""
 
@@ -156,8 +217,184 @@ class TestSaveState:
         assert data["calls_today"] == 42
         assert data["burst_used_p0"] == 3
         assert data["burst_used_p1"] == 1
-        # replied_event_ids should be sorted list
-        assert data["replied_event_ids"] == ["e10", "e3", "e5"]
+        # replied_event_ids live in the sidecar log, not in the state file
+        assert "replied_event_ids" not in data
+        assert _logged_ids(temp_state_file) == ["e10", "e3", "e5"]
+
+    def test_writes_single_compact_document(self, temp_state_file):
+        """The state file is one compact JSON document, no temp file left."""
+        save_state(State(day_key="2026-02-03", calls_today=1), temp_state_file)
+
+        with open(temp_state_file, "rb") as f:
+            raw = f.read()
+        assert b"\n" not in raw and b": " not in raw
+        assert json.loads(raw)["calls_today"] == 1
+        assert not os.path.exists(temp_state_file + ".tmp")
+
+
+def _logged_ids(state_file):
+    """Event ids in the replied log, sorted."""
+    with open(replied_log_path(state_file)) as f:
+        return sorted(json.loads(line)["event_id"] for line in f)
+
+
+def _log_lines(state_file):
+    with open(replied_log_path(state_file)) as f:
+        return [json.loads(line)["event_id"] for line in f]
+
+
+@pytest.fixture
+def fsync_clock():
+    """Fresh fsync bookkeeping with a controllable monotonic clock."""
+    now = [1000.0]
+    with patch.object(state_mod, "_saves_since_fsync", 0), \
+            patch.object(state_mod, "_last_fsync_ts", 1000.0), \
+            patch.object(state_mod, "_unsynced_state_file", None), \
+            patch("moltagent.state.time.monotonic", side_effect=lambda: now[0]):
+        yield now
+
+
+class TestStateFsyncBatching:
+    """save_state fsyncs the state file at most every N saves / T seconds."""
+
+    def test_saves_within_window_skip_fsync(self, temp_state_file, fsync_clock):
+        with patch("moltagent.state.os.fsync") as fsync:
+            for i in range(3):
+                save_state(State(day_key="2026-02-03", calls_today=i), temp_state_file)
+        fsync.assert_not_called()
+        assert state_mod._unsynced_state_file == temp_state_file
+
+    def test_fsync_after_interval(self, temp_state_file, fsync_clock):
+        with patch("moltagent.state.os.fsync") as fsync:
+            save_state(State(day_key="2026-02-03"), temp_state_file)
+            fsync_clock[0] += state_mod.STATE_FSYNC_INTERVAL_SEC
+            save_state(State(day_key="2026-02-03"), temp_state_file)
+        assert fsync.call_count == 1
+        assert state_mod._unsynced_state_file is None
+
+    def test_fsync_every_n_saves(self, temp_state_file, fsync_clock):
+        with patch("moltagent.state.os.fsync") as fsync, \
+                patch("moltagent.state.STATE_FSYNC_EVERY", 4):
+            for _ in range(8):
+                save_state(State(day_key="2026-02-03"), temp_state_file)
+        assert fsync.call_count == 2
+
+    def test_force_sync_state(self, temp_state_file, fsync_clock):
+        save_state(State(day_key="2026-02-03"), temp_state_file)
+        with patch("moltagent.state.os.fsync") as fsync:
+            force_sync_state()
+            force_sync_state()  # nothing pending any more
+        assert fsync.call_count == 1
+        assert state_mod._unsynced_state_file is None
+
+
+class TestRepliedLog:
+    """Tests for the append-only replied_event_ids log."""
+
+    def test_log_path_next_to_state_file(self, tmp_path):
+        path = replied_log_path(str(tmp_path / "agent_state.json"))
+        assert path == str(tmp_path / "agent_state.replied_events.jsonl")
+
+    def test_save_appends_only_new_ids(self, temp_state_file, mock_today):
+        state = State(day_key="2026-02-03", replied_event_ids={"e1"})
+        save_state(state, temp_state_file)
+        save_state(state, temp_state_file)  # nothing new
+        state.mark_replied("e2")
+        state.mark_replied("e2")
+        save_state(state, temp_state_file)
+
+        assert _log_lines(temp_state_file) == ["e1", "e2"]
+        assert load_state(temp_state_file).replied_event_ids == {"e1", "e2"}
+
+    def test_loaded_ids_not_rewritten(self, temp_state_file, mock_today):
+        state = State(day_key="2026-02-03", replied_event_ids={"e1", "e2"})
+        save_state(state, temp_state_file)
+
+        loaded = load_state(temp_state_file)
+        loaded.mark_replied("e3")
+        save_state(loaded, temp_state_file)
+
+        assert sorted(_log_lines(temp_state_file)) == ["e1", "e2", "e3"]
+
+    def test_legacy_state_file_migrated(self, temp_state_file, mock_today):
+        with open(temp_state_file, "w") as f:
+            json.dump({"day_key": "2026-02-03", "replied_event_ids": ["old1", "old2"]}, f)
+
+        loaded = load_state(temp_state_file)
+        assert loaded.replied_event_ids == {"old1", "old2"}
+        save_state(loaded, temp_state_file)
+
+        with open(temp_state_file) as f:
+            assert "replied_event_ids" not in json.load(f)
+        assert load_state(temp_state_file).replied_event_ids == {"old1", "old2"}
+
+    def test_log_survives_missing_state_file(self, temp_state_file, mock_today):
+        state = State(day_key="2026-02-03", replied_event_ids={"e1"})
+        save_state(state, temp_state_file)
+        os.remove(temp_state_file)
+
+        loaded = load_state(temp_state_file)
+        assert loaded.calls_today == 0
+        assert loaded.has_replied("e1")
+
+    def test_torn_line_skipped(self, temp_state_file, mock_today):
+        state = State(day_key="2026-02-03", replied_event_ids={"e1"})
+        save_state(state, temp_state_file)
+        with open(replied_log_path(temp_state_file), "a") as f:
+            f.write('{"event_id": "e2')  # crash mid-append
+
+        assert load_state(temp_state_file).replied_event_ids == {"e1"}
+
+    def test_compaction_when_crossing_threshold(self, temp_state_file, mock_today):
+        with open(replied_log_path(temp_state_file), "w") as f:
+            f.write('{"event_id": "e1"}\n{"event_id": "e1"}\n')  # duplicate
+        state = load_state(temp_state_file)
+
+        with patch("moltagent.state.REPLIED_COMPACT_EVERY", 2):
+            state.mark_replied("e2")
+            save_state(state, temp_state_file)
+
+        assert _log_lines(temp_state_file) == ["e1", "e2"]
+
+    def test_compact_state(self, temp_state_file, mock_today):
+        state = State(day_key="2026-02-03", replied_event_ids={"b", "a"})
+        compact_state(state, temp_state_file)
+        save_state(state, temp_state_file)  # already in the log
+
+        assert _log_lines(temp_state_file) == ["a", "b"]
+        assert not os.path.exists(replied_log_path(temp_state_file) + ".tmp")
+
+    def test_direct_set_writes_are_logged(self, temp_state_file, mock_today):
+        """Writes that bypass mark_replied still reach the log."""
+        state = State(day_key="2026-02-03")
+        state.mark_replied("a")
+        save_state(state, temp_state_file)
+        state.replied_event_ids.add("b")
+        save_state(state, temp_state_file)
+        state.replied_event_ids = {"a", "b", "c"}
+        save_state(state, temp_state_file)
+
+        assert load_state(temp_state_file).replied_event_ids == {"a", "b", "c"}
+
+    def test_discard_rewrites_log(self, temp_state_file, mock_today):
+        state = State(day_key="2026-02-03", replied_event_ids={"a", "b"})
+        save_state(state, temp_state_file)
+        state.replied_event_ids.discard("a")
+        save_state(state, temp_state_file)
+
+        assert _log_lines(temp_state_file) == ["b"]
+
+    def test_replace_does_not_relog(self, temp_state_file, mock_today):
+        """dataclasses.replace carries over only the ids not yet logged."""
+        state = State(day_key="2026-02-03", replied_event_ids={"a"})
+        save_state(state, temp_state_file)
+        state.mark_replied("b")
+
+        copy = dataclasses.replace(state)
+        save_state(copy, temp_state_file)
+
+        assert _log_lines(temp_state_file) == ["a", "b"]
+        assert state._unlogged == ["b"]
 
 
 class TestEnsureToday:
@@ -209,6 +446,188 @@ class TestEnsureToday:
         assert result.hour_key == "2026-02-03-12"
         assert result.p2_replies_this_hour == 0
 
+    def test_explicit_keys_skip_clock(self, temp_state_file):
+        """Keys passed by the caller are used instead of reading the clock."""
+        state = State(day_key="2026-02-02", hour_key="2026-02-02-23", calls_today=4)
+
+        with patch("moltagent.state.day_key_local") as mock_day, \
+                patch("moltagent.state.hour_key_local") as mock_hour, \
+                patch("moltagent.state.save_state"):
+            result = ensure_today(state, "2026-02-03", "2026-02-03-00")
+
+        mock_day.assert_not_called()
+        mock_hour.assert_not_called()
+        assert result.day_key == "2026-02-03"
+        assert result.calls_today == 0
+
+
+class TestRepliedLogIncrementalLoad:
+    """Tests for re-reading only the appended part of the replied log."""
+
+    def test_second_load_parses_only_new_lines(self, temp_state_file, mock_today):
+        state = State(day_key="2026-02-03", replied_event_ids={"e1", "e2"})
+        save_state(state, temp_state_file)
+        load_state(temp_state_file)
+
+        state.mark_replied("e3")
+        save_state(state, temp_state_file)
+        with patch("moltagent.state.json_loads", wraps=state_mod.json_loads) as loads:
+            loaded = load_state(temp_state_file)
+
+        assert loaded.replied_event_ids == {"e1", "e2", "e3"}
+        assert loads.call_count == 2  # state file + one new log line
+
+    def test_new_lines_added_in_place(self, temp_state_file, mock_today):
+        state = State(day_key="2026-02-03", replied_event_ids={"e1"})
+        save_state(state, temp_state_file)
+        first = load_state(temp_state_file).replied_event_ids
+
+        state.mark_replied("e2")
+        save_state(state, temp_state_file)
+        second = load_state(temp_state_file).replied_event_ids
+
+        assert second._ids is first._ids
+        assert "e2" in first
+
+    def test_returned_set_is_a_copy(self, temp_state_file, mock_today):
+        save_state(State(day_key="2026-02-03", replied_event_ids={"e1"}), temp_state_file)
+        load_state(temp_state_file).replied_event_ids.add("not_logged")
+
+        assert load_state(temp_state_file).replied_event_ids == {"e1"}
+
+    def test_loaded_ids_shared_until_mutated(self, temp_state_file, mock_today):
+        save_state(State(day_key="2026-02-03", replied_event_ids={"e1"}), temp_state_file)
+        first = load_state(temp_state_file).replied_event_ids
+        second = load_state(temp_state_file).replied_event_ids
+        assert first._ids is second._ids
+
+        second.add("e2")
+
+        assert first._ids is not second._ids
+        assert "e2" not in first
+        assert second == {"e1", "e2"}
+
+    def test_set_operators_return_plain_sets(self, temp_state_file, mock_today):
+        save_state(State(day_key="2026-02-03", replied_event_ids={"e1", "e2"}), temp_state_file)
+        ids = load_state(temp_state_file).replied_event_ids
+
+        assert len(ids | {"e3"}) == 3
+        assert ids & {"e1"} == {"e1"}
+        assert type(ids - {"e1"}) is set
+
+    def test_copy_does_not_share_writes(self, temp_state_file, mock_today):
+        save_state(State(day_key="2026-02-03", replied_event_ids={"e1"}), temp_state_file)
+        ids = load_state(temp_state_file).replied_event_ids
+        ids.add("e2")  # owned from here on
+
+        dup = copy.copy(ids)
+        dup.add("e3")
+        ids.discard("e1")
+
+        assert ids == {"e2"}
+        assert dup == {"e1", "e2", "e3"}
+
+    def test_unterminated_line_read_once_complete(self, temp_state_file, mock_today):
+        log_path = replied_log_path(temp_state_file)
+        with open(log_path, "wb") as f:
+            f.write(b'{"event_id":"e1"}\n{"event_id":"e2"')
+        assert load_state(temp_state_file).replied_event_ids == {"e1"}
+
+        with open(log_path, "ab") as f:
+            f.write(b"}\n")
+        assert load_state(temp_state_file).replied_event_ids == {"e1", "e2"}
+
+    def test_replaced_log_is_reread(self, temp_state_file, mock_today):
+        state = State(day_key="2026-02-03", replied_event_ids={"e1", "e2"})
+        save_state(state, temp_state_file)
+        load_state(temp_state_file)
+
+        os.remove(replied_log_path(temp_state_file))
+        save_state(State(day_key="2026-02-03", replied_event_ids={"e9"}), temp_state_file)
+
+        assert load_state(temp_state_file).replied_event_ids == {"e9"}
+
+
+class TestDirtyFlag:
+    """Tests for dirty tracking and the background flusher."""
+
+    def test_loaded_state_is_clean(self, temp_state_file, mock_today):
+        """A state loaded from disk has nothing to save."""
+        save_state(State(day_key="2026-02-03", hour_key="2026-02-03-12"), temp_state_file)
+
+        assert load_state(temp_state_file)._dirty is False
+
+    def test_mutations_mark_dirty(self, temp_state_file, mock_today):
+        """Counter updates and mark_replied mark the state dirty."""
+        state = State(day_key="2026-02-03", hour_key="2026-02-03-12")
+        save_state(state, temp_state_file)
+        assert state._dirty is False
+
+        state.calls_today += 1
+        assert state._dirty is True
+
+        save_state(state, temp_state_file)
+        state.mark_replied("evt_1")
+        assert state._dirty is True
+
+    def test_ensure_today_skips_save_when_clean(self, temp_state_file, mock_today):
+        """ensure_today does not write a clean state on the same hour."""
+        state = State(day_key="2026-02-03", hour_key="2026-02-03-12")
+        save_state(state, temp_state_file)
+
+        with patch("moltagent.state.save_state") as mock_save:
+            ensure_today(state)
+            state.burst_used_p0 += 1
+            ensure_today(state)
+
+        mock_save.assert_called_once_with(state)
+
+    def test_flush_thread_saves_dirty_state(self, temp_state_file, mock_today):
+        """The flusher persists pending changes and flushes once more on stop."""
+        state = State(day_key="2026-02-03", hour_key="2026-02-03-12")
+        save_state(state, temp_state_file)
+
+        stop = start_flush_thread(state, interval=60.0, state_file=temp_state_file)
+        state.calls_today = 7
+        stop.set()
+
+        for t in threading.enumerate():
+            if t.name == "state-flush":
+                t.join(timeout=5)
+
+        assert load_state(temp_state_file).calls_today == 7
+
+    def test_failed_log_append_keeps_state_dirty(self, temp_state_file, mock_today):
+        """If the replied log append fails, the ids stay pending and the state stays dirty."""
+        state = State(day_key="2026-02-03", hour_key="2026-02-03-12")
+        save_state(state, temp_state_file)
+        state.mark_replied("evt_1")
+
+        with patch("moltagent.state._append_replied_log", side_effect=OSError("disk full")):
+            with pytest.raises(OSError):
+                save_state(state, temp_state_file)
+
+        assert state._dirty is True
+        assert state._unlogged == ["evt_1"]
+
+    def test_id_marked_during_log_append_is_not_lost(self, temp_state_file, mock_today):
+        """An id marked while the log is being written is kept for the next save."""
+        state = State(day_key="2026-02-03", hour_key="2026-02-03-12")
+        save_state(state, temp_state_file)
+        state.mark_replied("evt_1")
+        real_append = state_mod._append_replied_log
+
+        def append_and_race(path, event_ids):
+            real_append(path, event_ids)
+            state.mark_replied("evt_2")  # e.g. the daemon thread while the flusher writes
+
+        with patch("moltagent.state._append_replied_log", side_effect=append_and_race):
+            save_state(state, temp_state_file)
+
+        assert state._unlogged == ["evt_2"]
+        save_state(state, temp_state_file)
+        assert load_state(temp_state_file).replied_event_ids == {"evt_1", "evt_2"}
+
 
 class TestRestartBehavior:
     """
@@ -0,0 +1,212 @@
+"""
+Tests for moltagent.utils (JSONL helpers and log rotation)
+"""
+import gzip
+import json
+import os
+
+import pytest
+
+from moltagent import utils
+from moltagent.utils import (
+    append_jsonl,
+    close_jsonl,
+    flush_jsonl,
+    json_dumps,
+    json_loads,
+    jsonl_line,
+    rotate_jsonl_if_needed,
+)
+
+
+@pytest.fixture(autouse=True)
+def _close_writers():
+    yield
+    close_jsonl()
+
+
+def _write_lines(path, n):
+    for i in range(n):
+        append_jsonl(path, {"i": i, "text": "x" * 50})
+
+
+class TestJsonlLine:
+    def test_roundtrip_unicode(self):
+        obj = {"text": "árvíztűrő 🦞", "n": 1, "ok": True, "x": None}
+        line = jsonl_line(obj)
+        assert line.endswith(b"\n")
+        assert json.loads(line.decode("utf-8")) == obj
+        assert "árvíztűrő".encode("utf-8") in line
+
+    def test_non_str_keys_fall_back_to_stdlib(self):
+        line = jsonl_line({1: "a"})
+        assert json.loads(line) == {"1": "a"}
+
+    def test_stdlib_only(self, monkeypatch):
+        monkeypatch.setattr(utils, "orjson", None)
+        assert json.loads(jsonl_line({"a": "é"})) == {"a": "é"}
+
+    def test_append_jsonl(self, tmp_path):
+        path = str(tmp_path / "x.jsonl")
+        append_jsonl(path, {"i": 1})
+        append_jsonl(path, {"i": 2})
+        flush_jsonl()
+        with open(path, encoding="utf-8") as f:
+            assert [json.loads(line)["i"] for line in f] == [1, 2]
+
+
+class TestAppendJsonlBuffering:
+    def test_buffered_until_flush(self, tmp_path):
+        path = str(tmp_path / "x.jsonl")
+        append_jsonl(path, {"i": 1})
+        assert os.path.getsize(path) == 0
+        flush_jsonl(path)
+        assert os.path.getsize(path) > 0
+
+    def test_flush_flag_writes_immediately(self, tmp_path):
+        path = str(tmp_path / "x.jsonl")
+        append_jsonl(path, {"i": 1}, flush=True)
+        assert os.path.getsize(path) > 0
+
+    def test_flushes_every_n_records(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(utils, "JSONL_FLUSH_EVERY", 3)
+        path = str(tmp_path / "x.jsonl")
+        _write_lines(path, 3)
+        with open(path, encoding="utf-8") as f:
+            assert len(f.readlines()) == 3
+
+    def test_reopens_after_external_delete(self, tmp_path):
+        path = str(tmp_path / "x.jsonl")
+        append_jsonl(path, {"i": 1}, flush=True)
+        os.remove(path)
+        flush_jsonl()
+        append_jsonl(path, {"i": 2}, flush=True)
+        with open(path, encoding="utf-8") as f:
+            assert [json.loads(line)["i"] for line in f] == [2]
+
+    def test_flush_write_reopens_deleted_file(self, tmp_path):
+        path = str(tmp_path / "x.jsonl")
+        append_jsonl(path, {"i": 1}, flush=True)
+        os.remove(path)
+        append_jsonl(path, {"i": 2}, flush=True)
+        with open(path, encoding="utf-8") as f:
+            assert [json.loads(line)["i"] for line in f] == [2]
+
+    def test_flush_write_follows_external_rotation(self, tmp_path):
+        path = str(tmp_path / "x.jsonl")
+        append_jsonl(path, {"i": 1}, flush=True)
+        os.rename(path, path + ".1")
+        append_jsonl(path, {"i": 2}, flush=True)
+        with open(path, encoding="utf-8") as f:
+            assert [json.loads(line)["i"] for line in f] == [2]
+        with open(path + ".1", encoding="utf-8") as f:
+            assert [json.loads(line)["i"] for line in f] == [1]
+
+
+class TestJsonDumps:
+    def test_compact_bytes(self):
+        assert json_dumps({"a": [1, 2], "b": "é"}) == '{"a":[1,2],"b":"é"}'.encode("utf-8")
+
+    def test_stdlib_only_is_compact(self, monkeypatch):
+        monkeypatch.setattr(utils, "orjson", None)
+        assert json_dumps({"a": [1, 2], "b": "é"}) == '{"a":[1,2],"b":"é"}'.encode("utf-8")
+
+
+class TestJsonLoads:
+    def test_bytes_roundtrip(self):
+        obj = {"text": "árvíztűrő 🦞", "n": [1, 2.5], "x": None}
+        assert json_loads(jsonl_line(obj)) == obj
+
+    def test_stdlib_extensions_still_accepted(self):
+        value = json_loads(b'{"x": NaN}')["x"]
+        assert value != value
+
+    def test_invalid_raises_stdlib_error(self):
+        with pytest.raises(json.JSONDecodeError):
+            json_loads(b"{not json")
+
+    def test_stdlib_only(self, monkeypatch):
+        monkeypatch.setattr(utils, "orjson", None)
+        assert json_loads(b'{"a": "\xc3\xa9"}') == {"a": "é"}
+
+
+class TestLocalKeys:
+    @pytest.fixture(autouse=True)
+    def _reset_cache(self, monkeypatch):
+        monkeypatch.setattr(utils, "_key_cache", (-1, "", ""))
+
+    def _at(self, monkeypatch, y, mo, d, h, mi, s):
+        ts = utils.datetime(y, mo, d, h, mi, s, tzinfo=utils.TZ).timestamp()
+        monkeypatch.setattr(utils.time, "time", lambda: ts)
+
+    def test_keys_match_local_time(self, monkeypatch):
+        self._at(monkeypatch, 2026, 2, 3, 12, 30, 0)
+        assert utils.day_key_local() == "2026-02-03"
+        assert utils.hour_key_local() == "2026-02-03-12"
+
+    def test_cached_within_hour(self, monkeypatch):
+        self._at(monkeypatch, 2026, 2, 3, 12, 0, 0)
+        utils.hour_key_local()
+        cached = utils._key_cache
+        self._at(monkeypatch, 2026, 2, 3, 12, 59, 59)
+        assert utils.hour_key_local() == "2026-02-03-12"
+        assert utils._key_cache is cached
+
+    def test_refreshed_at_day_boundary(self, monkeypatch):
+        self._at(monkeypatch, 2026, 2, 3, 23, 59, 59)
+        assert utils.day_key_local() == "2026-02-03"
+        self._at(monkeypatch, 2026, 2, 4, 0, 0, 0)
+        assert utils.day_key_local() == "2026-02-04"
+        assert utils.hour_key_local() == "2026-02-04-00"
+
+    def test_hour_bucket_counts_local_hours(self, monkeypatch):
+        self._at(monkeypatch, 2026, 2, 3, 0, 30, 0)
+        first = utils.hour_bucket_local()
+        self._at(monkeypatch, 2026, 2, 3, 23, 59, 59)
+        assert utils.hour_bucket_local() - first == 23
+        assert first % 24 == 0
+
+    def test_clock_going_back_refreshes(self, monkeypatch):
+        self._at(monkeypatch, 2026, 2, 3, 12, 0, 0)
+        utils.hour_key_local()
+        self._at(monkeypatch, 2026, 2, 3, 11, 59, 59)
+        assert utils.hour_key_local() == "2026-02-03-11"
+
+
+class TestRotateJsonl:
+    """Tests for size-based log rotation."""
+
+    def test_small_file_not_rotated(self, tmp_path):
+        path = str(tmp_path / "events.jsonl")
+        _write_lines(path, 3)
+
+        assert rotate_jsonl_if_needed(path, max_bytes=10_000) is False
+        assert os.path.exists(path)
+        assert not os.path.exists(path + ".1.gz")
+
+    def test_missing_file_not_rotated(self, tmp_path):
+        path = str(tmp_path / "missing.jsonl")
+        assert rotate_jsonl_if_needed(path, max_bytes=1) is False
+
+    def test_large_file_rotated_and_compressed(self, tmp_path):
+        path = str(tmp_path / "events.jsonl")
+        _write_lines(path, 10)
+
+        assert rotate_jsonl_if_needed(path, max_bytes=100) is True
+        assert not os.path.exists(path)
+        assert not os.path.exists(path + ".1")
+
+        with gzip.open(path + ".1.gz", "rt", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        assert [r["i"] for r in rows] == list(range(10))
+
+    def test_archives_shifted_and_capped(self, tmp_path):
+        path = str(tmp_path / "events.jsonl")
+
+        for _ in range(3):
+            _write_lines(path, 10)
+            rotate_jsonl_if_needed(path, max_bytes=100, keep=2)
+
+        assert os.path.exists(path + ".1.gz")
+        assert os.path.exists(path + ".2.gz")
+        assert not os.path.exists(path + ".3.gz")